@@ -1,20 +1,100 @@
+import os
+import threading
+from collections import OrderedDict
+
 import dash_bootstrap_components as dbc
-from dash_extensions.enrich import DashProxy, ServersideOutputTransform
+import pandas as pd
+from dash_extensions.enrich import (
+    DashProxy,
+    FileSystemStore,
+    ServersideOutputTransform,
+)
 from flask_caching import Cache
 
+from my_project.extract_df import freeze_df
+
+
+class SharedFileSystemStore(FileSystemStore):
+    """Server side store which keeps the most recently used values in memory.
+
+    The values are shared by all the callbacks of a worker instead of being
+    unpickled by each one of them, hence they have to be read-only.
+    """
+
+    def __init__(self, max_items=8, **kwargs):
+        self.max_items = max_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def _remember(self, key, value):
+        if isinstance(value, pd.DataFrame):
+            freeze_df(value)
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def set(self, key, value, timeout=None, mgmt_element=False):
+        if not mgmt_element:
+            self._remember(key, value)
+        return super().set(key, value, timeout=timeout, mgmt_element=mgmt_element)
+
+    def has(self, key):
+        return key in self._memory or super().has(key)
+
+    def get(self, key, ignore_expired=False):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        value = super().get(key, ignore_expired=ignore_expired)
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+
 app = DashProxy(
     __name__,
     external_stylesheets=[dbc.themes.BOOTSTRAP],
-    transforms=[ServersideOutputTransform()],
+    transforms=[ServersideOutputTransform(backend=SharedFileSystemStore())],
     suppress_callback_exceptions=True,
 )
-cache = Cache(
-    app.server,
-    config={
+# the cache backend is selected with the CLIMA_CACHE_BACKEND environment variable,
+# "memory" is per process while "disk" and "redis" are shared by all the workers.
+# Any Redis-compatible server can be used via CLIMA_REDIS_URL
+cache_backends = {
+    "memory": {
         "CACHE_TYPE": "flask_caching.backends.SimpleCache",
-        "CACHE_DIR": "cache-directory",
     },
-)
+    "disk": {
+        "CACHE_TYPE": "flask_caching.backends.FileSystemCache",
+        "CACHE_DIR": os.environ.get("CLIMA_CACHE_DIR", "cache-directory"),
+    },
+    "redis": {
+        "CACHE_TYPE": "flask_caching.backends.RedisCache",
+        "CACHE_REDIS_URL": os.environ.get(
+            "CLIMA_REDIS_URL", "redis://localhost:6379/0"
+        ),
+    },
+}
+cache_backend = os.environ.get("CLIMA_CACHE_BACKEND", "memory")
+if cache_backend not in cache_backends:
+    raise ValueError(
+        f"Invalid CLIMA_CACHE_BACKEND {cache_backend!r}, it has to be one of: "
+        + ", ".join(cache_backends)
+    )
+if cache_backend == "redis":
+    # redis is an optional dependency, only needed by this backend
+    try:
+        import redis  # noqa: F401
+    except ImportError:
+        raise ImportError(
+            "CLIMA_CACHE_BACKEND 'redis' requires the redis package, "
+            "install it with: pip install redis"
+        ) from None
+cache = Cache(app.server, config=cache_backends[cache_backend])
 TIMEOUT = 600
 
 app.index_string = """<!DOCTYPE html>
@@ -0,0 +1,38 @@
+// Callbacks which only change the presentation of the page, so they are run in
+// the browser instead of making a round trip to the server.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+  clima: {
+    // Switch the figures between the global and the local value ranges, using
+    // the updates stored in their layout by add_value_ranges (my_project/utils.py).
+    switch_value_ranges: function (global_local) {
+      document.querySelectorAll(".js-plotly-plot").forEach(function (graph) {
+        const meta = graph.layout && graph.layout.meta;
+        const updates =
+          meta && meta.value_ranges && meta.value_ranges[global_local];
+        if (!updates) {
+          return;
+        }
+        Object.keys(updates.traces).forEach(function (index) {
+          Plotly.restyle(graph, updates.traces[index], [Number(index)]);
+        });
+        Plotly.relayout(graph, updates.layout);
+      });
+      return global_local;
+    },
+
+    // Show the picture of the UTCI scenario selected in the outdoor comfort tab.
+    utci_scenario_image: function (value) {
+      const images = {
+        utci_Sun_Wind: "sun_and_wind.png",
+        utci_Sun_noWind: "sun_no_wind.png",
+        utci_noSun_Wind: "no_sun_and_wind.png",
+      };
+      return "./assets/img/" + (images[value] || "no_sun_no_wind.png");
+    },
+
+    // The dew point filter button is disabled unless condensation is enabled.
+    disable_dpt_filter: function (state_checklist) {
+      return state_checklist.length !== 1;
+    },
+  },
+});
@@ -1,10 +1,10 @@
 import dash_bootstrap_components as dbc
 from dash import html, dcc
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash
 import os
 
-from my_project.layout import banner, build_tabs, footer
+from my_project.layout import TABS, banner, build_tabs, footer
 from my_project.tab_wind.app_wind import layout_wind
 from my_project.tab_sun.app_sun import layout_sun
 from my_project.tab_select.app_select import layout_select
@@ -17,6 +17,7 @@ from my_project.tab_natural_ventilation.app_natural_ventilation import (
 )
 from my_project.tab_summary.app_summary import layout_summary
 from my_project.page_changelog.app_changelog import changelog
+from my_project.utils import parse_permalink
 
 from app import app
 
@@ -38,14 +39,26 @@ app.layout = dbc.Container(
 @app.callback(
     dash.dependencies.Output("page-content", "children"),
     [dash.dependencies.Input("url", "pathname")],
+    [dash.dependencies.State("url", "search")],
 )
-def display_page(pathname):
+def display_page(pathname, search):
     if pathname == "/":
-        return build_tabs()
+        tab = "tab-" + str(parse_permalink(search).get("tab"))
+        # unknown tabs of stale or edited permalinks open the first tab instead
+        return build_tabs(tab if tab in TABS else "tab-select")
     elif pathname == "/changelog":
         return html.Div(children=[changelog()])
 
 
+# Switch the value ranges of the figures without rebuilding them
+app.clientside_callback(
+    ClientsideFunction(namespace="clima", function_name="switch_value_ranges"),
+    Output("global-local-store", "data"),
+    Input("global-local-radio-input", "value"),
+    prevent_initial_call=True,
+)
+
+
 # Handle tab selection
 @app.callback(
     Output("tabs-content", "children"),
@@ -0,0 +1,425 @@
+import json
+import threading
+import warnings
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from my_project.extract_df import freeze_df
+from my_project.global_scheme import mapping_dictionary
+
+
+class Location(NamedTuple):
+    """Information about the location of an EPW file."""
+
+    url: str
+    city: str
+    state: str
+    country: str
+    lat: float
+    lon: float
+    time_zone: float
+    site_elevation: float
+    period: Optional[str] = None
+
+    @classmethod
+    def from_meta(cls, meta):
+        """Return the location from the dictionary returned by get_location_info."""
+        return cls(
+            url=meta["url"],
+            city=meta["city"],
+            state=meta["state"],
+            country=meta["country"],
+            lat=float(meta["lat"]),
+            lon=float(meta["lon"]),
+            time_zone=float(meta["time_zone"]),
+            site_elevation=float(meta["site_elevation"]),
+            period=meta["period"],
+        )
+
+
+# statistics of the cube, named as in DataFrame.describe
+STATISTICS = ["count", "mean", "std", "min", "1%", "25%", "50%", "75%", "99%", "max"]
+PERCENTILES = [1, 25, 50, 75, 99]
+# columns of the time of the rows, which are not summarized
+TIME_COLUMNS = ["year", "month", "day", "hour", "DOY"]
+COUNT, MIN, MAX = (STATISTICS.index(name) for name in ["count", "min", "max"])
+# number of results of queries with user-defined parameters kept by a dataset
+MAX_QUERIES = 16
+
+
+def group_statistics(values, groups, n_groups):
+    """Return the statistics of the columns of values in each group, as an array
+    of shape (n_groups, len(STATISTICS), n_columns). NaNs are ignored.
+
+    The values are scattered into a (group, position, column) array padded with
+    NaNs and sorted along the positions, so that all the statistics of all the
+    groups and columns are computed at once. Percentiles are interpolated
+    linearly, as pandas does.
+    """
+    counts = np.bincount(groups, minlength=n_groups)
+    order = np.argsort(groups, kind="stable")
+    position = np.arange(len(groups)) - np.repeat(np.cumsum(counts) - counts, counts)
+    padded = np.full((n_groups, counts.max(), values.shape[1]), np.nan)
+    padded[groups[order], position] = values[order]
+    # NaNs are sorted last, hence the valid values of each group come first
+    padded.sort(axis=1)
+
+    count = (~np.isnan(padded)).sum(axis=1)
+    last = np.maximum(count - 1, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.nansum(padded, axis=1)
+        mean = np.where(count > 0, total / count, np.nan)
+        squares = np.nansum((padded - mean[:, None, :]) ** 2, axis=1)
+        std = np.where(count > 1, np.sqrt(squares / (count - 1)), np.nan)
+    statistics = [count, mean, std, padded[:, 0]]
+    for percentile in PERCENTILES:
+        rank = last * percentile / 100
+        low = np.floor(rank).astype(int)
+        high = np.ceil(rank).astype(int)
+        value_low = np.take_along_axis(padded, low[:, None, :], axis=1)[:, 0]
+        value_high = np.take_along_axis(padded, high[:, None, :], axis=1)[:, 0]
+        statistics.append(value_low + (value_high - value_low) * (rank - low))
+    statistics.append(np.take_along_axis(padded, last[:, None, :], axis=1)[:, 0])
+    return np.stack(statistics, axis=1)
+
+
+def statistics_cube(df):
+    """Return the statistics of every numeric variable by month and hour, by month
+    and over the whole year, as DataFrames whose columns are (var, statistic)."""
+    numeric = df.select_dtypes("number")
+    values = numeric.to_numpy(dtype=float)
+    month = df["month"].to_numpy().astype(int)
+    hour = df["hour"].to_numpy().astype(int)
+    columns = pd.MultiIndex.from_product([numeric.columns, STATISTICS])
+
+    def table(groups, n_groups, index):
+        data = group_statistics(values, groups, n_groups)
+        # (group, statistic, var) to (group, var, statistic)
+        data = data.transpose(0, 2, 1).reshape(n_groups, -1)
+        return pd.DataFrame(data, index=index, columns=columns)
+
+    return {
+        "month_hour": table(
+            (month - 1) * 24 + hour - 1,
+            12 * 24,
+            pd.MultiIndex.from_product(
+                [range(1, 13), range(1, 25)], names=["month", "hour"]
+            ),
+        ),
+        "month": table(month - 1, 12, pd.Index(range(1, 13), name="month")),
+        "year": table(np.zeros(len(df), dtype=int), 1, pd.Index(["Year"])),
+    }
+
+
+def daily_table(df):
+    """Return the minimum, maximum and mean of each day of every numeric variable.
+
+    The hourly values of each variable are reshaped into a (day, hour) array, so
+    the statistics of all the days are computed at once.
+    """
+    n_days = -(-len(df) // 24)
+    numeric = df.select_dtypes("number")
+    columns = {}
+    for var in numeric.columns:
+        values = numeric[var].to_numpy()
+        if len(values) < n_days * 24:
+            values = np.append(
+                values.astype(float), np.full(n_days * 24 - len(values), np.nan)
+            )
+        days = values.reshape(n_days, 24)
+        with warnings.catch_warnings():
+            # the days without values have NaN statistics
+            warnings.simplefilter("ignore", RuntimeWarning)
+            columns[(var, "min")] = np.nanmin(days, axis=1)
+            columns[(var, "max")] = np.nanmax(days, axis=1)
+            columns[(var, "mean")] = np.nanmean(days, axis=1)
+    dates = df["UTC_time"].dt.strftime("%Y-%m-%d").to_numpy()[::24]
+    return pd.DataFrame(columns, index=pd.Index(dates, name="date"))
+
+
+class DegreeDays:
+    """Monthly heating and cooling degree days of a temperature series, for any
+    base temperature.
+
+    The values of each month are sorted once and stored with their cumulative
+    sums, so the degree days of an array of base temperatures are found with a
+    binary search, without scanning the hourly values again.
+    """
+
+    __slots__ = ("values", "cumsum", "starts")
+
+    def __init__(self, temperature, month, n_months=12):
+        keep = ~np.isnan(temperature)
+        temperature, month = temperature[keep], month[keep] - 1
+        order = np.lexsort((temperature, month))
+        self.values = temperature[order]
+        self.cumsum = np.concatenate([[0], np.cumsum(self.values)])
+        self.starts = np.searchsorted(month[order], np.arange(n_months + 1))
+
+    def _split(self, base):
+        """Return the number and the sum of the values lower than or equal to each
+        base temperature, arrays of shape (base, month)."""
+        base = np.atleast_1d(np.asarray(base, dtype=float))
+        n_months = len(self.starts) - 1
+        below = np.empty((len(base), n_months), dtype=int)
+        for i, (start, end) in enumerate(zip(self.starts[:-1], self.starts[1:])):
+            below[:, i] = start + np.searchsorted(self.values[start:end], base, "right")
+        return base, below
+
+    def heating(self, base):
+        """Return the heating degree days of each month for each base
+        temperature, negative as in the summary chart."""
+        base, below = self._split(base)
+        count = below - self.starts[:-1]
+        total = self.cumsum[below] - self.cumsum[self.starts[:-1]]
+        return (total - count * base[:, None]) / 24
+
+    def cooling(self, base):
+        """Return the cooling degree days of each month for each base temperature."""
+        base, below = self._split(base)
+        count = self.starts[1:] - below
+        total = self.cumsum[self.starts[1:]] - self.cumsum[below]
+        return (total - count * base[:, None]) / 24
+
+
+class LocationSummary:
+    """Summary of every variable of mapping_dictionary in a dataset: its annual
+    total, its extremes and when they occur, and its statistics (see STATISTICS)
+    in each month and over the whole year.
+
+    The totals and extremes of all the variables are found in one pass over the
+    (hour, variable) array, the statistics are read from the statistics cube.
+    """
+
+    __slots__ = (
+        "location",
+        "si_ip",
+        "variables",
+        "totals",
+        "argmin",
+        "argmax",
+        "times",
+        "statistics",
+    )
+
+    def __init__(self, df, monthly, yearly, location, si_ip):
+        self.location = location
+        self.si_ip = si_ip
+        self.variables = [
+            var
+            for var in df.select_dtypes("number").columns
+            if var in mapping_dictionary and var not in TIME_COLUMNS
+        ]
+        # selecting several columns would consolidate the read-only blocks in place
+        values = np.column_stack(
+            [df[var].to_numpy(dtype=float) for var in self.variables]
+        )
+        missing = np.isnan(values)
+        self.totals = np.where(missing, 0, values).sum(axis=0)
+        self.argmin = np.where(missing, np.inf, values).argmin(axis=0)
+        self.argmax = np.where(missing, -np.inf, values).argmax(axis=0)
+        self.times = df["UTC_time"].to_numpy()
+        # (month and year, var, statistic)
+        self.statistics = (
+            pd.concat([monthly, yearly])[self.variables]
+            .to_numpy()
+            .reshape(13, len(self.variables), len(STATISTICS))
+        )
+
+    def _index(self, var):
+        return self.variables.index(var)
+
+    def total(self, var):
+        """Return the sum of the hourly values of the year."""
+        return self.totals[self._index(var)]
+
+    @property
+    def diffuse_fraction(self):
+        """Fraction of the global horizontal radiation which is diffuse."""
+        return self.total("dif_hor_rad") / self.total("glob_hor_rad")
+
+    def describe(self, var):
+        """Return the statistics of each month (1 to 12) and of the "Year"."""
+        return pd.DataFrame(
+            self.statistics[:, self._index(var)],
+            index=pd.Index(list(range(1, 13)) + ["Year"], name="month"),
+            columns=STATISTICS,
+        )
+
+    def yearly(self, var):
+        """Return the statistics of the whole year, as a Series."""
+        return self.describe(var).loc["Year"]
+
+    def to_dict(self):
+        """Return the summary as a dictionary of lists, the values which are not
+        finite (NaN or infinite) are None, so that it is valid JSON."""
+
+        def compact(values):
+            return [
+                None if not np.isfinite(value) else float(f"{value:.6g}")
+                for value in np.asarray(values, dtype=float)
+            ]
+
+        times = pd.DatetimeIndex(self.times).strftime("%Y-%m-%dT%H:%M")
+        count = self.statistics[-1, :, COUNT]
+        variables = {}
+        for i, var in enumerate(self.variables):
+            units = mapping_dictionary[var].get(self.si_ip, mapping_dictionary[var])
+            unit = units.get("unit", "").replace("<sup>", "").replace("</sup>", "")
+            minimum, maximum = compact(self.statistics[-1, i, [MIN, MAX]])
+            variables[var] = {
+                "unit": unit,
+                "total": compact([self.totals[i]])[0],
+                "min": minimum,
+                "min_time": times[self.argmin[i]] if count[i] else None,
+                "max": maximum,
+                "max_time": times[self.argmax[i]] if count[i] else None,
+                "statistics": [compact(row) for row in self.statistics[:, i]],
+            }
+        return {
+            "location": self.location._asdict(),
+            "si_ip": self.si_ip,
+            "diffuse_fraction": compact([self.diffuse_fraction])[0],
+            "statistics": STATISTICS,
+            "months": list(range(1, 13)) + ["Year"],
+            "variables": variables,
+        }
+
+    def to_json(self):
+        """Return the summary as compact JSON."""
+        return json.dumps(self.to_dict(), separators=(",", ":"), allow_nan=False)
+
+
+class ClimaDataset:
+    """Hourly data of an EPW file, in the unit system selected by the user.
+
+    The same object is shared by all the chart callbacks, which must not modify
+    the dataframe: most of its columns are made read-only by freeze_df, and the
+    arrays returned by column() always are. The views derived from it are
+    computed the first time they are used and then reused by all the charts.
+    """
+
+    __slots__ = (
+        "dataset_id",
+        "location",
+        "si_ip",
+        "df",
+        "_arrays",
+        "_daily",
+        "_stats",
+        "_derived",
+        "_queries",
+        "_queries_lock",
+    )
+
+    def __init__(self, df, location, dataset_id, si_ip="si"):
+        self.dataset_id = dataset_id
+        self.location = location
+        self.si_ip = si_ip
+        self.df = freeze_df(df)
+        self._arrays = {}
+        self._daily = None
+        self._stats = None
+        self._derived = {}
+        self._queries = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.df)
+
+    def __getstate__(self):
+        # the derived views are not stored since they are cheap to compute
+        return self.df, self.location, self.dataset_id, self.si_ip
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def column(self, var):
+        """Return the values of a column as a contiguous read-only array."""
+        values = self._arrays.get(var)
+        if values is None:
+            values = np.ascontiguousarray(self.df[var].to_numpy())
+            values.flags.writeable = False
+            self._arrays[var] = values
+        return values
+
+    def derived(self, key, compute):
+        """Return a view derived from the data, computed by compute() the first
+        time it is requested. The key has to identify all its parameters."""
+        value = self._derived.get(key)
+        if value is None:
+            value = compute()
+            self._derived[key] = value
+        return value
+
+    def query(self, key, compute):
+        """Return the result of a query whose parameters are set by the user (e.g.
+        a filter), computed by compute() unless it is one of the MAX_QUERIES most
+        recently used. The key has to identify all its parameters.
+
+        Unlike the derived views, these are evicted since the parameters can take
+        any value and the dataset is kept in memory by the worker.
+        """
+        with self._queries_lock:
+            if key in self._queries:
+                self._queries.move_to_end(key)
+                return self._queries[key]
+        value = compute()
+        with self._queries_lock:
+            self._queries[key] = value
+            while len(self._queries) > MAX_QUERIES:
+                self._queries.popitem(last=False)
+        return value
+
+    @property
+    def daily(self):
+        """Minimum, maximum and mean of each day, columns are (var, statistic) and
+        the index is the date of the days (YYYY-MM-DD)."""
+        if self._daily is None:
+            self._daily = daily_table(self.df)
+        return self._daily
+
+    def stats(self, level):
+        """Return the statistics (see STATISTICS) of every numeric variable at the
+        "month_hour", "month" or "year" level, columns are (var, statistic).
+
+        The statistics cube is computed at once the first time it is used.
+        """
+        if self._stats is None:
+            self._stats = statistics_cube(self.df)
+        return self._stats[level]
+
+    @property
+    def summary(self):
+        """Summary of the variables of the location, see LocationSummary."""
+        return self.derived(
+            "summary",
+            lambda: LocationSummary(
+                self.df,
+                self.stats("month"),
+                self.stats("year"),
+                self.location,
+                self.si_ip,
+            ),
+        )
+
+    @property
+    def degree_days(self):
+        """Monthly heating and cooling degree days of the dry bulb temperature."""
+        return self.derived(
+            "degree_days",
+            lambda: DegreeDays(self.column("DBT").astype(float), self.column("month")),
+        )
+
+    @property
+    def monthly_profile(self):
+        """Median value of each hour of the day in each month."""
+
+        def compute():
+            median = self.stats("month_hour").xs("50%", axis=1, level=1)
+            return median.drop(columns=["month", "hour"]).reset_index()
+
+        return self.derived("monthly_profile", compute)
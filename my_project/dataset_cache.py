@@ -0,0 +1,84 @@
+import json
+import threading
+from collections import OrderedDict
+
+from app import cache, TIMEOUT
+from my_project.dataset import ClimaDataset, Location
+from my_project.extract_df import (
+    convert_data,
+    create_df,
+    get_data,
+    get_dataset_meta,
+)
+from my_project.global_scheme import mapping_dictionary
+from my_project.station_map import station_id
+
+# the datasets are kept in memory rather than in the figure cache, so that they
+# are not unpickled at every use and not evicted by the many small figures
+MAX_DATASETS = 8
+_datasets = OrderedDict()
+_datasets_lock = threading.Lock()
+
+
+def get_dataset(dataset_id, si_ip):
+    """Return the (dataset, dataset_meta) of a recently loaded EPW file in the
+    given unit system, None if it is not among the MAX_DATASETS most recent."""
+    key = (dataset_id, si_ip)
+    with _datasets_lock:
+        if key in _datasets:
+            _datasets.move_to_end(key)
+            return _datasets[key]
+    return None
+
+
+def set_dataset(dataset, dataset_meta):
+    with _datasets_lock:
+        _datasets[(dataset.dataset_id, dataset.si_ip)] = (dataset, dataset_meta)
+        while len(_datasets) > MAX_DATASETS:
+            _datasets.popitem(last=False)
+
+
+def cached_dataset(meta, si_ip, lines=None):
+    """Return the dataset of an EPW file and its summary (see get_dataset_meta).
+
+    They are built only if they are not among the recently loaded ones, keyed by
+    (dataset ID, units). If the lines of the EPW file are not provided they are
+    downloaded from meta["url"].
+    """
+    if "dataset_id" in meta:
+        cached = get_dataset(meta["dataset_id"], si_ip)
+        if cached is not None:
+            return cached
+
+    if lines is None:
+        lines = get_data(meta["url"])
+        if lines is None:
+            return None, None
+    df, location_info = create_df(lines, meta["url"])
+    return cache_dataset(df, location_info, si_ip)
+
+
+def cache_dataset(df, location_info, si_ip):
+    """Build the dataset and its summary from the dataframe returned by create_df,
+    and keep them in memory. The dataframe is converted in place to IP units
+    if needed."""
+    # computed before the conversion since missing values are flagged as 9999
+    dataset_meta = get_dataset_meta(df, location_info, si_ip)
+    if si_ip == "ip":
+        convert_data(df, json.dumps(mapping_dictionary))
+    dataset = ClimaDataset(
+        df, Location.from_meta(location_info), location_info["dataset_id"], si_ip
+    )
+    set_dataset(dataset, dataset_meta)
+    return dataset, dataset_meta
+
+
+def remember_station(meta):
+    """Store the location info of a station, so that permalinks can skip the
+    download of the EPW file."""
+    cache.set(f"station:{station_id(meta['url'])}", meta, timeout=TIMEOUT)
+
+
+def cached_station(station):
+    """Return the location info of a station if it was recently loaded."""
+    return cache.get(f"station:{station}")
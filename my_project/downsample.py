@@ -0,0 +1,51 @@
+import numpy as np
+
+# number of points sent for a line chart, about the number of pixels of its width
+VISIBLE_POINTS = 1000
+
+
+def lttb_indices(x, y, n_out):
+    """Return the indices of the points selected by the Largest-Triangle-Three-
+    Buckets algorithm, which preserves the visual shape of a line.
+
+    The first and last points are always kept, the others are split into
+    n_out - 2 buckets and from each one the point forming the largest triangle
+    with the point selected in the previous bucket and the mean of the next one
+    is kept. x has to be numeric and sorted, and y must not contain NaNs.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # the mean of each bucket, and the last point as the bucket after the last one
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[1:-1], edges[:-1] - 1) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[1:-1], edges[:-1] - 1) / counts, y[-1])
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    previous = 0
+    for i, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        # twice the area of the triangles, the constant factor is irrelevant
+        area = np.abs(
+            (x[previous] - mean_x[i + 1]) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (mean_y[i + 1] - y[previous])
+        )
+        previous = start + np.argmax(area)
+        indices[i + 1] = previous
+    return indices
+
+
+def downsample_series(x, y, x_range=None, n_out=VISIBLE_POINTS):
+    """Return the points of a time series within x_range, reduced with LTTB to
+    at most n_out points. Missing values are dropped."""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    keep = ~np.isnan(y)
+    if x_range is not None:
+        start, end = np.array(x_range, dtype=x.dtype)
+        keep &= (x >= start) & (x <= end)
+    x, y = x[keep], y[keep]
+    indices = lttb_indices(x.astype(np.int64).astype(float), y, n_out)
+    return x[indices], y[indices]
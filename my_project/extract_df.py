@@ -1,5 +1,6 @@
 import io
 import re
+import hashlib
 import json
 import zipfile
 from datetime import timedelta
@@ -45,6 +46,50 @@ def get_data(source_url):
         except:
             return None
 
+
+def get_dataset_id(lst):
+    """Return a stable ID of the EPW content, used to key the server side caches."""
+    return hashlib.sha1("\n".join(lst).encode()).hexdigest()[:16]
+
+
+def get_dataset_meta(df, location_info, si_ip):
+    """Return a small summary of the loaded dataset.
+
+    It is stored in the browser so that callbacks which only need to know whether
+    data are loaded, and which variables are available, do not need the dataframe.
+    Columns missing from the EPW file are filled with 9999 by create_df.
+    """
+    return {
+        "dataset_id": location_info["dataset_id"],
+        "rows": len(df),
+        "si_ip": si_ip,
+        "columns": [
+            col
+            for col in mapping_dictionary
+            if col in df.columns and not (df[col] == 9999).all()
+        ],
+    }
+
+
+def freeze_df(df):
+    """Make the values of the dataframe read-only, in place.
+
+    The chart callbacks have to filter the data with masks rather than overwriting
+    them, so the same dataframe can be safely shared between callbacks.
+    Only public APIs are used: the arrays which to_numpy returns, and the arrays
+    they are views of, are made read-only. This protects most numeric columns,
+    but not those whose to_numpy is a copy (e.g. dates with a time zone and
+    categories), so it is a safeguard only. The arrays of ClimaDataset.column
+    are always read-only.
+    """
+    for col in df.columns:
+        values = df[col].to_numpy()
+        while isinstance(values, np.ndarray):
+            values.flags.writeable = False
+            values = values.base
+    return df
+
+
 @code_timer
 def get_location_info(lst, file_name):
     """Extract and clean the data. Return a pandas data from a url."""
@@ -60,6 +105,7 @@ def get_location_info(lst, file_name):
         "state": meta[2],
         "country": meta[3],
         "period": None,
+        "dataset_id": get_dataset_id(lst),
     }
 
      # from OneClimaBuilding files extract info about reference years
@@ -85,6 +131,7 @@ def create_df(lst, file_name):
         "state": meta[2],
         "country": meta[3],
         "period": None,
+        "dataset_id": get_dataset_id(lst),
     }
 
     # from OneClimaBuilding files extract info about reference years
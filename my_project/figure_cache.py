@@ -0,0 +1,48 @@
+import hashlib
+import json
+
+from plotly.utils import PlotlyJSONEncoder
+
+from app import cache, TIMEOUT
+from my_project.figure_encoding import encode_figure
+
+
+def figure_cache_key(dataset_id, chart_id, params):
+    """Return the cache key of a chart given the dataset ID and its parameters."""
+    normalized = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+    return f"figure:{dataset_id}:{chart_id}:{digest}"
+
+
+def figure_to_json(fig):
+    """Serialize a figure with its data arrays encoded as typed arrays."""
+    return json.dumps(encode_figure(fig), cls=PlotlyJSONEncoder)
+
+
+def encoded_figure(fig):
+    """Return a figure as a dict, as cached_figure does, without caching it."""
+    return json.loads(figure_to_json(fig))
+
+
+def cached_figure(dataset, chart_id, build, **params):
+    """Return the figure of a chart as a dict, building it only on a cache miss.
+
+    The figure is stored as serialized JSON, with the data arrays encoded by
+    encode_figure, and keyed by (dataset ID, chart ID, normalized parameters),
+    so it is never necessary to hash the dataframe.
+    All the parameters which change the figure have to be passed as keywords.
+    Figures which could not be built (build returns None) are not cached.
+    """
+    if dataset is None:
+        fig = build()
+        return None if fig is None else encoded_figure(fig)
+
+    key = figure_cache_key(dataset.dataset_id, chart_id, params)
+    fig_json = cache.get(key)
+    if fig_json is None:
+        fig = build()
+        if fig is None:
+            return None
+        fig_json = figure_to_json(fig)
+        cache.set(key, fig_json, timeout=TIMEOUT)
+    return json.loads(fig_json)
@@ -0,0 +1,92 @@
+import base64
+
+import numpy as np
+
+# arrays shorter than this are sent as plain JSON lists
+MIN_ENCODED_SIZE = 64
+
+# maximum relative error introduced by storing float values as float32
+FLOAT32_RTOL = 1e-6
+
+# the typed arrays supported by plotly.js, by numpy dtype
+PLOTLY_DTYPES = {
+    np.dtype("float64"): "f8",
+    np.dtype("float32"): "f4",
+    np.dtype("int32"): "i4",
+    np.dtype("uint32"): "u4",
+    np.dtype("int16"): "i2",
+    np.dtype("uint16"): "u2",
+    np.dtype("int8"): "i1",
+    np.dtype("uint8"): "u1",
+}
+
+
+def compact_array(values):
+    """Return the values in the smallest dtype which represents them faithfully.
+
+    Floats are stored as float32 if the relative error is below FLOAT32_RTOL,
+    integers in the smallest integer type that can hold their range.
+    """
+    if values.dtype.kind == "f":
+        # values out of the float32 range overflow to inf, and are then not close
+        with np.errstate(over="ignore", invalid="ignore"):
+            values32 = values.astype(np.float32)
+            if np.allclose(values32, values, rtol=FLOAT32_RTOL, atol=0, equal_nan=True):
+                return values32
+        return values.astype(np.float64)
+
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32):
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return values.astype(dtype)
+    return values.astype(np.float64)
+
+
+def encode_array(values):
+    """Return a numeric array as a plotly.js base64 typed array.
+
+    Arrays which are short or not numeric (e.g. strings, dates) are returned
+    unchanged.
+    """
+    if isinstance(values, (list, tuple)):
+        if not values or not all(
+            isinstance(value, (int, float)) and not isinstance(value, bool)
+            for value in values
+        ):
+            return values
+        array = np.asarray(values)
+    else:
+        array = values
+    if array.size < MIN_ENCODED_SIZE or array.dtype.kind not in "iuf":
+        return values
+
+    array = compact_array(array)
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    encoded = {
+        "dtype": PLOTLY_DTYPES[array.dtype.newbyteorder("=")],
+        "bdata": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+    if array.ndim > 1:
+        encoded["shape"] = ",".join(str(n) for n in array.shape)
+    return encoded
+
+
+def _encode(obj):
+    if isinstance(obj, dict):
+        return {key: _encode(value) for key, value in obj.items()}
+    if isinstance(obj, np.ndarray):
+        return encode_array(obj)
+    if isinstance(obj, (list, tuple)):
+        if obj and all(isinstance(value, dict) for value in obj):
+            return [_encode(value) for value in obj]
+        return encode_array(obj)
+    return obj
+
+
+def encode_figure(fig):
+    """Return the plotly JSON of a figure with its numeric data arrays encoded as
+    base64 typed arrays (float32 where precision allows), which are much smaller
+    and faster to parse than numbers printed as text."""
+    fig_dict = fig.to_plotly_json()
+    fig_dict["data"] = [_encode(trace) for trace in fig_dict["data"]]
+    return fig_dict
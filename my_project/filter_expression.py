@@ -0,0 +1,261 @@
+import functools
+import operator
+import re
+
+import numpy as np
+
+from my_project.global_scheme import mapping_dictionary
+from my_project.utils import data_filter_mask
+
+COMPARISONS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+# the comparison obtained by swapping the operands, e.g. 18 <= DBT is DBT >= 18
+SWAPPED = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "==", "!=": "!="}
+
+TOKEN_RE = re.compile(
+    r"\s*(?:(?P<number>-?(?:\d+(?:\.\d+)?|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<op><=|>=|==|!=|<|>)"
+    r"|(?P<paren>[()])"
+    r"|(?P<range>–|\.\.|-)"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_]*))"
+)
+KEYWORDS = {"and", "or", "not", "to"}
+# the names of the kinds of tokens in the error messages
+TOKEN_NAMES = {
+    "number": "a number",
+    "op": "a comparison",
+    "range": "'to'",
+    "word": "a variable",
+}
+
+
+def tokenize(expression):
+    """Return the (kind, text) tokens of a filter expression."""
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN_RE.match(expression, position)
+        if match is None or match.end() == position:
+            raise ValueError(
+                f"Invalid filter expression: unexpected {expression[position:]!r}"
+            )
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "word" and text.lower() in KEYWORDS:
+            kind, text = "keyword", text.lower()
+        tokens.append((kind, text))
+        position = match.end()
+    return tokens
+
+
+class Parser:
+    """Recursive descent parser of the filter expressions.
+
+    An expression combines conditions on the variables of mapping_dictionary with
+    and, or, not and parentheses. A condition is either a comparison with a number
+    (RH < 60, 18 <= DBT <= 26) or an inclusive range (DBT 18 to 26, DBT 18–26,
+    DBT -10 - -5), whose bounds are swapped if the first is the greater.
+    The result is a tree of tuples: ("and", left, right), ("or", left, right),
+    ("not", node) and ("cmp", variable, operator, value).
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def take(self, kind, text=None):
+        token_kind, token_text = self.peek()
+        if token_kind != kind or (text is not None and token_text != text):
+            found = "the end" if token_kind is None else repr(token_text)
+            raise ValueError(
+                "Invalid filter expression: expected "
+                f"{text or TOKEN_NAMES[kind]}, found {found}"
+            )
+        self.position += 1
+        return token_text
+
+    def parse(self):
+        node = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(
+                f"Invalid filter expression: unexpected {self.peek()[1]!r}"
+            )
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ("keyword", "or"):
+            self.position += 1
+            node = ("or", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ("keyword", "and"):
+            self.position += 1
+            node = ("and", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == ("keyword", "not"):
+            self.position += 1
+            return ("not", self.parse_not())
+        if self.peek() == ("paren", "("):
+            self.position += 1
+            node = self.parse_or()
+            self.take("paren", ")")
+            return node
+        return self.parse_condition()
+
+    def parse_number(self):
+        return float(self.take("number"))
+
+    def parse_variable(self):
+        variable = self.take("word")
+        if variable not in mapping_dictionary or variable == "None":
+            raise ValueError(
+                f"Invalid filter expression: unknown variable {variable!r}"
+            )
+        return variable
+
+    def parse_condition(self):
+        if self.peek()[0] == "number":
+            # 18 <= DBT or 18 <= DBT <= 26
+            low = self.parse_number()
+            low_op = SWAPPED[self.take("op")]
+            variable = self.parse_variable()
+            node = ("cmp", variable, low_op, low)
+            if self.peek()[0] == "op":
+                node = (
+                    "and",
+                    node,
+                    ("cmp", variable, self.take("op"), self.parse_number()),
+                )
+            return node
+
+        variable = self.parse_variable()
+        kind, _ = self.peek()
+        if kind == "op":
+            return ("cmp", variable, self.take("op"), self.parse_number())
+        low = self.parse_number()
+        kind, text = self.peek()
+        if kind == "number" and text.startswith("-"):
+            # DBT 18-26, tokenized as 18 and -26
+            self.position += 1
+            high = float(text[1:])
+        else:
+            if (kind, text) == ("keyword", "to"):
+                self.position += 1
+            else:
+                self.take("range")
+            high = self.parse_number()
+        low, high = sorted([low, high])
+        return ("and", ("cmp", variable, ">=", low), ("cmp", variable, "<=", high))
+
+
+def node_text(node, parent=None):
+    """Return the normalized text of an expression tree."""
+    kind = node[0]
+    if kind == "cmp":
+        _, variable, op, value = node
+        return f"{variable} {op} {value:g}"
+    if kind == "not":
+        return f"not {node_text(node[1], 'not')}"
+    text = f"{node_text(node[1], kind)} {kind} {node_text(node[2], kind)}"
+    return f"({text})" if parent not in (None, kind) else text
+
+
+def node_variables(node):
+    if node[0] == "cmp":
+        return {node[1]}
+    return set().union(*(node_variables(child) for child in node[1:]))
+
+
+class FilterExpression:
+    """A parsed and validated filter expression, which computes the mask of the
+    rows of a dataset that satisfy it. The rows in which a variable is missing
+    satisfy neither a condition on it nor its negation."""
+
+    __slots__ = ("tree", "text", "variables")
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.text = node_text(tree)
+        self.variables = sorted(node_variables(tree))
+
+    def _evaluate(self, node, columns):
+        kind = node[0]
+        if kind == "cmp":
+            _, variable, op, value = node
+            mask = COMPARISONS[op](columns[variable], value)
+            if op == "!=":
+                # NaN != value is True
+                mask &= ~np.isnan(columns[variable])
+            return mask
+        if kind == "not":
+            mask = ~self._evaluate(node[1], columns)
+            # the rows with missing values are excluded again
+            for variable in node_variables(node[1]):
+                mask &= ~np.isnan(columns[variable])
+            return mask
+        mask = self._evaluate(node[1], columns)
+        other = self._evaluate(node[2], columns)
+        return (
+            np.logical_and(mask, other, out=mask)
+            if kind == "and"
+            else np.logical_or(mask, other, out=mask)
+        )
+
+    def mask(self, dataset):
+        """Return the boolean mask of the rows of the dataset which satisfy the
+        expression, kept by the dataset while it is among the recent queries."""
+
+        def compute():
+            columns = {}
+            for variable in self.variables:
+                if (
+                    variable not in dataset.df
+                    or dataset.df[variable].dtype.kind not in "iuf"
+                ):
+                    raise ValueError(
+                        f"Invalid filter expression: {variable!r} is not numeric"
+                    )
+                columns[variable] = dataset.column(variable)
+            with np.errstate(invalid="ignore"):
+                mask = self._evaluate(self.tree, columns)
+            mask.flags.writeable = False
+            return mask
+
+        return dataset.query(("filter_expression", self.text), compute)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_filter(expression):
+    """Return the FilterExpression of a text, which is parsed only the first time
+    it is used. ValueError is raised if the expression is not valid."""
+    tokens = tokenize(expression)
+    if not tokens:
+        raise ValueError("Invalid filter expression: it is empty")
+    return FilterExpression(Parser(tokens).parse())
+
+
+def data_filter_rows(dataset, data_filter_info):
+    """Return the mask of the rows within the data filter of the Data Explorer,
+    given as [enabled, variable, min, max, expression]. The expression is used if
+    it is given, otherwise the range of the variable."""
+    _, filter_var, min_val, max_val, *expression = data_filter_info
+    if expression and expression[0]:
+        return compile_filter(expression[0]).mask(dataset)
+    return data_filter_mask(dataset.df, filter_var, min_val, max_val).to_numpy()
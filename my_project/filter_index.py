@@ -0,0 +1,72 @@
+import numpy as np
+
+
+def invert_ranges(month, hour, invert_month, invert_hour):
+    """Return the (start, end) month and hour ranges of the sliders, swapped if
+    they are inverted, unless they span the whole year or day."""
+    if invert_month == ["invert"] and tuple(month) != (1, 12):
+        month = month[::-1]
+    if invert_hour == ["invert"] and tuple(hour) != (1, 24):
+        hour = hour[::-1]
+    return list(month), list(hour)
+
+
+def determine_month_and_hour_filter(month, hour, invert_month, invert_hour):
+    month, hour = invert_ranges(month, hour, invert_month, invert_hour)
+    return month[0], month[1], hour[0], hour[1]
+
+
+def range_selection(start, end, n, inclusive=False):
+    """Return a boolean array which is True for the values 1 to n within the
+    range. If the start is after the end, the values between the two are
+    excluded, and so are the start and the end unless inclusive is True."""
+    values = np.arange(1, n + 1)
+    if start <= end:
+        return (values >= start) & (values <= end)
+    if inclusive:
+        return (values <= end) | (values >= start)
+    return (values < end) | (values > start)
+
+
+class FilterIndex:
+    """Rows of each month and each hour of a dataset, stored as packed bitsets.
+
+    The rows of any selection of months and hours are then found by OR-ing the
+    bitsets of the months, and of the hours, and AND-ing the two, which is much
+    cheaper than comparing the month and hour columns.
+    """
+
+    __slots__ = ("n_rows", "month_bits", "hour_bits")
+
+    def __init__(self, month, hour):
+        self.n_rows = len(month)
+        self.month_bits = np.packbits(month == np.arange(1, 13)[:, None], axis=1)
+        self.hour_bits = np.packbits(hour == np.arange(1, 25)[:, None], axis=1)
+
+    def mask(self, months, hours):
+        """Return the boolean mask of the rows in the selected months and hours,
+        given as boolean arrays of length 12 and 24."""
+        bits = np.bitwise_or.reduce(self.month_bits[months], axis=0)
+        bits &= np.bitwise_or.reduce(self.hour_bits[hours], axis=0)
+        return np.unpackbits(bits, count=self.n_rows).astype(bool)
+
+    def time_mask(self, start_month, end_month, start_hour, end_hour):
+        """Return the boolean mask of the rows in the months and hours ranges."""
+        return self.mask(
+            range_selection(start_month, end_month, 12),
+            range_selection(start_hour, end_hour, 24),
+        )
+
+
+def filter_index(dataset):
+    """Return the FilterIndex of a dataset, built the first time it is used."""
+    return dataset.derived(
+        "filter_index",
+        lambda: FilterIndex(dataset.column("month"), dataset.column("hour")),
+    )
+
+
+def time_filter_mask(dataset, start_month, end_month, start_hour, end_hour):
+    """Return a boolean mask which is True for the rows in the selected months and
+    hours. If the start is after the end, the rows between the two are excluded."""
+    return filter_index(dataset).time_mask(start_month, end_month, start_hour, end_hour)
@@ -100,6 +100,11 @@ def banner():
                                 id="banner-subtitle",
                                 children=["Current Location:"],
                             ),
+                            html.A(
+                                id="permalink",
+                                children=["Link to this analysis"],
+                                style={"display": "none"},
+                            ),
                         ],
                     ),
                     dbc.Col(
@@ -123,6 +128,8 @@ def banner():
                                         id="global-local-radio-input",
                                         inline=True,
                                     ),
+                                    # value ranges applied client-side to the figures
+                                    dcc.Store(id="global-local-store"),
                                 ],
                             ),
                             dbc.Row(
@@ -148,15 +155,29 @@ def banner():
     )
 
 
-def build_tabs():
-    """Build the seven different tabs."""
+# values of the tabs, which can be selected by a permalink
+TABS = [
+    "tab-select",
+    "tab-summary",
+    "tab-t-rh",
+    "tab-sun",
+    "tab-wind",
+    "tab-psy-chart",
+    "tab-natural-ventilation",
+    "tab-outdoor-comfort",
+    "tab-data-explorer",
+]
+
+
+def build_tabs(tab="tab-select"):
+    """Build the seven different tabs, with the given tab selected."""
     return html.Div(
         id="tabs-container",
         children=[
             dcc.Tabs(
                 id="tabs",
                 parent_className="custom-tabs",
-                value="tab-select",
+                value=tab,
                 children=[
                     dcc.Tab(
                         label="Select Weather File",
@@ -248,7 +269,9 @@ def store():
                     dcc.Store(id="meta-store", storage_type="session"),
                     dcc.Store(id="url-store", storage_type="session"),
                     dcc.Store(id="si-ip-unit-store", storage_type="session"),
+                    dcc.Store(id="dataset-meta-store", storage_type="session"),
                     dcc.Store(id="lines-store", storage_type="session"),
+                    dcc.Store(id="permalink-store", storage_type="session"),
                 ],
                 fullscreen=True,
                 type="dot",
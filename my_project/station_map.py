@@ -0,0 +1,321 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+from my_project.figure_encoding import encode_figure
+
+# the data files of the catalog, which is parsed again if any of them changes
+ONE_BUILDING_FILE = "./assets/data/one_building.csv"
+ENERGYPLUS_FILE = "./assets/data/epw_location.json"
+# number of stations of epw_location.json shown on the map
+ENERGYPLUS_STATIONS = 2585
+# fields of the Climate.OneBuilding.org stations shown when hovering on them
+ONE_BUILDING_FIELDS = [
+    "period",
+    "elevation (m)",
+    "time zone (GMT)",
+    "99% Heating DB",
+    "1% Cooling DB ",
+    "Source",
+]
+
+# the stations in the viewport are clustered if there are more than this
+MAX_STATIONS = 1000
+# approximate width of the area of a cluster on the map, in pixels
+CLUSTER_PIXELS = 48
+# size of the cells of the spatial index, in degrees
+INDEX_CELL_SIZE = 1
+
+MAP_ZOOM = 2
+MAP_HEIGHT = 500
+# width of the map assumed when the viewport bounds are not known, in pixels
+MAP_WIDTH = 1200
+
+
+def degrees_per_pixel(zoom):
+    """Return the longitude span of a pixel of a web mercator map."""
+    return 360 / (512 * 2**zoom)
+
+
+class StationIndex:
+    """Grid index of the positions of the stations, to find those within a
+    viewport without scanning all of them.
+
+    The stations are sorted by their cell in a regular grid, row by row, so the
+    stations in a range of cells of a row are contiguous.
+    """
+
+    def __init__(self, lon, lat, cell_size=INDEX_CELL_SIZE):
+        self.lon = lon
+        self.lat = lat
+        self.cell_size = cell_size
+        self.n_cols = int(np.ceil(360 / cell_size))
+        self.n_rows = int(np.ceil(180 / cell_size))
+        cells = self._row(lat) * self.n_cols + self._col(lon)
+        self.order = np.argsort(cells, kind="stable")
+        self.cells = cells[self.order]
+
+    def _col(self, lon):
+        col = np.floor((np.asarray(lon) + 180) / self.cell_size).astype(int)
+        return np.clip(col, 0, self.n_cols - 1)
+
+    def _row(self, lat):
+        row = np.floor((np.asarray(lat) + 90) / self.cell_size).astype(int)
+        return np.clip(row, 0, self.n_rows - 1)
+
+    def query(self, west, east, south, north):
+        """Return the indices of the stations within the bounds, in ascending
+        order. If west is greater than east the bounds cross the antimeridian."""
+        if west <= east:
+            lon_ranges = [(west, east)]
+        else:
+            lon_ranges = [(west, 180), (-180, east)]
+        rows = np.arange(self._row(south), self._row(north) + 1) * self.n_cols
+        candidates = []
+        for low, high in lon_ranges:
+            starts = np.searchsorted(self.cells, rows + self._col(low), "left")
+            ends = np.searchsorted(self.cells, rows + self._col(high), "right")
+            candidates += [self.order[start:end] for start, end in zip(starts, ends)]
+        candidates = np.concatenate(candidates)
+
+        lon, lat = self.lon[candidates], self.lat[candidates]
+        if west <= east:
+            keep = (lon >= west) & (lon <= east)
+        else:
+            keep = (lon >= west) | (lon <= east)
+        keep &= (lat >= south) & (lat <= north)
+        return np.sort(candidates[keep])
+
+
+def station_id(url):
+    """Return the ID of a weather station, i.e. the name of its EPW file."""
+    return os.path.splitext(os.path.basename(url))[0]
+
+
+class StationCatalog:
+    """The weather stations shown on the map, parsed once from the data files.
+
+    The stations table has the Climate.OneBuilding.org stations followed by the
+    EnergyPlus ones, and it comes with the spatial index of their positions and
+    the URL of the EPW file of each station ID.
+    """
+
+    __slots__ = ("version", "stations", "index", "urls", "_initial_figure")
+
+    def __init__(self, version):
+        self.version = version
+        df_one_building = pd.read_csv(ONE_BUILDING_FILE, compression="gzip")
+        df_one_building["group"] = "one_building"
+
+        with open(ENERGYPLUS_FILE, encoding="utf8") as data_file:
+            data = json.load(data_file)
+        features = data["features"][:ENERGYPLUS_STATIONS]
+        df_energyplus = pd.DataFrame(
+            {
+                "lon": [feature["geometry"]["coordinates"][0] for feature in features],
+                "lat": [
+                    feature["geometry"]["coordinates"][1] + 0.01 for feature in features
+                ],
+                "name": [feature["properties"]["title"] for feature in features],
+                "Source": [feature["properties"]["epw"] for feature in features],
+                "group": "energyplus",
+            }
+        )
+
+        stations = pd.concat([df_one_building, df_energyplus], ignore_index=True)
+        stations["group"] = stations["group"].astype("category")
+        stations["url"] = stations["Source"].str.extract(r'href=[\'"]?([^\'" >]+)')[0]
+        self.stations = stations
+        self.index = StationIndex(
+            stations["lon"].to_numpy(), stations["lat"].to_numpy()
+        )
+
+        # the EnergyPlus file of a station is used if it is in both the sources
+        n_one_building = len(df_one_building)
+        self.urls = {}
+        for url in pd.concat(
+            [stations["url"][n_one_building:], stations["url"][:n_one_building]]
+        ):
+            self.urls.setdefault(station_id(url), url)
+        self._initial_figure = None
+
+    def initial_figure(self):
+        """Return the initial map figure, serialized the first time it is used."""
+        if self._initial_figure is None:
+            self._initial_figure = json.dumps(
+                encode_figure(station_map_figure(catalog=self)), cls=PlotlyJSONEncoder
+            )
+        return json.loads(self._initial_figure)
+
+
+def catalog_version():
+    """Return the modification time and size of the data files of the catalog."""
+    return tuple(
+        (os.stat(path).st_mtime_ns, os.stat(path).st_size)
+        for path in (ONE_BUILDING_FILE, ENERGYPLUS_FILE)
+    )
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def station_catalog():
+    """Return the station catalog, which is parsed again only if its data files
+    changed since it was loaded."""
+    global _catalog
+    version = catalog_version()
+    if _catalog is None or _catalog.version != version:
+        with _catalog_lock:
+            if _catalog is None or _catalog.version != version:
+                _catalog = StationCatalog(version)
+    return _catalog
+
+
+def station_urls():
+    """Return the URL of the EPW file of each station shown on the map."""
+    return station_catalog().urls
+
+
+def default_center(stations):
+    """Return the initial center of the map, the mean position of the stations."""
+    one_building = stations[stations["group"] == "one_building"]
+    return {"lat": one_building["lat"].mean(), "lon": one_building["lon"].mean()}
+
+
+def view_bounds(center, zoom):
+    """Return the (west, east, south, north) bounds of a map of MAP_WIDTH x
+    MAP_HEIGHT pixels, given its center and zoom."""
+    half_width = MAP_WIDTH / 2 * degrees_per_pixel(zoom)
+    # the latitude span is approximated, the stations are filtered server-side
+    half_height = MAP_HEIGHT * degrees_per_pixel(zoom)
+    return wrap_bounds(
+        center["lon"] - half_width,
+        center["lon"] + half_width,
+        max(center["lat"] - half_height, -90),
+        min(center["lat"] + half_height, 90),
+    )
+
+
+def wrap_bounds(west, east, south, north):
+    """Return the bounds with the longitudes wrapped to [-180, 180]."""
+    if east - west >= 360:
+        return -180, 180, south, north
+    west = (west + 180) % 360 - 180
+    east = (east + 180) % 360 - 180
+    return west, east, south, north
+
+
+def map_viewport(relayout_data):
+    """Return the center, zoom and bounds of the map given its relayoutData,
+    None if the view did not change."""
+    if "mapbox.center" not in relayout_data:
+        return None
+    center = relayout_data["mapbox.center"]
+    zoom = relayout_data.get("mapbox.zoom", MAP_ZOOM)
+    corners = relayout_data.get("mapbox._derived", {}).get("coordinates")
+    if not corners:
+        return center, zoom, view_bounds(center, zoom)
+    lons = [corner[0] for corner in corners]
+    lats = [corner[1] for corner in corners]
+    return center, zoom, wrap_bounds(min(lons), max(lons), min(lats), max(lats))
+
+
+def station_traces(stations):
+    """Return the markers of the stations, hovering on them shows their details
+    and clicking on them selects their EPW file."""
+    traces = []
+    for group, fields, color in [
+        ("one_building", ONE_BUILDING_FIELDS, "#4895ef"),
+        ("energyplus", ["Source"], "#3a0ca3"),
+    ]:
+        df = stations[stations["group"] == group]
+        traces.append(
+            go.Scattermapbox(
+                lat=df["lat"],
+                lon=df["lon"],
+                mode="markers",
+                marker_color=color,
+                hovertext=df["name"],
+                customdata=df[fields],
+                hovertemplate="<b>%{hovertext}</b><br><br>lat=%{lat}<br>lon=%{lon}"
+                + "".join(
+                    f"<br>{field}=%{{customdata[{i}]}}"
+                    for i, field in enumerate(fields)
+                )
+                + "<extra></extra>",
+                name="",
+                showlegend=False,
+            )
+        )
+    return traces
+
+
+def station_map_figure(center=None, zoom=MAP_ZOOM, bounds=None, catalog=None):
+    """Return the map of the weather stations within the bounds of the viewport.
+
+    If there are more than MAX_STATIONS the nearby stations are grouped in
+    clusters, whose size depends on the zoom, so that the figure carries at most
+    a few thousand points. Zooming in or clicking on a cluster shows its stations.
+    """
+    if catalog is None:
+        catalog = station_catalog()
+    stations, index = catalog.stations, catalog.index
+    if center is None:
+        center = default_center(stations)
+    if bounds is None:
+        bounds = view_bounds(center, zoom)
+    selected = index.query(*bounds)
+
+    traces = []
+    if len(selected) > MAX_STATIONS:
+        cell_size = CLUSTER_PIXELS * degrees_per_pixel(zoom)
+        lon = stations["lon"].to_numpy()[selected]
+        lat = stations["lat"].to_numpy()[selected]
+        cells = np.floor(np.column_stack([lon, lat]) / cell_size).astype(int)
+        _, cluster, counts = np.unique(
+            cells, axis=0, return_inverse=True, return_counts=True
+        )
+        cluster = cluster.ravel()
+        # the stations which are alone in their cell are shown as they are
+        is_clustered = counts[cluster] > 1
+        counts = np.bincount(cluster[is_clustered], minlength=len(counts))
+        clusters = counts > 0
+        traces.append(
+            go.Scattermapbox(
+                lat=np.bincount(cluster, weights=lat * is_clustered)[clusters]
+                / counts[clusters],
+                lon=np.bincount(cluster, weights=lon * is_clustered)[clusters]
+                / counts[clusters],
+                mode="markers",
+                marker=dict(
+                    color="#4895ef",
+                    opacity=0.6,
+                    size=8 + 3 * np.log2(counts[clusters]),
+                ),
+                customdata=np.column_stack(
+                    [counts[clusters], np.full(clusters.sum(), zoom)]
+                ),
+                hovertemplate=(
+                    "<b>%{customdata[0]} weather files</b><br>"
+                    + "Click or zoom in to see them<extra></extra>"
+                ),
+                name="",
+                showlegend=False,
+            )
+        )
+        selected = selected[~is_clustered]
+
+    traces += station_traces(stations.iloc[selected])
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        mapbox=dict(style="carto-positron", center=center, zoom=zoom),
+        height=MAP_HEIGHT,
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+    )
+    return fig
@@ -1,9 +1,11 @@
+import dash
 import dash_bootstrap_components as dbc
 from dash import dcc
 from dash import html
 from dash.exceptions import PreventUpdate
 from my_project.utils import (
     generate_chart_name,
+    relayout_x_range,
     title_with_tooltip,
     summary_table_tmp_rh_tab,
     code_timer,
@@ -26,6 +28,9 @@ from my_project.tab_data_explorer.charts_data_explorer import (
     three_var_graph,
 )
 from my_project.template_graphs import heatmap, yearly_profile, daily_profile, barchart
+from my_project.figure_cache import cached_figure, encoded_figure
+from my_project.filter_expression import compile_filter
+from my_project.filter_index import invert_ranges
 
 from app import app
 
@@ -282,6 +287,21 @@ def section_two_inputs():
                                     ),
                                 ],
                             ),
+                            html.Div(
+                                className=container_row_center_full,
+                                children=[
+                                    html.H6(
+                                        children=["Expression:"], style={"flex": "30%"}
+                                    ),
+                                    dbc.Input(
+                                        id="sec2-filter-expression",
+                                        placeholder="e.g. DBT 18 to 26 and RH < 60",
+                                        type="text",
+                                        debounce=True,
+                                        style={"flex": "70%"},
+                                    ),
+                                ],
+                            ),
                         ],
                     ),
                 ],
@@ -504,6 +524,19 @@ def section_three_inputs():
                             ),
                         ],
                     ),
+                    html.Div(
+                        className=container_row_center_full,
+                        children=[
+                            html.H6(children=["Expression:"], style={"flex": "30%"}),
+                            dbc.Input(
+                                id="tab6-sec3-filter-expression",
+                                placeholder="e.g. DBT 18 to 26 and RH < 60",
+                                type="text",
+                                debounce=True,
+                                style={"flex": "70%"},
+                            ),
+                        ],
+                    ),
                 ],
             ),
         ],
@@ -549,18 +582,18 @@ def layout_data_explorer():
     [
         Input("df-store", "modified_timestamp"),
         Input("sec1-var-dropdown", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
-def update_tab_yearly(ts, var, global_local, df, meta, si_ip):
+def update_tab_yearly(ts, var, global_local, ds, meta, si_ip):
     """Update the contents of tab size. Passing in the info from the dropdown and the general info."""
 
-    if df[var].mean() == 99990.0:
+    if ds.df[var].mean() == 99990.0:
         return dbc.Alert(
             """The selected variable is not available,
             the Clima tool could not generate the yearly plot""",
@@ -569,31 +602,75 @@ def update_tab_yearly(ts, var, global_local, df, meta, si_ip):
         )
     else:
         return dcc.Graph(
+            id="yearly-explore-graph",
             config=generate_chart_name("yearly_explore", meta),
-            figure=yearly_profile(df, var, global_local, si_ip),
+            figure=cached_figure(
+                ds,
+                "yearly_explore",
+                lambda: yearly_profile(ds, var, global_local, si_ip),
+                var=var,
+                global_local=global_local,
+                si_ip=si_ip,
+            ),
         )
 
 
+@app.callback(
+    Output("yearly-explore-graph", "figure"),
+    [Input("yearly-explore-graph", "relayoutData")],
+    [
+        State("sec1-var-dropdown", "value"),
+        State("global-local-radio-input", "value"),
+        State("df-store", "data"),
+        State("si-ip-unit-store", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def refine_tab_yearly(relayout_data, var, global_local, ds, si_ip):
+    """Show the hourly values when the yearly chart is zoomed in"""
+    if not relayout_data or not any(key.startswith("xaxis.") for key in relayout_data):
+        raise PreventUpdate
+    x_range = relayout_x_range(relayout_data)
+    if x_range is not None:
+        # every zoom or pan gives a different range, so these are not cached
+        return encoded_figure(yearly_profile(ds, var, global_local, si_ip, x_range))
+    return cached_figure(
+        ds,
+        "yearly_explore",
+        lambda: yearly_profile(ds, var, global_local, si_ip),
+        var=var,
+        global_local=global_local,
+        si_ip=si_ip,
+    )
+
+
 @app.callback(
     Output("query-daily", "children"),
     [
         Input("df-store", "modified_timestamp"),
         Input("sec1-var-dropdown", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
-def update_tab_daily(ts, var, global_local, df, meta, si_ip):
+def update_tab_daily(ts, var, global_local, ds, meta, si_ip):
     """Update the contents of tab size. Passing in the info from the dropdown and the general info."""
 
     return (
         dcc.Graph(
             config=generate_chart_name("daily_explore", meta),
-            figure=daily_profile(df, var, global_local, si_ip),
+            figure=cached_figure(
+                ds,
+                "daily_explore",
+                lambda: daily_profile(ds, var, global_local, si_ip),
+                var=var,
+                global_local=global_local,
+                si_ip=si_ip,
+            ),
         ),
     )
 
@@ -603,25 +680,48 @@ def update_tab_daily(ts, var, global_local, df, meta, si_ip):
     [
         Input("df-store", "modified_timestamp"),
         Input("sec1-var-dropdown", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
-def update_tab_heatmap(ts, var, global_local, df, meta, si_ip):
+def update_tab_heatmap(ts, var, global_local, ds, meta, si_ip):
     """Update the contents of tab size. Passing in the info from the dropdown and the general info."""
 
     return (
         dcc.Graph(
             config=generate_chart_name("heatmap_explore", meta),
-            figure=heatmap(df, var, global_local, si_ip),
+            figure=cached_figure(
+                ds,
+                "heatmap_explore",
+                lambda: heatmap(ds.df, var, global_local, si_ip),
+                var=var,
+                global_local=global_local,
+                si_ip=si_ip,
+            ),
         ),
     )
 
 
+def filter_expression_text(data_filter, expression):
+    """Return the normalized text of the filter expression, None if it is not
+    used. ValueError is raised if the expression is not valid."""
+    if not data_filter or not expression or not expression.strip():
+        return None
+    return compile_filter(expression).text
+
+
+def filter_expression_alert(error):
+    return dbc.Alert(
+        str(error),
+        color="danger",
+        style={"text-align": "center", "marginTop": "2rem"},
+    )
+
+
 @app.callback(
     [
         Output("custom-heatmap", "children"),
@@ -635,16 +735,17 @@ def update_tab_heatmap(ts, var, global_local, df, meta, si_ip):
         Input("sec2-time-filter-input", "n_clicks"),
         Input("sec2-data-filter-input", "n_clicks"),
         Input("normalize", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     # General
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("sec2-month-slider", "value"),
         State("sec2-hour-slider", "value"),
         State("sec2-data-filter-var", "value"),
         State("sec2-min-val", "value"),
         State("sec2-max-val", "value"),
+        State("sec2-filter-expression", "value"),
         State("meta-store", "data"),
         State("invert-month-explore-heatmap", "value"),
         State("invert-hour-explore-heatmap", "value"),
@@ -658,29 +759,52 @@ def update_heatmap(
     data_filter,
     normalize,
     global_local,
-    df,
+    ds,
     month,
     hour,
     filter_var,
     min_val,
     max_val,
+    expression,
     meta,
     invert_month,
     invert_hour,
     si_ip,
 ):
 
-    start_month, end_month = month
-    if invert_month == ["invert"] and (start_month != 1 or end_month != 12):
-        month = month[::-1]
-    start_hour, end_hour = hour
-    if invert_hour == ["invert"] and (start_hour != 1 or end_hour != 24):
-        hour = hour[::-1]
+    month, hour = invert_ranges(month, hour, invert_month, invert_hour)
+    try:
+        expression = filter_expression_text(data_filter, expression)
+    except ValueError as error:
+        return (
+            filter_expression_alert(error),
+            {"display": "none"},
+            {"data": [], "layout": {}, "frames": []},
+            {"display": "none"},
+        )
     time_filter_info = [time_filter, month, hour]
-    data_filter_info = [data_filter, filter_var, min_val, max_val]
-
-    heat_map = custom_heatmap(
-        df, global_local, var, time_filter_info, data_filter_info, si_ip
+    data_filter_info = [data_filter, filter_var, min_val, max_val, expression]
+
+    filter_params = dict(
+        var=var,
+        time_filter=bool(time_filter),
+        data_filter=bool(data_filter),
+        month=month,
+        hour=hour,
+        filter_var=filter_var,
+        min_val=min_val,
+        max_val=max_val,
+        filter_expression=expression,
+        si_ip=si_ip,
+    )
+    heat_map = cached_figure(
+        ds,
+        "custom_heatmap_explore",
+        lambda: custom_heatmap(
+            ds, global_local, var, time_filter_info, data_filter_info, si_ip
+        ),
+        global_local=global_local,
+        **filter_params,
     )
 
     no_display = {"display": "none"}
@@ -706,7 +830,15 @@ def update_heatmap(
                 figure=heat_map,
             ),
             {},
-            barchart(df, var, time_filter_info, data_filter_info, normalize, si_ip),
+            cached_figure(
+                ds,
+                "custom_summary_explore",
+                lambda: barchart(
+                    ds, var, time_filter_info, data_filter_info, normalize, si_ip
+                ),
+                normalize=normalize,
+                **filter_params,
+            ),
             {},
         )
     return (
@@ -729,15 +861,16 @@ def update_heatmap(
         Input("tab6-sec3-colorby-dropdown", "value"),
         Input("tab6-sec3-time-filter-input", "n_clicks"),
         Input("tab6-sec3-data-filter-input", "n_clicks"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("tab6-sec3-query-month-slider", "value"),
         State("tab6-sec3-query-hour-slider", "value"),
         State("tab6-sec3-filter-var-dropdown", "value"),
         State("tab6-sec3-min-val", "value"),
         State("tab6-sec3-max-val", "value"),
+        State("tab6-sec3-filter-expression", "value"),
         State("meta-store", "data"),
         State("invert-month-explore-more-charts", "value"),
         State("invert-hour-explore-more-charts", "value"),
@@ -753,12 +886,13 @@ def update_more_charts(
     time_filter,
     data_filter,
     global_local,
-    df,
+    ds,
     month,
     hour,
     data_filter_var,
     min_val,
     max_val,
+    expression,
     meta,
     invert_month,
     invert_hour,
@@ -769,27 +903,50 @@ def update_more_charts(
     # if (min_val3 is None or max_val3 is None) and data_filter3:
     #     raise PreventUpdate
 
-    start_month, end_month = month
-    if invert_month == ["invert"] and (start_month != 1 or end_month != 12):
-        month = month[::-1]
-    start_hour, end_hour = hour
-    if invert_hour == ["invert"] and (start_hour != 1 or end_hour != 24):
-        hour = hour[::-1]
+    month, hour = invert_ranges(month, hour, invert_month, invert_hour)
+    try:
+        expression = filter_expression_text(data_filter, expression)
+    except ValueError as error:
+        return filter_expression_alert(error), dash.no_update
     time_filter_info = [time_filter, month, hour]
-    data_filter_info = [data_filter, data_filter_var, min_val, max_val]
-    if data_filter and (min_val is None or max_val is None):
+    data_filter_info = [data_filter, data_filter_var, min_val, max_val, expression]
+    if data_filter and not expression and (min_val is None or max_val is None):
         raise PreventUpdate
     else:
-        two = two_var_graph(df, var_x, var_y, si_ip)
-        three = three_var_graph(
-            df,
-            global_local,
-            var_x,
-            var_y,
-            color_by,
-            time_filter_info,
-            data_filter_info,
-            si_ip,
+        two = cached_figure(
+            ds,
+            "scatter_two_vars_explore",
+            lambda: two_var_graph(ds.df, var_x, var_y, si_ip),
+            var_x=var_x,
+            var_y=var_y,
+            si_ip=si_ip,
+        )
+        three = cached_figure(
+            ds,
+            "scatter_three_vars_explore",
+            lambda: three_var_graph(
+                ds,
+                global_local,
+                var_x,
+                var_y,
+                color_by,
+                time_filter_info,
+                data_filter_info,
+                si_ip,
+            ),
+            var_x=var_x,
+            var_y=var_y,
+            color_by=color_by,
+            time_filter=bool(time_filter),
+            data_filter=bool(data_filter),
+            month=month,
+            hour=hour,
+            data_filter_var=data_filter_var,
+            min_val=min_val,
+            max_val=max_val,
+            filter_expression=expression,
+            global_local=global_local,
+            si_ip=si_ip,
         )
         if not three:
             return dbc.Alert(
@@ -817,8 +974,6 @@ def update_more_charts(
     [Input("df-store", "modified_timestamp"), Input("sec1-var-dropdown", "value")],
     [State("df-store", "data"), State("si-ip-unit-store", "data")],
 )
-def update_table(ts, dd_value, df, si_ip):
+def update_table(ts, dd_value, ds, si_ip):
     """Update the contents of tab three. Passing in general info (df, meta)."""
-    return summary_table_tmp_rh_tab(
-        df[["month", "hour", dd_value, "month_names"]], dd_value, si_ip
-    )
+    return summary_table_tmp_rh_tab(ds, dd_value, si_ip)
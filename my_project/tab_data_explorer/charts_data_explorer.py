@@ -1,15 +1,19 @@
-from math import ceil, floor
-
 import json
 import numpy as np
-import math
 import plotly.express as px
 import plotly.graph_objects as go
 from my_project.global_scheme import template, mapping_dictionary, month_lst
+from my_project.utils import add_value_ranges, value_ranges
+from my_project.filter_expression import data_filter_rows
+from my_project.filter_index import time_filter_mask
+from my_project.template_graphs import binned_histograms, heatmap_matrix
 
 
-def custom_heatmap(df, global_local, var, time_filter_info, data_filter_info, si_ip):
+def custom_heatmap(
+    dataset, global_local, var, time_filter_info, data_filter_info, si_ip
+):
     """Return the customizable heatmap."""
+    df = dataset.df
     time_filter = time_filter_info[0]
     start_month = time_filter_info[1][0]
     end_month = time_filter_info[1][1]
@@ -19,31 +23,16 @@ def custom_heatmap(df, global_local, var, time_filter_info, data_filter_info, si
     filter_var = data_filter_info[1]
     min_val = data_filter_info[2]
     max_val = data_filter_info[3]
+    expression = data_filter_info[4]
 
+    keep = np.ones(len(df), dtype=bool)
     if time_filter:
-        if start_month <= end_month:
-            mask = (df["month"] < start_month) | (df["month"] > end_month)
-            df[var][mask] = None
-        else:
-            mask = (df["month"] >= end_month) & (df["month"] <= start_month)
-            df[var][mask] = None
-
-        if start_hour <= end_hour:
-            mask = (df["hour"] < start_hour) | (df["hour"] > end_hour)
-            df[var][mask] = None
-        else:
-            mask = (df["hour"] >= end_hour) & (df["hour"] <= start_hour)
-            df[var][mask] = None
-
+        keep &= time_filter_mask(dataset, start_month, end_month, start_hour, end_hour)
     if data_filter:
-        if min_val <= max_val:
-            mask = (df[filter_var] < min_val) | (df[filter_var] > max_val)
-            df[var][mask] = None
-        else:
-            mask = (df[filter_var] >= max_val) & (df[filter_var] <= min_val)
-            df[var][mask] = None
-
-    if df.dropna(subset=[var]).shape[0] == 0:
+        keep &= data_filter_rows(dataset, data_filter_info)
+    data = df[var].where(keep)
+
+    if data.count() == 0:
         return None
 
     var_unit = mapping_dictionary[var][si_ip]["unit"]
@@ -53,14 +42,8 @@ def custom_heatmap(df, global_local, var, time_filter_info, data_filter_info, si
     filter_name = mapping_dictionary[filter_var]["name"]
     filter_unit = mapping_dictionary[filter_var][si_ip]["unit"]
 
-    if global_local == "global":
-        # Set Global values for Max and minimum
-        range_z = var_range
-    else:
-        # Set maximum and minimum according to data
-        data_max = 5 * ceil(df[var].max() / 5)
-        data_min = 5 * floor(df[var].min() / 5)
-        range_z = [data_min, data_max]
+    ranges = value_ranges(data, var_range)
+    range_z = ranges[global_local]
 
     title = var_name + " (" + var_unit + ")"
     if time_filter:
@@ -69,51 +52,55 @@ def custom_heatmap(df, global_local, var, time_filter_info, data_filter_info, si
             f"{month_lst[end_month - 1]} and between the hours {start_hour}"
             f":00 and {end_hour}:00"
         )
-    if data_filter:
+    if data_filter and expression:
+        title += f" when {expression}"
+    elif data_filter:
         title += (
             f" when the {filter_name} is between {min_val} and {max_val} {filter_unit}"
         )
 
+    dates, hours, z = heatmap_matrix(df, data)
     fig = go.Figure(
         data=go.Heatmap(
-            y=df["hour"],
-            x=df["DOY"],
-            z=df[var],
+            y=hours,
+            x=dates,
+            z=z,
             colorscale=var_color,
             zmin=range_z[0],
             zmax=range_z[1],
             connectgaps=False,
             hoverongaps=False,
-            customdata=np.stack((df["month_names"], df["day"]), axis=-1),
             hovertemplate=(
                 "<b>"
                 + var
                 + ": %{z:.2f} "
                 + var_unit
                 + "</b><br>"
-                + "Month: %{customdata[0]}<br>"
-                + "Day: %{customdata[1]}<br>"
+                + "Month: %{x|%b}<br>"
+                + "Day: %{x|%-d}<br>"
                 + "Hour: %{y}:00<br>"
             ),
             name="",
             colorbar=dict(title=var_unit),
         )
     )
+    # the days are labelled by their number, as in the other data explorer charts
     fig.update_layout(
         template=template,
         title=title,
         xaxis_nticks=53,
         yaxis_nticks=13,
         yaxis=dict(range=(1, 24)),
-        xaxis=dict(range=(1, 365)),
+        xaxis=dict(range=(dates[0], dates[-1]), tickformat="%-j"),
     )
     fig.update_yaxes(title_text="Hour")
     fig.update_xaxes(title_text="Day")
+    add_value_ranges(fig, ranges, traces={0: ("zmin", "zmax")})
     return fig
 
 
 def three_var_graph(
-    df,
+    dataset,
     global_local,
     var_x,
     var_y,
@@ -124,6 +111,7 @@ def three_var_graph(
 ):
 
     """Return the custom graph plotting three variables."""
+    df = dataset.df
     time_filter = time_filter_info3[0]
     start_month = time_filter_info3[1][0]
     end_month = time_filter_info3[1][1]
@@ -141,34 +129,22 @@ def three_var_graph(
     var_range = mapping_dictionary[var][si_ip]["range"]
     var_color = mapping_dictionary[var]["color"]
 
-    if global_local != "global":
-        # Set maximum and minimum according to data
-        data_max = 5 * math.ceil(df[var].max() / 5)
-        data_min = 5 * math.floor(df[var].min() / 5)
-        var_range = [data_min, data_max]
+    ranges = value_ranges(df[var], var_range)
+    var_range = ranges[global_local]
 
     color_scale = var_color
 
+    keep = np.ones(len(df), dtype=bool)
     if time_filter:
-        if start_month <= end_month:
-            df.loc[(df["month"] < start_month) | (df["month"] > end_month)] = None
-        else:
-            df.loc[(df["month"] >= end_month) & (df["month"] <= start_month)] = None
-
-        if start_hour <= end_hour:
-            df.loc[(df["hour"] < start_hour) | (df["hour"] > end_hour)] = None
-        else:
-            df.loc[(df["hour"] >= end_hour) & (df["hour"] <= start_hour)] = None
-
+        keep &= time_filter_mask(dataset, start_month, end_month, start_hour, end_hour)
     if data_filter:
-        if min_val <= max_val:
-            df.loc[(df[filter_var] < min_val) | (df[filter_var] > max_val)] = None
-        else:
-            df.loc[(df[filter_var] >= max_val) & (df[filter_var] <= min_val)] = None
+        keep &= data_filter_rows(dataset, data_filter_info3)
 
-    if df.dropna(subset=["month"]).shape[0] == 0:
+    if not keep.any():
         return None
 
+    df = df.loc[keep, list(dict.fromkeys([var_x, var_y, color_by]))]
+
     title = (
         mapping_dictionary[var_x]["name"]
         + " vs "
@@ -189,11 +165,14 @@ def three_var_graph(
         marginal_y="histogram",
         title=title,
         labels={var_x: f"{var_x} ({var_unit_x})", var_y: f"{var_y} ({var_unit_y})"},
+        render_mode="webgl",
     )
+    fig = binned_histograms(fig)
 
     fig.update_layout(template=template, title=title)
     fig.update_xaxes(showline=True, linewidth=1, linecolor="black", mirror=False)
     fig.update_yaxes(showline=True, linewidth=1, linecolor="black", mirror=False)
+    add_value_ranges(fig, ranges, layout={"coloraxis": ("cmin", "cmax")})
 
     return fig
 
@@ -210,6 +189,7 @@ def two_var_graph(df, var_x, var_y, si_ip):
     var_unit_x = mapping_dictionary[var_x][si_ip]["unit"]
     var_unit_y = mapping_dictionary[var_y][si_ip]["unit"]
 
+    # the counts are computed here instead of sending all the values to the browser
     fig = px.density_heatmap(
         df,
         x=var_x,
@@ -219,5 +199,6 @@ def two_var_graph(df, var_x, var_y, si_ip):
         marginal_y="histogram",
         labels={var_x: f"{var_x} ({var_unit_x})", var_y: f"{var_y} ({var_unit_y})"},
     )
+    fig = binned_histograms(fig)
     fig.update_layout(dragmode=False)
     return fig
@@ -1,5 +1,6 @@
-import math
 import json
+from typing import NamedTuple
+
 from dash import dcc
 import dash_bootstrap_components as dbc
 from dash import html
@@ -12,13 +13,18 @@ from my_project.global_scheme import (
     container_row_center_full,
     container_col_center_one_of_three,
 )
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import numpy as np
 from my_project.utils import (
     title_with_tooltip,
     generate_chart_name,
-    determine_month_and_hour_filter,
+    data_filter_mask,
+    value_ranges,
+    add_value_ranges,
 )
+from my_project.figure_cache import cached_figure
+from my_project.filter_index import determine_month_and_hour_filter, time_filter_mask
+from my_project.template_graphs import heatmap_matrix
 
 from app import app
 
@@ -79,6 +85,13 @@ def layout_natural_ventilation(si_ip):
                 ),
                 type="circle",
             ),
+            dcc.Loading(
+                html.Div(
+                    id="nv-sensitivity-chart",
+                    style={"marginTop": "1rem"},
+                ),
+                type="circle",
+            ),
         ],
     )
 
@@ -249,6 +262,158 @@ def inputs_tab(t_min, t_max, d_set):
     )
 
 
+class NVAnalysis(NamedTuple):
+    """Hours in which natural ventilation is possible given the filters of the tab."""
+
+    # True for the hours within all the active filters
+    keep: np.ndarray
+    # number of hours within the time filter in each month
+    month_hours: np.ndarray
+    # number of hours with natural ventilation in each month, and their percentage
+    nv_hours: np.ndarray
+    nv_percentage: np.ndarray
+
+
+def nv_time_mask(ds, time_filter, month, hour, invert_month, invert_hour):
+    """Return a boolean mask which is True for the hours within the month and hour
+    filter of the tab, all of them if the filter is not applied."""
+    keep = np.ones(len(ds), dtype=bool)
+    if time_filter:
+        start_month, end_month, start_hour, end_hour = determine_month_and_hour_filter(
+            month, hour, invert_month, invert_hour
+        )
+        keep &= time_filter_mask(ds, start_month, end_month, start_hour, end_hour)
+    return keep
+
+
+def nv_analysis(
+    ds,
+    time_filter,
+    dbt_data_filter,
+    dpt_data_filter,
+    month,
+    hour,
+    min_dbt_val,
+    max_dbt_val,
+    max_dpt_val,
+    invert_month,
+    invert_hour,
+):
+    """Return the natural ventilation analysis shared by the heatmap and the bar
+    chart. The filters are combined in a single mask, which is kept by the dataset
+    for the most recently used sets of parameters."""
+
+    def compute():
+        df = ds.df
+        keep = nv_time_mask(ds, time_filter, month, hour, invert_month, invert_hour)
+        month_idx = ds.column("month") - 1
+        month_hours = np.bincount(month_idx, weights=keep, minlength=12).astype(int)
+
+        if dbt_data_filter and (min_dbt_val <= max_dbt_val):
+            keep &= data_filter_mask(df, "DBT", min_dbt_val, max_dbt_val).to_numpy()
+        if dpt_data_filter:
+            dpt = ds.column("DPT")
+            keep &= ~((dpt < -200) | (dpt > max_dpt_val))
+        keep.flags.writeable = False
+
+        nv_hours = np.bincount(month_idx, weights=keep, minlength=12).astype(int)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            nv_percentage = np.round(100 * (nv_hours / month_hours))
+        return NVAnalysis(keep, month_hours, nv_hours, nv_percentage)
+
+    return ds.query(
+        (
+            "nv_analysis",
+            bool(time_filter),
+            bool(dbt_data_filter),
+            dpt_data_filter,
+            tuple(month),
+            tuple(hour),
+            min_dbt_val,
+            max_dbt_val,
+            max_dpt_val,
+            tuple(invert_month),
+            tuple(invert_hour),
+        ),
+        compute,
+    )
+
+
+class NVSensitivity:
+    """Number of hours in which natural ventilation is possible for every range of
+    dry bulb temperatures on a grid and any dew point limit.
+
+    The hours are counted once in a 2-D histogram of the positions of their dry
+    bulb temperature in the grid and of their dew point among the sorted dew point
+    values. Its cumulative sums give the number of hours below any pair of
+    thresholds, so each query is a lookup and a binary search.
+    """
+
+    __slots__ = ("dbt_grid", "dpt_values", "n_hours", "_count_le", "_count_lt")
+
+    def __init__(self, dbt, dpt, dbt_grid):
+        keep = ~np.isnan(dbt)
+        dbt, dpt = dbt[keep], dpt[keep]
+        self.dbt_grid = dbt_grid
+        self.n_hours = len(dbt)
+        # dew points below -200 are not valid and are only counted without limit
+        valid_dpt = dpt >= -200
+        self.dpt_values = np.unique(dpt[valid_dpt])
+        n_grid, n_dpt = len(dbt_grid), len(self.dpt_values)
+        dpt_idx = np.where(
+            valid_dpt,
+            np.searchsorted(self.dpt_values, dpt, side="left") + 1,
+            n_dpt + 1,
+        )
+
+        def cumulative_counts(dbt_idx):
+            counts = np.bincount(
+                dbt_idx * (n_dpt + 2) + dpt_idx, minlength=(n_grid + 1) * (n_dpt + 2)
+            ).reshape(n_grid + 1, n_dpt + 2)
+            return counts.cumsum(axis=0).cumsum(axis=1)[:n_grid]
+
+        # number of hours with DBT <= and < each value of the grid, by dew point
+        self._count_le = cumulative_counts(np.searchsorted(dbt_grid, dbt, "left"))
+        self._count_lt = cumulative_counts(np.searchsorted(dbt_grid, dbt, "right"))
+
+    def hours(self, max_dpt=None):
+        """Return the number of hours with the dry bulb temperature between each
+        pair of values of the grid, an array of shape (min DBT, max DBT), and the
+        dew point not above max_dpt if given. It is NaN if min DBT > max DBT."""
+        if max_dpt is None:
+            column = len(self.dpt_values) + 1
+        else:
+            column = np.searchsorted(self.dpt_values, max_dpt, side="right")
+        hours = (
+            self._count_le[None, :, column] - self._count_lt[:, None, column]
+        ).astype(float)
+        hours[np.tril_indices(len(self.dbt_grid), -1)] = np.nan
+        return hours
+
+
+def nv_sensitivity(ds, time_filter, month, hour, invert_month, invert_hour):
+    """Return the NVSensitivity of the hours within the time filter, on a grid of
+    dry bulb temperatures spanning the values of the dataset in steps of 1 degree."""
+
+    def compute():
+        keep = nv_time_mask(ds, time_filter, month, hour, invert_month, invert_hour)
+        dbt = ds.column("DBT").astype(float)
+        grid = np.arange(np.floor(np.nanmin(dbt)), np.ceil(np.nanmax(dbt)) + 1)
+        return NVSensitivity(dbt[keep], ds.column("DPT").astype(float)[keep], grid)
+
+    return ds.query(
+        (
+            "nv_sensitivity",
+            bool(time_filter),
+            tuple(month),
+            tuple(hour),
+            tuple(invert_month),
+            tuple(invert_hour),
+        ),
+        compute,
+    )
+
+
 @app.callback(
     Output("nv-heatmap-chart", "children"),
     [
@@ -256,10 +421,10 @@ def inputs_tab(t_min, t_max, d_set):
         Input("nv-month-hour-filter", "n_clicks"),
         Input("nv-dbt-filter", "n_clicks"),
         Input("nv-dpt-filter", "n_clicks"),
-        Input("global-local-radio-input", "value"),
         Input("enable-condensation", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("nv-month-slider", "value"),
         State("nv-hour-slider", "value"),
@@ -277,9 +442,9 @@ def nv_heatmap(
     time_filter,
     dbt_data_filter,
     click_dpt_filter,
-    global_local,
     condensation_enabled,
-    df,
+    global_local,
+    ds,
     month,
     hour,
     min_dbt_val,
@@ -294,6 +459,72 @@ def nv_heatmap(
     # enable or disable button apply filter DPT
     dpt_data_filter = enable_dew_point_data_filter(condensation_enabled)
 
+    fig = cached_figure(
+        ds,
+        "heatmap_nv",
+        lambda: nv_heatmap_figure(
+            ds,
+            time_filter,
+            dbt_data_filter,
+            dpt_data_filter,
+            global_local,
+            month,
+            hour,
+            min_dbt_val,
+            max_dbt_val,
+            max_dpt_val,
+            invert_month,
+            invert_hour,
+            si_ip,
+        ),
+        time_filter=bool(time_filter),
+        dbt_data_filter=bool(dbt_data_filter),
+        dpt_data_filter=dpt_data_filter,
+        global_local=global_local,
+        month=month,
+        hour=hour,
+        min_dbt_val=min_dbt_val,
+        max_dbt_val=max_dbt_val,
+        max_dpt_val=max_dpt_val,
+        invert_month=invert_month,
+        invert_hour=invert_hour,
+        si_ip=si_ip,
+    )
+
+    if fig is None:
+        return (
+            dbc.Alert(
+                "Natural ventilation is not available in this location under these"
+                " conditions. Please either select a different outdoor dry-bulb air"
+                " temperature range, change the month and hour filter, or increase"
+                " thedew-point temperature.",
+                color="danger",
+                style={"text-align": "center", "marginTop": "2rem"},
+            ),
+        )
+
+    return dcc.Graph(
+        config=generate_chart_name("heatmap_nv", meta),
+        figure=fig,
+    )
+
+
+def nv_heatmap_figure(
+    ds,
+    time_filter,
+    dbt_data_filter,
+    dpt_data_filter,
+    global_local,
+    month,
+    hour,
+    min_dbt_val,
+    max_dbt_val,
+    max_dpt_val,
+    invert_month,
+    invert_hour,
+    si_ip,
+):
+    """Return the natural ventilation heatmap, None if no hours are available."""
     start_month, end_month, start_hour, end_hour = determine_month_and_hour_filter(
         month, hour, invert_month, invert_hour
     )
@@ -301,36 +532,24 @@ def nv_heatmap(
     var = "DBT"
     filter_var = "DPT"
 
-    if dbt_data_filter and (min_dbt_val <= max_dbt_val):
-        df.loc[(df[var] < min_dbt_val) | (df[var] > max_dbt_val), var] = None
-
-    if dpt_data_filter:
-        df.loc[(df[filter_var] < -200) | (df[filter_var] > max_dpt_val), var] = None
-
-        if df.dropna(subset=["month"]).shape[0] == 0:
-            return (
-                dbc.Alert(
-                    "Natural ventilation is not available in this location under these"
-                    " conditions. Please either select a different outdoor dry-bulb air"
-                    " temperature range, change the month and hour filter, or increase"
-                    " thedew-point temperature.",
-                    color="danger",
-                    style={"text-align": "center", "marginTop": "2rem"},
-                ),
-            )
-
-    if time_filter:
-        if start_month <= end_month:
-            df.loc[(df["month"] < start_month) | (df["month"] > end_month), var] = None
-        else:
-            df.loc[
-                (df["month"] >= end_month) & (df["month"] <= start_month), var
-            ] = None
+    analysis = nv_analysis(
+        ds,
+        time_filter,
+        dbt_data_filter,
+        dpt_data_filter,
+        month,
+        hour,
+        min_dbt_val,
+        max_dbt_val,
+        max_dpt_val,
+        invert_month,
+        invert_hour,
+    )
+    df = ds.df
+    dbt = df[var].where(analysis.keep)
 
-        if start_hour <= end_hour:
-            df.loc[(df["hour"] < start_hour) | (df["hour"] > end_hour), var] = None
-        else:
-            df.loc[(df["hour"] >= end_hour) & (df["hour"] <= start_hour), var] = None
+    if dbt.count() == 0:
+        return None
 
     var_unit = mapping_dictionary[var][si_ip]["unit"]
 
@@ -344,12 +563,8 @@ def nv_heatmap(
 
     var_color = mapping_dictionary[var]["color"]
 
-    if global_local == "global":
-        range_z = var_range
-    else:
-        data_max = 5 * math.ceil(df[var].max() / 5)
-        data_min = 5 * math.floor(df[var].min() / 5)
-        range_z = [data_min, data_max]
+    ranges = value_ranges(dbt, var_range)
+    range_z = ranges[global_local]
 
     title = (
         f"Hours when the {var_name} is in the range {min_dbt_val} to"
@@ -365,25 +580,25 @@ def nv_heatmap(
     if dpt_data_filter:
         title += f" and when the {filter_name} is below {max_dpt_val} {filter_unit}."
 
+    dates, hours, z = heatmap_matrix(df, dbt)
     fig = go.Figure(
         data=go.Heatmap(
-            y=df["hour"],
-            x=df["UTC_time"].dt.date,
-            z=df[var],
+            y=hours,
+            x=dates,
+            z=z,
             colorscale=var_color,
             zmin=range_z[0],
             zmax=range_z[1],
             connectgaps=False,
             hoverongaps=False,
-            customdata=np.stack((df["month_names"], df["day"]), axis=-1),
             hovertemplate=(
                 "<b>"
                 + var
                 + ": %{z:.2f} "
                 + var_unit
                 + "</b><br>"
-                + "Month: %{customdata[0]}<br>"
-                + "Day: %{customdata[1]}<br>"
+                + "Month: %{x|%b}<br>"
+                + "Day: %{x|%-d}<br>"
                 + "Hour: %{y}:00<br>"
             ),
             colorbar=dict(title=var_unit),
@@ -416,11 +631,9 @@ def nv_heatmap(
         mirror=True,
         title_text="Hour",
     )
+    add_value_ranges(fig, ranges, traces={0: ("zmin", "zmax")})
 
-    return dcc.Graph(
-        config=generate_chart_name("heatmap_nv", meta),
-        figure=fig,
-    )
+    return fig
 
 
 @app.callback(
@@ -453,7 +666,7 @@ def nv_bar_chart(
     click_dpt_filter,
     normalize,
     condensation_enabled,
-    df,
+    ds,
     month,
     hour,
     min_dbt_val,
@@ -468,6 +681,58 @@ def nv_bar_chart(
     # enable or disable button apply filter DPT
     dpt_data_filter = enable_dew_point_data_filter(condensation_enabled)
 
+    return dcc.Graph(
+        config=generate_chart_name("bar_chart_nv", meta),
+        figure=cached_figure(
+            ds,
+            "bar_chart_nv",
+            lambda: nv_bar_chart_figure(
+                ds,
+                time_filter,
+                dbt_data_filter,
+                dpt_data_filter,
+                normalize,
+                month,
+                hour,
+                min_dbt_val,
+                max_dbt_val,
+                max_dpt_val,
+                invert_month,
+                invert_hour,
+                si_ip,
+            ),
+            time_filter=bool(time_filter),
+            dbt_data_filter=bool(dbt_data_filter),
+            dpt_data_filter=dpt_data_filter,
+            normalize=normalize,
+            month=month,
+            hour=hour,
+            min_dbt_val=min_dbt_val,
+            max_dbt_val=max_dbt_val,
+            max_dpt_val=max_dpt_val,
+            invert_month=invert_month,
+            invert_hour=invert_hour,
+            si_ip=si_ip,
+        ),
+    )
+
+
+def nv_bar_chart_figure(
+    ds,
+    time_filter,
+    dbt_data_filter,
+    dpt_data_filter,
+    normalize,
+    month,
+    hour,
+    min_dbt_val,
+    max_dbt_val,
+    max_dpt_val,
+    invert_month,
+    invert_hour,
+    si_ip,
+):
+    """Return the bar chart with the monthly hours of natural ventilation."""
     start_month, end_month, start_hour, end_hour = determine_month_and_hour_filter(
         month, hour, invert_month, invert_hour
     )
@@ -484,49 +749,27 @@ def nv_bar_chart(
 
     color_in = "dodgerblue"
 
-    df["nv_allowed"] = 1
-
-    if time_filter:
-        if start_month <= end_month:
-            df.loc[
-                (df["month"] < start_month) | (df["month"] > end_month), "nv_allowed"
-            ] = 0
-        else:
-            df.loc[
-                (df["month"] >= end_month) & (df["month"] <= start_month), "nv_allowed"
-            ] = 0
-
-        if start_hour <= end_hour:
-            df.loc[
-                (df["hour"] < start_hour) | (df["hour"] > end_hour), "nv_allowed"
-            ] = 0
-        else:
-            df.loc[
-                (df["hour"] >= end_hour) & (df["hour"] <= start_hour), "nv_allowed"
-            ] = 0
-
-    # this should be the total after filtering by time
-    tot_month_hours = df.groupby(df["UTC_time"].dt.month)["nv_allowed"].sum().values
-
-    if dbt_data_filter and (min_dbt_val <= max_dbt_val):
-        df.loc[(df[var] < min_dbt_val) | (df[var] > max_dbt_val), "nv_allowed"] = 0
-
-    if dpt_data_filter:
-        df.loc[(df[filter_var] > max_dpt_val), "nv_allowed"] = 0
-
-    n_hours_nv_allowed = (
-        df.dropna(subset="nv_allowed")
-        .groupby(df["UTC_time"].dt.month)["nv_allowed"]
-        .sum()
-        .values
+    analysis = nv_analysis(
+        ds,
+        time_filter,
+        dbt_data_filter,
+        dpt_data_filter,
+        month,
+        hour,
+        min_dbt_val,
+        max_dbt_val,
+        max_dpt_val,
+        invert_month,
+        invert_hour,
     )
-
-    per_time_nv_allowed = np.round(100 * (n_hours_nv_allowed / tot_month_hours))
+    n_hours_nv_allowed = analysis.nv_hours
+    per_time_nv_allowed = analysis.nv_percentage
+    months = ds.df["month_names"].unique()
 
     if len(normalize) == 0:
         fig = go.Figure(
             go.Bar(
-                x=df["month_names"].unique(),
+                x=months,
                 y=n_hours_nv_allowed,
                 name="",
                 marker_color=color_in,
@@ -548,7 +791,7 @@ def nv_bar_chart(
 
     else:
         trace1 = go.Bar(
-            x=df["month_names"].unique(),
+            x=months,
             y=per_time_nv_allowed,
             name="",
             marker_color=color_in,
@@ -594,20 +837,188 @@ def nv_bar_chart(
     )
     fig.update_yaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
 
+    return fig
+
+
+@app.callback(
+    Output("nv-sensitivity-chart", "children"),
+    [
+        Input("df-store", "modified_timestamp"),
+        Input("nv-month-hour-filter", "n_clicks"),
+        Input("nv-dbt-filter", "n_clicks"),
+        Input("nv-dpt-filter", "n_clicks"),
+        Input("enable-condensation", "value"),
+    ],
+    [
+        State("df-store", "data"),
+        State("nv-month-slider", "value"),
+        State("nv-hour-slider", "value"),
+        State("nv-tdb-min-val", "value"),
+        State("nv-tdb-max-val", "value"),
+        State("nv-dpt-max-val", "value"),
+        State("meta-store", "data"),
+        State("invert-month-nv", "value"),
+        State("invert-hour-nv", "value"),
+        State("si-ip-unit-store", "data"),
+    ],
+)
+def nv_sensitivity_chart(
+    ts,
+    time_filter,
+    dbt_data_filter,
+    click_dpt_filter,
+    condensation_enabled,
+    ds,
+    month,
+    hour,
+    min_dbt_val,
+    max_dbt_val,
+    max_dpt_val,
+    meta,
+    invert_month,
+    invert_hour,
+    si_ip,
+):
+
+    # enable or disable button apply filter DPT
+    dpt_data_filter = enable_dew_point_data_filter(condensation_enabled)
+
     return dcc.Graph(
-        config=generate_chart_name("bar_chart_nv", meta),
-        figure=fig,
+        config=generate_chart_name("sensitivity_nv", meta),
+        figure=cached_figure(
+            ds,
+            "sensitivity_nv",
+            lambda: nv_sensitivity_figure(
+                ds,
+                time_filter,
+                dpt_data_filter,
+                month,
+                hour,
+                min_dbt_val,
+                max_dbt_val,
+                max_dpt_val,
+                invert_month,
+                invert_hour,
+                si_ip,
+            ),
+            time_filter=bool(time_filter),
+            dpt_data_filter=dpt_data_filter,
+            month=month,
+            hour=hour,
+            min_dbt_val=min_dbt_val,
+            max_dbt_val=max_dbt_val,
+            max_dpt_val=max_dpt_val,
+            invert_month=invert_month,
+            invert_hour=invert_hour,
+            si_ip=si_ip,
+        ),
     )
 
 
-@app.callback(
-    Output("nv-dpt-filter", "disabled"), Input("enable-condensation", "value")
+def nv_sensitivity_figure(
+    ds,
+    time_filter,
+    dpt_data_filter,
+    month,
+    hour,
+    min_dbt_val,
+    max_dbt_val,
+    max_dpt_val,
+    invert_month,
+    invert_hour,
+    si_ip,
+):
+    """Return the contour of the hours of natural ventilation for every range of
+    outdoor dry bulb temperatures, with the selected range marked."""
+    start_month, end_month, start_hour, end_hour = determine_month_and_hour_filter(
+        month, hour, invert_month, invert_hour
+    )
+
+    var = "DBT"
+    filter_var = "DPT"
+
+    var_unit = mapping_dictionary[var][si_ip]["unit"]
+    filter_unit = mapping_dictionary[filter_var][si_ip]["unit"]
+
+    var_name = mapping_dictionary[var]["name"]
+
+    filter_name = mapping_dictionary[filter_var]["name"]
+
+    sensitivity = nv_sensitivity(
+        ds, time_filter, month, hour, invert_month, invert_hour
+    )
+    hours = sensitivity.hours(max_dpt_val if dpt_data_filter else None)
+    percentage = 100 * hours / max(sensitivity.n_hours, 1)
+
+    fig = go.Figure(
+        go.Contour(
+            x=sensitivity.dbt_grid,
+            y=sensitivity.dbt_grid,
+            z=hours.T,
+            customdata=percentage.T,
+            colorscale="Blues",
+            colorbar=dict(title="hours"),
+            hovertemplate=(
+                f"min {var_name}: %{{x}} {var_unit}<br>"
+                + f"max {var_name}: %{{y}} {var_unit}<br>"
+                + "natural ventilation possible for: <br>%{z} hrs or"
+                + " <br>%{customdata:.0f}% of selected time<extra></extra>"
+            ),
+            name="",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=[min_dbt_val],
+            y=[max_dbt_val],
+            mode="markers",
+            marker=dict(color="red", size=10, symbol="x"),
+            hovertemplate="selected range<extra></extra>",
+            name="",
+            showlegend=False,
+        )
+    )
+
+    title = f"Number of hours of natural ventilation for each range of the {var_name}"
+    if time_filter:
+        title += (
+            f" between the months of {month_lst[start_month - 1]} and "
+            f"{month_lst[end_month - 1]} and between<br>the hours {start_hour}"
+            f":00 and {end_hour}:00"
+        )
+    if dpt_data_filter:
+        title += f" when the {filter_name} is below {max_dpt_val} {filter_unit}."
+
+    fig.update_layout(
+        template=template,
+        title=title,
+        dragmode=False,
+        margin=tight_margins.copy().update({"t": 55}),
+    )
+
+    fig.update_xaxes(
+        title_text=f"min {var_name} ({var_unit})",
+        showline=True,
+        linewidth=1,
+        linecolor="black",
+        mirror=True,
+    )
+    fig.update_yaxes(
+        title_text=f"max {var_name} ({var_unit})",
+        showline=True,
+        linewidth=1,
+        linecolor="black",
+        mirror=True,
+    )
+
+    return fig
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace="clima", function_name="disable_dpt_filter"),
+    Output("nv-dpt-filter", "disabled"),
+    Input("enable-condensation", "value"),
 )
-def enable_disable_button_data_filter(state_checklist):
-    if len(state_checklist) == 1:
-        return False
-    else:
-        return True
 
 
 def enable_dew_point_data_filter(condensation_enabled):
@@ -2,9 +2,10 @@ import json
 from dash import dcc
 from dash import html
 from my_project.global_scheme import outdoor_dropdown_names
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 from my_project.template_graphs import heatmap
 from my_project.utils import title_with_tooltip, generate_chart_name
+from my_project.figure_cache import cached_figure
 
 from app import app
 
@@ -32,7 +33,7 @@ def layout_outdoor_comfort():
                         ],
                         value="utci_Sun_Wind",
                     ),
-                    html.Div(id="image-selection"),
+                    html.Img(id="image-selection", height=50),
                 ],
             ),
             html.Div(
@@ -59,37 +60,34 @@ def layout_outdoor_comfort():
     [
         Input("df-store", "modified_timestamp"),
         Input("tab7-dropdown", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
-def update_tab_utci_value(ts, var, global_local, df, meta, si_ip):
+def update_tab_utci_value(ts, var, global_local, ds, meta, si_ip):
 
     return dcc.Graph(
         config=generate_chart_name("utci_heatmap", meta),
-        figure=heatmap(df, var, global_local, si_ip),
+        figure=cached_figure(
+            ds,
+            "utci_heatmap",
+            lambda: heatmap(ds.df, var, global_local, si_ip),
+            var=var,
+            global_local=global_local,
+            si_ip=si_ip,
+        ),
     )
 
 
-@app.callback(
-    Output("image-selection", "children"),
+app.clientside_callback(
+    ClientsideFunction(namespace="clima", function_name="utci_scenario_image"),
+    Output("image-selection", "src"),
     Input("tab7-dropdown", "value"),
 )
-def change_image_based_on_selection(value):
-    if value == "utci_Sun_Wind":
-        source = "./assets/img/sun_and_wind.png"
-    elif value == "utci_Sun_noWind":
-        source = "./assets/img/sun_no_wind.png"
-    elif value == "utci_noSun_Wind":
-        source = "./assets/img/no_sun_and_wind.png"
-    else:
-        source = "./assets/img/no_sun_no_wind.png"
-
-    return html.Img(src=source, height=50)
 
 
 @app.callback(
@@ -97,35 +95,46 @@ def change_image_based_on_selection(value):
     [
         Input("df-store", "modified_timestamp"),
         Input("tab7-dropdown", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
-def update_tab_utci_category(ts, var, global_local, df, meta, si_ip):
+def update_tab_utci_category(ts, var, global_local, ds, meta, si_ip):
 
-    utci_stress_cat = heatmap(df, var + "_categories", global_local, si_ip)
-    utci_stress_cat["data"][0]["colorbar"] = dict(
-        title="Thermal stress",
-        titleside="top",
-        tickmode="array",
-        tickvals=[4, 3, 2, 1, 0, -1, -2, -3, -4, -5],
-        ticktext=[
-            "extreme heat stress",
-            "very strong heat stress",
-            "strong heat stress",
-            "moderate heat stress",
-            "no thermal stress",
-            "slight cold stress",
-            "moderate cold stress",
-            "strong cold stress",
-            "very strong cold stress",
-            "extreme cold stress",
-        ],
-        ticks="outside",
+    def build():
+        utci_stress_cat = heatmap(ds.df, var + "_categories", global_local, si_ip)
+        utci_stress_cat.data[0].colorbar = dict(
+            title="Thermal stress",
+            titleside="top",
+            tickmode="array",
+            tickvals=[4, 3, 2, 1, 0, -1, -2, -3, -4, -5],
+            ticktext=[
+                "extreme heat stress",
+                "very strong heat stress",
+                "strong heat stress",
+                "moderate heat stress",
+                "no thermal stress",
+                "slight cold stress",
+                "moderate cold stress",
+                "strong cold stress",
+                "very strong cold stress",
+                "extreme cold stress",
+            ],
+            ticks="outside",
+        )
+        return utci_stress_cat
+
+    utci_stress_cat = cached_figure(
+        ds,
+        "utci_heatmap_category",
+        build,
+        var=var,
+        global_local=global_local,
+        si_ip=si_ip,
     )
     return dcc.Graph(
         config=generate_chart_name("utci_heatmap_category", meta),
@@ -1,8 +1,9 @@
+import functools
+
 import numpy as np
 import plotly.graph_objects as go
 import json
 from pythermalcomfort import psychrometrics as psy
-from math import ceil, floor
 import dash_bootstrap_components as dbc
 from dash import dcc
 from dash import html
@@ -10,7 +11,15 @@ from my_project.global_scheme import (
     container_row_center_full,
     container_col_center_one_of_three,
 )
-from my_project.utils import generate_chart_name
+from my_project.utils import (
+    generate_chart_name,
+    data_filter_mask,
+    value_ranges,
+    add_value_ranges,
+)
+from my_project.figure_cache import cached_figure
+from my_project.filter_index import invert_ranges, time_filter_mask
+from my_project.template_graphs import bin_edges
 
 from my_project.global_scheme import (
     dropdown_names,
@@ -19,7 +28,6 @@ from my_project.global_scheme import (
     sun_cloud_tab_explore_dropdown_names,
 )
 from dash.dependencies import Input, Output, State
-import pandas as pd
 
 from app import app
 
@@ -220,9 +228,9 @@ def layout_psy_chart():
         Input("psy-color-by-dropdown", "value"),
         Input("month-hour-filter", "n_clicks"),
         Input("data-filter", "n_clicks"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("psy-month-slider", "value"),
         State("psy-hour-slider", "value"),
@@ -241,7 +249,7 @@ def update_psych_chart(
     time_filter,
     data_filter,
     global_local,
-    df,
+    ds,
     month,
     hour,
     min_val,
@@ -253,12 +261,95 @@ def update_psych_chart(
     si_ip,
 ):
 
-    start_month, end_month = month
-    if invert_month == ["invert"] and (start_month != 1 or end_month != 12):
-        month = month[::-1]
-    start_hour, end_hour = hour
-    if invert_hour == ["invert"] and (start_hour != 1 or end_hour != 24):
-        hour = hour[::-1]
+    fig = cached_figure(
+        ds,
+        "psy",
+        lambda: psy_chart_figure(
+            colorby_var,
+            time_filter,
+            data_filter,
+            global_local,
+            ds,
+            month,
+            hour,
+            min_val,
+            max_val,
+            data_filter_var,
+            invert_month,
+            invert_hour,
+            si_ip,
+        ),
+        colorby_var=colorby_var,
+        time_filter=bool(time_filter),
+        data_filter=bool(data_filter),
+        global_local=global_local,
+        month=month,
+        hour=hour,
+        min_val=min_val,
+        max_val=max_val,
+        data_filter_var=data_filter_var,
+        invert_month=invert_month,
+        invert_hour=invert_hour,
+        si_ip=si_ip,
+    )
+
+    if fig is None:
+        return (
+            dbc.Alert(
+                "No data is available in this location under these conditions. Please "
+                "either change the month and hour filters, or select a wider range for "
+                "the filter variable",
+                color="danger",
+                style={"text-align": "center", "marginTop": "2rem"},
+            ),
+        )
+
+    return dcc.Graph(config=generate_chart_name("psy", meta), figure=fig)
+
+
+@functools.lru_cache(maxsize=None)
+def rh_isolines(si_ip, p_atm=101325):
+    """Return the (x, y, rh) of the relative humidity isolines drawn in the
+    background of the psychrometric chart, as a single line broken by NaNs.
+
+    They do not depend on the data, hence they are computed once per unit system
+    and atmospheric pressure.
+    """
+    dbt = np.arange(-60, 60, dtype=float)
+    p_sat = np.array([psy.p_sat(t) for t in dbt])
+    rh = np.arange(10, 110, 10)
+    p_vap = rh[:, None] / 100 * p_sat
+    hr = 0.62198 * p_vap / (p_atm - p_vap)
+    if si_ip == "ip":
+        dbt = dbt * 1.8 + 32
+        hr = hr * 0.0624
+
+    # a NaN at the end of each isoline so they are not connected
+    x = np.tile(np.append(dbt, np.nan), len(rh))
+    y = np.hstack([hr, np.full((len(rh), 1), np.nan)]).ravel()
+    rh = np.repeat(rh, len(dbt) + 1)
+    for values in (x, y, rh):
+        values.flags.writeable = False
+    return x, y, rh
+
+
+def psy_chart_figure(
+    colorby_var,
+    time_filter,
+    data_filter,
+    global_local,
+    ds,
+    month,
+    hour,
+    min_val,
+    max_val,
+    data_filter_var,
+    invert_month,
+    invert_hour,
+    si_ip,
+):
+    """Return the psychrometric chart, None if no data match the filters."""
+    month, hour = invert_ranges(month, hour, invert_month, invert_hour)
     time_filter_info = [time_filter, month, hour]
     data_filter_info = [data_filter, data_filter_var, min_val, max_val]
 
@@ -273,39 +364,20 @@ def update_psych_chart(
     min_val = data_filter_info[2]
     max_val = data_filter_info[3]
 
+    df = ds.df
+    keep = np.ones(len(df), dtype=bool)
     if time_filter:
-        if start_month <= end_month:
-            mask = (df["month"] < start_month) | (df["month"] > end_month)
-            df[mask] = None
-        else:
-            mask = (df["month"] >= end_month) & (df["month"] <= start_month)
-            df[mask] = None
-
-        if start_hour <= end_hour:
-            mask = (df["hour"] < start_hour) | (df["hour"] > end_hour)
-            df[mask] = None
-        else:
-            mask = (df["hour"] >= end_hour) & (df["hour"] <= start_hour)
-            df[mask] = None
-
+        keep &= time_filter_mask(ds, start_month, end_month, start_hour, end_hour)
     if data_filter:
-        if min_val <= max_val:
-            mask = (df[data_filter_var] < min_val) | (df[data_filter_var] > max_val)
-            df[mask] = None
-        else:
-            mask = (df[data_filter_var] >= max_val) & (df[data_filter_var] <= min_val)
-            df[mask] = None
-
-    if df.dropna(subset=["month"]).shape[0] == 0:
-        return (
-            dbc.Alert(
-                "No data is available in this location under these conditions. Please "
-                "either change the month and hour filters, or select a wider range for "
-                "the filter variable",
-                color="danger",
-                style={"text-align": "center", "marginTop": "2rem"},
-            ),
-        )
+        keep &= data_filter_mask(df, data_filter_var, min_val, max_val).to_numpy()
+
+    if not keep.any():
+        return None
+
+    columns = ["DBT", "hr", "RH", "h", "t_dp"]
+    if colorby_var != "None" and colorby_var != "Frequency":
+        columns.append(colorby_var)
+    df = df.loc[keep, list(dict.fromkeys(columns))]
 
     var = colorby_var
     if var == "None":
@@ -319,64 +391,37 @@ def update_psych_chart(
 
         var_color = mapping_dictionary[var]["color"]
 
-    if global_local == "global":
-        # Set Global values for Max and minimum
-        var_range_x = mapping_dictionary["DBT"][si_ip]["range"]
-        var_range_y = mapping_dictionary["hr"][si_ip]["range"]
-
-    else:
-        # Set maximum and minimum according to data
-        data_max = 5 * ceil(df["DBT"].max() / 5)
-        data_min = 5 * floor(df["DBT"].min() / 5)
-        var_range_x = [data_min, data_max]
-
-        data_max = round(df["hr"].max(), 4)
-        data_min = round(df["hr"].min(), 4)
-        var_range_y = [data_min, data_max]
+    ranges_x = value_ranges(df["DBT"], mapping_dictionary["DBT"][si_ip]["range"])
+    ranges_y = {
+        "global": mapping_dictionary["hr"][si_ip]["range"],
+        "local": [round(df["hr"].min(), 4), round(df["hr"].max(), 4)],
+    }
+    var_range_x = ranges_x[global_local]
+    var_range_y = ranges_y[global_local]
 
     title = "Psychrometric Chart"
 
     if colorby_var != "None" and colorby_var != "Frequency":
         title = title + " colored by " + var_name + " (" + var_unit + ")"
 
-    dbt_list = list(range(-60, 60, 1))
-    rh_list = list(range(10, 110, 10))
-
-    rh_df = pd.DataFrame()
-    for i, rh in enumerate(rh_list):
-        hr_list = np.vectorize(psy.psy_ta_rh)(dbt_list, rh)
-        hr_df = pd.DataFrame.from_records(hr_list)
-        name = "rh" + str(rh)
-        rh_df[name] = hr_df["hr"]
-
     fig = go.Figure()
 
-    # Add traces
-    for i, rh in enumerate(rh_list):
-        name = "rh" + str(rh)
-
-        dbt_list_convert = list(dbt_list)
-        rh_convert = list(rh_df[name])
-
-        if si_ip == "ip":
-            for j in range(len(dbt_list)):
-                dbt_list_convert[j] = dbt_list_convert[j] * 1.8 + 32
-            for k in range(len(rh_df[name])):
-                rh_convert[k] = rh_convert[k] * 0.0624
-        fig.add_trace(
-            go.Scatter(
-                x=dbt_list_convert,
-                y=rh_convert,
-                showlegend=False,
-                mode="lines",
-                name="",
-                hovertemplate="RH " + str(rh) + "%",
-                line=dict(width=1, color="lightgrey"),
-            )
+    x, y, rh = rh_isolines(si_ip)
+    fig.add_trace(
+        go.Scatter(
+            x=x,
+            y=y,
+            customdata=rh,
+            showlegend=False,
+            mode="lines",
+            name="",
+            hovertemplate="RH %{customdata}%",
+            line=dict(width=1, color="lightgrey"),
         )
+    )
     if var == "None":
         fig.add_trace(
-            go.Scatter(
+            go.Scattergl(
                 x=df["DBT"],
                 y=df["hr"],
                 showlegend=False,
@@ -394,17 +439,22 @@ def update_psych_chart(
             )
         )
     elif var == "Frequency":
-        fig.add_trace(
-            go.Histogram2d(
-                x=df["DBT"],
-                y=df["hr"],
-                name="",
-                colorscale=var_color,
-                hovertemplate="",
-                autobinx=False,
-                xbins=dict(start=-50, end=60, size=1),
+        # the hours are binned here, instead of sending all of them to the browser
+        hr_edges = bin_edges(df["hr"])
+        if hr_edges is not None:
+            counts, x_edges, y_edges = np.histogram2d(
+                df["DBT"], df["hr"], [np.arange(-50, 61), hr_edges]
+            )
+            fig.add_trace(
+                go.Heatmap(
+                    x=x_edges[:-1] + 0.5,
+                    y=(y_edges[:-1] + y_edges[1:]) / 2,
+                    z=counts.T.astype(int),
+                    name="",
+                    colorscale=var_color,
+                    hovertemplate="",
+                )
             )
-        )
         # fig.add_trace(
         #     go.Scatter(
         #         x=dbt_list,
@@ -419,7 +469,7 @@ def update_psych_chart(
 
     else:
         fig.add_trace(
-            go.Scatter(
+            go.Scattergl(
                 x=df["DBT"],
                 y=df["hr"],
                 showlegend=False,
@@ -476,5 +526,7 @@ def update_psych_chart(
         linecolor="black",
         mirror=True,
     )
+    add_value_ranges(fig, ranges_x, axes=["xaxis"])
+    add_value_ranges(fig, ranges_y, axes=["yaxis"])
 
-    return dcc.Graph(config=generate_chart_name("psy", meta), figure=fig)
+    return fig
@@ -1,6 +1,5 @@
 import base64
 import io
-import json
 import re
 import dash
 import dash_bootstrap_components as dbc
@@ -8,9 +7,21 @@ from dash.exceptions import PreventUpdate
 
 from app import app
 from my_project.extract_df import create_df, get_data, get_location_info
-from my_project.utils import plot_location_epw_files, generate_chart_name
-from my_project.global_scheme import mapping_dictionary
-from my_project.extract_df import convert_data
+from my_project.dataset_cache import (
+    cache_dataset,
+    cached_dataset,
+    cached_station,
+    remember_station,
+)
+from my_project.figure_encoding import encode_figure
+from my_project.station_map import (
+    map_viewport,
+    station_catalog,
+    station_id,
+    station_map_figure,
+    station_urls,
+)
+from my_project.utils import generate_chart_name, parse_permalink, permalink
 
 from dash_extensions.enrich import ServersideOutput, Output, Input, State, html, dcc
 
@@ -24,6 +35,10 @@ messages_alert = {
 }
 
 
+# parse the station catalog and serialize the initial map when the app starts
+station_catalog().initial_figure()
+
+
 def layout_select():
     """Contents in the first tab 'Select Weather File'"""
     return html.Div(
@@ -54,7 +69,7 @@ def layout_select():
             ),
             dcc.Graph(
                 id="tab-one-map",
-                figure=plot_location_epw_files(),
+                figure=station_catalog().initial_figure(),
                 config=generate_chart_name("epw_location_select"),
             ),
             dbc.Modal(
@@ -118,6 +133,7 @@ def alert():
     [
         State("upload-data", "filename"),
         State("url-store", "data"),
+        State("si-ip-radio-input", "value"),
     ],
     prevent_initial_call=True,
 )
@@ -128,6 +144,7 @@ def submitted_data(
     list_of_contents,
     list_of_names,
     url_store,
+    si_ip,
 ):
     """Process the uploaded file or download the EPW from the URL"""
     ctx = dash.callback_context
@@ -143,6 +160,7 @@ def submitted_data(
                 "warning",
             )
         location_info = get_location_info(lines, url_store)  # we might need to split this call into two, one returns df and one returns location_info
+        remember_station(location_info)
         return (
             location_info,
             lines,
@@ -163,6 +181,8 @@ def submitted_data(
                 # Assume that the user uploaded a CSV file
                 lines = io.StringIO(decoded.decode("utf-8")).read().split("\n")
                 df, location_info = create_df(lines, list_of_names[0])
+                # the parsed dataset is cached, so switch_si_ip does not parse it again
+                cache_dataset(df, location_info, si_ip)
                 return (
                     location_info,
                     lines,
@@ -195,25 +215,105 @@ def submitted_data(
     [
         ServersideOutput("df-store", "data"),
         Output("si-ip-unit-store", "data"),
+        Output("dataset-meta-store", "data"),
     ],
     [
         Input("lines-store", "modified_timestamp"),
         Input("si-ip-radio-input", "value"),
     ],
-    [State("url-store", "data"), State("lines-store", "data")],
+    [State("lines-store", "data"), State("meta-store", "data")],
 )
-def switch_si_ip(ts, si_ip_input, url_store, lines):
-    if lines is not None:
-        df, _ = create_df(lines, url_store)
-        map_json = json.dumps(mapping_dictionary)
-        if si_ip_input == "ip":
-            map_json = convert_data(df, map_json)
-        return (df, si_ip_input)
-    else:
-        return (
-            None,
-            None,
-        )
+def switch_si_ip(ts, si_ip_input, lines, meta):
+    if meta is not None:
+        dataset, dataset_meta = cached_dataset(meta, si_ip_input, lines)
+        if dataset is not None:
+            return (dataset, si_ip_input, dataset_meta)
+    return (
+        None,
+        None,
+        None,
+    )
+
+
+@app.callback(
+    [
+        Output("meta-store", "data", allow_duplicate=True),
+        Output("lines-store", "data", allow_duplicate=True),
+        Output("permalink-store", "data"),
+    ],
+    [Input("url", "search")],
+    [State("meta-store", "data"), State("permalink-store", "data")],
+    prevent_initial_call="initial_duplicate",
+)
+def restore_station_from_permalink(search, meta, restored_search):
+    """Load the station encoded in the permalink, whatever tab it opens.
+
+    The stores are in every page, unlike the inputs of submitted_data. Each
+    permalink is restored once, so the station selected afterwards is not replaced
+    when the page is rendered again.
+    """
+    station = parse_permalink(search).get("station")
+    if station is None or search == restored_search:
+        raise PreventUpdate
+    if meta and station_id(meta["url"]) == station:
+        return dash.no_update, dash.no_update, search
+    location_info = cached_station(station)
+    if location_info is not None:
+        # the dataset is loaded from the cache by switch_si_ip
+        return location_info, None, search
+    url = station_urls().get(station)
+    lines = get_data(url) if url else None
+    if lines is None:
+        return dash.no_update, dash.no_update, search
+    location_info = get_location_info(lines, url)
+    remember_station(location_info)
+    return location_info, lines, search
+
+
+@app.callback(
+    [
+        Output("si-ip-radio-input", "value"),
+        Output("global-local-radio-input", "value"),
+    ],
+    [Input("url", "search")],
+    [
+        State("si-ip-radio-input", "value"),
+        State("global-local-radio-input", "value"),
+    ],
+)
+def restore_units_from_permalink(search, si_ip, global_local):
+    """Select the units and value ranges encoded in the permalink"""
+    query = parse_permalink(search)
+    units = query.get("units", si_ip)
+    ranges = query.get("ranges", global_local)
+    if units not in ["si", "ip"] or ranges not in ["global", "local"]:
+        raise PreventUpdate
+    if units == si_ip and ranges == global_local:
+        raise PreventUpdate
+    return (
+        units if units != si_ip else dash.no_update,
+        ranges if ranges != global_local else dash.no_update,
+    )
+
+
+@app.callback(
+    [
+        Output("permalink", "href"),
+        Output("permalink", "style"),
+    ],
+    [
+        Input("meta-store", "data"),
+        Input("si-ip-radio-input", "value"),
+        Input("tabs", "value"),
+        Input("global-local-radio-input", "value"),
+    ],
+)
+def update_permalink(meta, si_ip, tab, global_local):
+    """Link to the station, units, tab and value ranges currently selected"""
+    href = permalink(meta["url"], si_ip, tab, global_local) if meta else None
+    if href is None:
+        return None, {"display": "none"}
+    return href, {"display": "block"}
 
 
 @app.callback(
@@ -228,15 +328,13 @@ def switch_si_ip(ts, si_ip_input, url_store, lines):
         Output("tab-natural-ventilation", "disabled"),
         Output("banner-subtitle", "children"),
     ],
-    [
-        Input("meta-store", "data"),
-        Input("df-store", "data"),
-    ],
+    [Input("dataset-meta-store", "data")],
+    [State("meta-store", "data")],
 )
-def enable_tabs_when_data_is_loaded(meta, data):
+def enable_tabs_when_data_is_loaded(dataset_meta, meta):
     """Hide tabs when data are not loaded"""
     default = "Current Location: N/A"
-    if data is None:
+    if dataset_meta is None or meta is None:
         return (
             True,
             True,
@@ -262,6 +360,31 @@ def enable_tabs_when_data_is_loaded(meta, data):
         )
 
 
+@app.callback(
+    Output("tab-one-map", "figure"),
+    [
+        Input("tab-one-map", "relayoutData"),
+        Input("tab-one-map", "clickData"),
+    ],
+    prevent_initial_call=True,
+)
+def update_station_map(relayout_data, click_map):
+    """Show the stations in the viewport, clustered if there are too many"""
+    ctx = dash.callback_context
+    if ctx.triggered[0]["prop_id"] == "tab-one-map.clickData":
+        point = click_map["points"][0]
+        if "hovertext" in point:
+            raise PreventUpdate
+        # zoom in on the cluster of stations clicked
+        center = {"lat": point["lat"], "lon": point["lon"]}
+        return encode_figure(station_map_figure(center, point["customdata"][1] + 2))
+
+    viewport = map_viewport(relayout_data or {})
+    if viewport is None:
+        raise PreventUpdate
+    return encode_figure(station_map_figure(*viewport))
+
+
 @app.callback(
     [
         Output("modal", "is_open"),
@@ -277,6 +400,9 @@ def enable_tabs_when_data_is_loaded(meta, data):
 )
 def display_modal_when_data_clicked(clicks_use_epw, click_map, close_clicks, is_open):
     """display the modal to the user and check if he wants to use that file"""
+    if click_map and "hovertext" not in click_map["points"][0]:
+        # a cluster of stations was clicked, the map is zoomed in on it instead
+        raise PreventUpdate
     if click_map:
         url = re.search(
             r'href=[\'"]?([^\'" >]+)', click_map["points"][0]["customdata"][-1]
@@ -296,6 +422,8 @@ def display_modal_when_data_clicked(clicks_use_epw, click_map, close_clicks, is_
 )
 def display_modal_when_data_clicked(click_map):
     """change the text of the modal header"""
+    if click_map and "hovertext" not in click_map["points"][0]:
+        raise PreventUpdate
     if click_map:
         return [f"Analyse data from {click_map['points'][0]['hovertext']}?"]
     return ["Analyse data from this location?"]
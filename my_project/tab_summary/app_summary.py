@@ -3,14 +3,19 @@ import dash
 import json
 from dash.exceptions import PreventUpdate
 from app import app
-from my_project.tab_summary.charts_summary import world_map
+from my_project.tab_summary.charts_summary import (
+    world_map,
+    degree_days,
+    degree_day_sweep,
+)
 from my_project.template_graphs import violin
 from my_project.utils import generate_chart_name, title_with_tooltip
-import plotly.graph_objects as go
-from my_project.global_scheme import template, tight_margins, mapping_dictionary
+from my_project.global_scheme import mapping_dictionary
 import requests
 from my_project.extract_df import convert_data, get_data
 from my_project.utils import code_timer
+from my_project.figure_cache import cached_figure
+from my_project.dataset import Location
 from dash_extensions.enrich import dcc, html, Output, Input, State
 
 
@@ -47,7 +52,7 @@ def layout_summary(si_ip):
                         children=title_with_tooltip(
                             text="Download",
                             id_button="download-button-label",
-                            tooltip_text="Use the following buttons to download either the Clima sourcefile or the EPW file",
+                            tooltip_text="Use the following buttons to download the Clima sourcefile, the EPW file or the summary statistics of the location",
                         ),
                     ),
                     dcc.Loading(
@@ -70,10 +75,19 @@ def layout_summary(si_ip):
                                     ),
                                     width="auto",
                                 ),
+                                dbc.Col(
+                                    dbc.Button(
+                                        "Download summary",
+                                        color="primary",
+                                        id="download-summary-button",
+                                    ),
+                                    width="auto",
+                                ),
                                 dbc.Col(
                                     [
                                         dcc.Download(id="download-dataframe-csv"),
                                         dcc.Download(id="download-epw"),
+                                        dcc.Download(id="download-summary-json"),
                                     ],
                                     width=1,
                                 ),
@@ -173,7 +187,7 @@ def update_map(meta):
     map_world = dcc.Graph(
         id="gh_rad-profile-graph",
         config=generate_chart_name("map_summary", meta),
-        figure=world_map(meta),
+        figure=world_map(Location.from_meta(meta)),
     )
 
     return map_world
@@ -189,14 +203,13 @@ def update_map(meta):
     ],
 )
 @code_timer
-def update_location_info(ts, df, meta, si_ip):
+def update_location_info(ts, ds, meta, si_ip):
     """Update the contents of tab two. Passing in the general info (df, meta)."""
     location = f"Location: {meta['city']}, {meta['country']}"
     lon = f"Longitude: {meta['lon']}"
     lat = f"Latitude: {meta['lat']}"
 
-    site_elevation = float(meta["site_elevation"])
-    site_elevation = round(site_elevation, 2)
+    site_elevation = round(ds.location.site_elevation, 2)
     if si_ip != "si":
         site_elevation = site_elevation * 3.281
         site_elevation = round(site_elevation, 2)
@@ -204,8 +217,8 @@ def update_location_info(ts, df, meta, si_ip):
     else:
         elevation = f"Elevation above sea level: {meta['site_elevation']} m"
     period = ""
-    if meta["period"]:
-        start, stop = meta["period"].split("-")
+    if ds.location.period:
+        start, stop = ds.location.period.split("-")
         period = f"This file is based on data collected between {start} and {stop}"
 
     r = requests.get(
@@ -224,24 +237,24 @@ def update_location_info(ts, df, meta, si_ip):
         except KeyError:
             pass
 
+    summary = ds.summary
     # global horizontal irradiance
     total_solar_rad_unit = mapping_dictionary["glob_hor_rad"][si_ip]["unit"]
     total_solar_rad = (
-        f"Annual cumulative horizontal solar radiation: {round(df['glob_hor_rad'].sum() /1000, 2)}"
+        f"Annual cumulative horizontal solar radiation: {round(summary.total('glob_hor_rad') / 1000, 2)}"
         + total_solar_rad_unit
     )
-    total_diffuse_rad = f"Percentage of diffuse horizontal solar radiation: {round(df['dif_hor_rad'].sum()/df['glob_hor_rad'].sum()*100, 1)} %"
+    total_diffuse_rad = f"Percentage of diffuse horizontal solar radiation: {round(summary.diffuse_fraction * 100, 1)} %"
     tmp_unit = mapping_dictionary["DBT"][si_ip]["unit"]
+    tmp_stats = summary.yearly("DBT")
     average_yearly_tmp = (
-        f"Average yearly temperature: {df['DBT'].mean().round(1)}" + tmp_unit
+        f"Average yearly temperature: {tmp_stats['mean'].round(1)}" + tmp_unit
     )
     hottest_yearly_tmp = (
-        f"Hottest yearly temperature (99%): {df['DBT'].quantile(0.99).round(1)}"
-        + tmp_unit
+        f"Hottest yearly temperature (99%): {tmp_stats['99%'].round(1)}" + tmp_unit
     )
     coldest_yearly_tmp = (
-        f"Coldest yearly temperature (1%): {df['DBT'].quantile(0.01).round(1)}"
-        + tmp_unit
+        f"Coldest yearly temperature (1%): {tmp_stats['1%'].round(1)}" + tmp_unit
     )
 
     location_info = dbc.Col(
@@ -288,7 +301,7 @@ def update_location_info(ts, df, meta, si_ip):
     ],
 )
 @code_timer
-def degree_day_chart(ts, ts_click, df, meta, hdd_value, cdd_value, n_clicks, si_ip):
+def degree_day_chart(ts, ts_click, ds, meta, hdd_value, cdd_value, n_clicks, si_ip):
     """Update the contents of tab two. Passing in the general info (df, meta)."""
 
     ctx = dash.callback_context
@@ -305,100 +318,60 @@ def degree_day_chart(ts, ts_click, df, meta, hdd_value, cdd_value, n_clicks, si_
         if cdd_setpoint < hdd_setpoint:
             warning_setpoint = True
 
-        color_hdd = "red"
-        color_cdd = "dodgerblue"
-
-        hdd_array = []
-        cdd_array = []
-        months = df["month_names"].unique()
-
-        for i in range(1, 13):
-            query_month = "month=="
-
-            # calculates HDD per month
-            query = query_month + str(i) + " and DBT<=" + str(hdd_setpoint)
-            a = df.query(query)["DBT"].sub(hdd_setpoint)
-            hdd = a.sum(axis=0, skipna=True)
-            hdd = hdd / 24
-            hdd = int(hdd)
-            hdd_array.append(hdd)
-
-            # calculates CDD per month
-            query = query_month + str(i) + " and DBT>=" + str(cdd_setpoint)
-            a = df.query(query)["DBT"].sub(cdd_setpoint)
-            cdd = a.sum(axis=0, skipna=True)
-            cdd = cdd / 24
-            cdd = int(cdd)
-            cdd_array.append(cdd)
-
-        trace1 = go.Bar(
-            x=months,
-            y=hdd_array,
-            name="Heating Degree Days",
-            marker_color=color_hdd,
-            customdata=[abs(ele) for ele in hdd_array],
-            hovertemplate=(
-                " Heating Degree Days: <br>%{customdata} per month<br><extra></extra>"
-            ),
-        )
-        trace2 = go.Bar(
-            x=months,
-            y=cdd_array,
-            name="Cooling Degree Days",
-            marker_color=color_cdd,
-            customdata=cdd_array,
-            hovertemplate=(
-                "Cooling Degree Days: <br>%{customdata} per month<br><extra></extra>"
-            ),
-        )
-
-        data = [trace2, trace1]
-
-        fig = go.Figure(
-            data=data,
-        )
-        fig.update_layout(
-            barmode="relative",
-            margin=tight_margins,
-            template=template,
-            dragmode=False,
-            legend=dict(
-                orientation="h", yanchor="bottom", y=1.05, xanchor="right", x=1
-            ),
-        )
-
-        fig.update_xaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
-        fig.update_yaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
-
         chart = dcc.Graph(
             id="degree-days-chart",
             config=generate_chart_name("hdd_cdd_summary", meta),
-            figure=fig,
+            figure=cached_figure(
+                ds,
+                "hdd_cdd_summary",
+                lambda: degree_days(ds, hdd_setpoint, cdd_setpoint),
+                hdd_setpoint=hdd_setpoint,
+                cdd_setpoint=cdd_setpoint,
+                si_ip=si_ip,
+            ),
+        )
+        sweep_chart = dcc.Graph(
+            id="degree-days-sweep-chart",
+            config=generate_chart_name("hdd_cdd_base_temperature", meta),
+            figure=cached_figure(
+                ds,
+                "hdd_cdd_base_temperature",
+                lambda: degree_day_sweep(ds, hdd_setpoint, cdd_setpoint, si_ip),
+                hdd_setpoint=hdd_setpoint,
+                cdd_setpoint=cdd_setpoint,
+                si_ip=si_ip,
+            ),
         )
 
-        return chart, warning_setpoint
+        return [chart, sweep_chart], warning_setpoint
 
 
 @app.callback(
     Output("temp-profile-graph", "children"),
     [
         Input("df-store", "modified_timestamp"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
 @code_timer
-def update_violin_tdb(ts, global_local, df, meta, si_ip):
+def update_violin_tdb(ts, global_local, ds, meta, si_ip):
 
     return dcc.Graph(
         id="tdb-profile-graph",
         className="violin-container",
         config=generate_chart_name("tdb_summary", meta),
-        figure=violin(df, "DBT", global_local, si_ip),
+        figure=cached_figure(
+            ds,
+            "tdb_summary",
+            lambda: violin(ds, "DBT", global_local, si_ip),
+            global_local=global_local,
+            si_ip=si_ip,
+        ),
     )
 
 
@@ -406,23 +379,29 @@ def update_violin_tdb(ts, global_local, df, meta, si_ip):
     Output("wind-speed-graph", "children"),
     [
         Input("df-store", "modified_timestamp"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
 @code_timer
-def update_tab_wind(ts, global_local, df, meta, si_ip):
+def update_tab_wind(ts, global_local, ds, meta, si_ip):
     """Update the contents of tab two. Passing in the general info (df, meta)."""
 
     return dcc.Graph(
         id="wind-profile-graph",
         className="violin-container",
         config=generate_chart_name("wind_summary", meta),
-        figure=violin(df, "wind_speed", global_local, si_ip),
+        figure=cached_figure(
+            ds,
+            "wind_summary",
+            lambda: violin(ds, "wind_speed", global_local, si_ip),
+            global_local=global_local,
+            si_ip=si_ip,
+        ),
     )
 
 
@@ -430,23 +409,29 @@ def update_tab_wind(ts, global_local, df, meta, si_ip):
     Output("humidity-profile-graph", "children"),
     [
         Input("df-store", "modified_timestamp"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
 @code_timer
-def update_tab_rh(ts, global_local, df, meta, si_ip):
+def update_tab_rh(ts, global_local, ds, meta, si_ip):
     """Update the contents of tab two. Passing in the general info (df, meta)."""
 
     return dcc.Graph(
         id="rh-profile-graph",
         className="violin-container",
         config=generate_chart_name("rh_summary", meta),
-        figure=violin(df, "RH", global_local, si_ip),
+        figure=cached_figure(
+            ds,
+            "rh_summary",
+            lambda: violin(ds, "RH", global_local, si_ip),
+            global_local=global_local,
+            si_ip=si_ip,
+        ),
     )
 
 
@@ -454,23 +439,29 @@ def update_tab_rh(ts, global_local, df, meta, si_ip):
     Output("solar-radiation-graph", "children"),
     [
         Input("df-store", "modified_timestamp"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
 @code_timer
-def update_tab_gh_rad(ts, global_local, df, meta, si_ip):
+def update_tab_gh_rad(ts, global_local, ds, meta, si_ip):
     """Update the contents of tab two. Passing in the general info (df, meta)."""
 
     return dcc.Graph(
         id="gh_rad-profile-graph",
         className="violin-container",
         config=generate_chart_name("solar_summary", meta),
-        figure=violin(df, "glob_hor_rad", global_local, si_ip),
+        figure=cached_figure(
+            ds,
+            "solar_summary",
+            lambda: violin(ds, "glob_hor_rad", global_local, si_ip),
+            global_local=global_local,
+            si_ip=si_ip,
+        ),
     )
 
 
@@ -485,22 +476,43 @@ def update_tab_gh_rad(ts, global_local, df, meta, si_ip):
     prevent_initial_call=True,
 )
 @code_timer
-def download_clima_dataframe(n_clicks, df, meta, si_ip):
+def download_clima_dataframe(n_clicks, ds, meta, si_ip):
     if n_clicks is None:
         raise PreventUpdate
-    elif df is not None:
+    elif ds is not None:
         if si_ip == "si":
             return dcc.send_data_frame(
-                df.to_csv, f"df_{meta['city']}_{meta['country']}_Clima_SIunit.csv"
+                ds.df.to_csv, f"df_{meta['city']}_{meta['country']}_Clima_SIunit.csv"
             )
         else:
             return dcc.send_data_frame(
-                df.to_csv, f"df_{meta['city']}_{meta['country']}_Clima_IPunit.csv"
+                ds.df.to_csv, f"df_{meta['city']}_{meta['country']}_Clima_IPunit.csv"
             )
     else:
         print("df not loaded yet")
 
 
+@app.callback(
+    Output("download-summary-json", "data"),
+    [Input("download-summary-button", "n_clicks")],
+    [
+        State("df-store", "data"),
+        State("meta-store", "data"),
+        State("si-ip-unit-store", "data"),
+    ],
+    prevent_initial_call=True,
+)
+@code_timer
+def download_location_summary(n_clicks, ds, meta, si_ip):
+    if n_clicks is None or ds is None:
+        raise PreventUpdate
+    unit = "SIunit" if si_ip == "si" else "IPunit"
+    return dict(
+        content=ds.summary.to_json(),
+        filename=f"summary_{meta['city']}_{meta['country']}_Clima_{unit}.json",
+    )
+
+
 @app.callback(
     Output("download-epw", "data"),
     [Input("download-epw-button", "n_clicks")],
@@ -1,14 +1,17 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+from my_project.global_scheme import template, tight_margins
 
 
-def world_map(meta):
+def world_map(location):
     """Return the world map showing the current location."""
-    latitude = float(meta["lat"])
-    longitude = float(meta["lon"])
-    city = meta["city"]
-    country = meta["country"]
-    time_zone = float(meta["time_zone"])
+    latitude = location.lat
+    longitude = location.lon
+    city = location.city
+    country = location.country
+    time_zone = location.time_zone
     lat_long_df = pd.DataFrame(
         data={
             "Lat": [latitude],
@@ -34,3 +37,96 @@ def world_map(meta):
     fig.update_layout(mapbox_style="carto-positron")
     fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
     return fig
+
+
+def degree_days(dataset, hdd_setpoint, cdd_setpoint):
+    """Return the monthly heating and cooling degree days chart."""
+    color_hdd = "red"
+    color_cdd = "dodgerblue"
+
+    hdd_array = np.trunc(dataset.degree_days.heating(hdd_setpoint)[0]).astype(int)
+    cdd_array = np.trunc(dataset.degree_days.cooling(cdd_setpoint)[0]).astype(int)
+    months = dataset.df["month_names"].unique()
+
+    trace1 = go.Bar(
+        x=months,
+        y=hdd_array,
+        name="Heating Degree Days",
+        marker_color=color_hdd,
+        customdata=np.abs(hdd_array),
+        hovertemplate=(
+            " Heating Degree Days: <br>%{customdata} per month<br><extra></extra>"
+        ),
+    )
+    trace2 = go.Bar(
+        x=months,
+        y=cdd_array,
+        name="Cooling Degree Days",
+        marker_color=color_cdd,
+        customdata=cdd_array,
+        hovertemplate=(
+            "Cooling Degree Days: <br>%{customdata} per month<br><extra></extra>"
+        ),
+    )
+
+    data = [trace2, trace1]
+
+    fig = go.Figure(
+        data=data,
+    )
+    fig.update_layout(
+        barmode="relative",
+        margin=tight_margins,
+        template=template,
+        dragmode=False,
+        legend=dict(orientation="h", yanchor="bottom", y=1.05, xanchor="right", x=1),
+    )
+
+    fig.update_xaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
+    fig.update_yaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
+
+    return fig
+
+
+def degree_day_sweep(dataset, hdd_setpoint, cdd_setpoint, si_ip):
+    """Return the chart of the yearly heating and cooling degree days as a
+    function of the base temperature, with the selected setpoints marked."""
+    dbt = dataset.column("DBT")
+    base = np.arange(np.floor(np.nanmin(dbt)), np.ceil(np.nanmax(dbt)) + 1)
+    hdd = np.abs(dataset.degree_days.heating(base).sum(axis=1))
+    cdd = dataset.degree_days.cooling(base).sum(axis=1)
+    unit = "°F" if si_ip == "ip" else "°C"
+
+    fig = go.Figure()
+    for name, values, color, setpoint in [
+        ("Heating Degree Days", hdd, "red", hdd_setpoint),
+        ("Cooling Degree Days", cdd, "dodgerblue", cdd_setpoint),
+    ]:
+        fig.add_trace(
+            go.Scatter(
+                x=base,
+                y=values,
+                name=name,
+                mode="lines",
+                line_color=color,
+                hovertemplate=(
+                    name + ": %{y:.0f} per year<br>"
+                    "Base temperature: %{x} " + unit + "<extra></extra>"
+                ),
+            )
+        )
+        fig.add_vline(x=setpoint, line_dash="dash", line_color=color)
+
+    fig.update_layout(
+        margin=tight_margins,
+        template=template,
+        dragmode=False,
+        xaxis_title="Base temperature (" + unit + ")",
+        yaxis_title="Degree days per year",
+        legend=dict(orientation="h", yanchor="bottom", y=1.05, xanchor="right", x=1),
+    )
+
+    fig.update_xaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
+    fig.update_yaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
+
+    return fig
@@ -19,6 +19,7 @@ from my_project.tab_sun.charts_sun import (
 from my_project.template_graphs import heatmap, barchart, daily_profile
 from my_project.utils import code_timer
 from my_project.utils import title_with_tooltip, generate_chart_name
+from my_project.figure_cache import cached_figure
 
 from app import app
 
@@ -188,30 +189,35 @@ def layout_sun(si_ip):
     ],
 )
 @code_timer
-def monthly_and_cloud_chart(ts, df, meta, si_ip):
+def monthly_and_cloud_chart(ts, ds, meta, si_ip):
     """Update the contents of tab four. Passing in the polar selection and the general info (df, meta)."""
 
-    # Sun Radiation
-    monthly = monthly_solar(df, si_ip)
-    monthly = monthly.update_layout(margin=tight_margins)
+    def build_monthly():
+        # Sun Radiation
+        monthly = monthly_solar(ds, si_ip)
+        return monthly.update_layout(margin=tight_margins)
 
-    # Cloud Cover
-    cover = barchart(df, "tot_sky_cover", [False], [False, "", 3, 7], True, si_ip)
-    cover = cover.update_layout(
-        margin=tight_margins,
-        title="",
-        legend=dict(orientation="h", yanchor="bottom", y=1.05, xanchor="right", x=1),
-    )
-    cover.update_xaxes(
-        dict(tickmode="array", tickvals=np.arange(0, 12, 1), ticktext=month_lst)
-    )
+    def build_cover():
+        # Cloud Cover
+        cover = barchart(ds, "tot_sky_cover", [False], [False, "", 3, 7], True, si_ip)
+        cover = cover.update_layout(
+            margin=tight_margins,
+            title="",
+            legend=dict(
+                orientation="h", yanchor="bottom", y=1.05, xanchor="right", x=1
+            ),
+        )
+        cover.update_xaxes(
+            dict(tickmode="array", tickvals=np.arange(0, 12, 1), ticktext=month_lst)
+        )
+        return cover
 
     return dcc.Graph(
         config=generate_chart_name("monthly_sun", meta),
-        figure=monthly,
+        figure=cached_figure(ds, "monthly_sun", build_monthly, si_ip=si_ip),
     ), dcc.Graph(
         config=generate_chart_name("cloud_cover_sun", meta),
-        figure=cover,
+        figure=cached_figure(ds, "cloud_cover_sun", build_cover, si_ip=si_ip),
     )
 
 
@@ -221,27 +227,41 @@ def monthly_and_cloud_chart(ts, df, meta, si_ip):
         Input("df-store", "modified_timestamp"),
         Input("custom-sun-view-dropdown", "value"),
         Input("custom-sun-var-dropdown", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
 @code_timer
-def sun_path_chart(ts, view, var, global_local, df, meta, si_ip):
+def sun_path_chart(ts, view, var, global_local, ds, meta, si_ip):
     """Update the contents of tab four. Passing in the polar selection and the general info (df, meta)."""
 
     if view == "polar":
         return dcc.Graph(
             config=generate_chart_name("spherical_sun_path_sun", meta),
-            figure=polar_graph(df, meta, global_local, var, si_ip),
+            figure=cached_figure(
+                ds,
+                "spherical_sun_path_sun",
+                lambda: polar_graph(ds, global_local, var, si_ip),
+                var=var,
+                global_local=global_local,
+                si_ip=si_ip,
+            ),
         )
     else:
         return dcc.Graph(
             config=generate_chart_name("cartesian_sun_path_sun", meta),
-            figure=custom_cartesian_solar(df, meta, global_local, var, si_ip),
+            figure=cached_figure(
+                ds,
+                "cartesian_sun_path_sun",
+                lambda: custom_cartesian_solar(ds, global_local, var, si_ip),
+                var=var,
+                global_local=global_local,
+                si_ip=si_ip,
+            ),
         )
 
 
@@ -250,21 +270,28 @@ def sun_path_chart(ts, view, var, global_local, df, meta, si_ip):
     [
         Input("df-store", "modified_timestamp"),
         Input("tab4-explore-dropdown", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
 @code_timer
-def daily(ts, var, global_local, df, meta, si_ip):
+def daily(ts, var, global_local, ds, meta, si_ip):
     """Update the contents of tab four section two. Passing in the general info (df, meta)."""
 
     return dcc.Graph(
         config=generate_chart_name("daily_sun", meta),
-        figure=daily_profile(df, var, global_local, si_ip),
+        figure=cached_figure(
+            ds,
+            "daily_sun",
+            lambda: daily_profile(ds, var, global_local, si_ip),
+            var=var,
+            global_local=global_local,
+            si_ip=si_ip,
+        ),
     )
 
 
@@ -273,18 +300,25 @@ def daily(ts, var, global_local, df, meta, si_ip):
     [
         Input("df-store", "modified_timestamp"),
         Input("tab4-explore-dropdown", "value"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
 @code_timer
-def update_heatmap(ts, var, global_local, df, meta, si_ip):
+def update_heatmap(ts, var, global_local, ds, meta, si_ip):
 
     return dcc.Graph(
         config=generate_chart_name("heatmap_sun", meta),
-        figure=heatmap(df, var, global_local, si_ip),
+        figure=cached_figure(
+            ds,
+            "heatmap_sun",
+            lambda: heatmap(ds.df, var, global_local, si_ip),
+            var=var,
+            global_local=global_local,
+            si_ip=si_ip,
+        ),
     )
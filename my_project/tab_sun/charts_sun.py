@@ -1,5 +1,5 @@
 from datetime import timedelta
-from math import ceil, cos, floor, radians
+from math import cos, radians
 
 import json
 import numpy as np
@@ -12,86 +12,54 @@ from my_project.global_scheme import (
     tight_margins,
     month_lst,
 )
-from plotly.subplots import make_subplots
 from pvlib import solarposition
 
+from my_project.template_graphs import (
+    MONTH_WIDTH,
+    month_panels,
+    month_rows,
+    monthly_profile_xy,
+)
+from my_project.utils import add_value_ranges, value_ranges
 
-def monthly_solar(epw_df, si_ip):
-    g_h_rad_month_ave = (
-        epw_df.groupby(["month", "hour"])["glob_hor_rad"].median().reset_index()
-    )
-    dif_h_rad_month_ave = (
-        epw_df.groupby(["month", "hour"])["dif_hor_rad"].median().reset_index()
-    )
-    fig = make_subplots(
-        rows=1,
-        cols=12,
-        subplot_titles=month_lst,
-    )
-
-    for i in range(12):
 
+def monthly_solar(dataset, si_ip):
+    """Return the monthly daily profiles of global and diffuse radiation."""
+    fig = go.Figure()
+    for var, name, color in [
+        ("glob_hor_rad", "Global Horizontal Solar Radiation", "orange"),
+        ("dif_hor_rad", "Diffuse Horizontal Solar Radiation", "dodgerblue"),
+    ]:
+        x, hours, y = monthly_profile_xy(dataset.monthly_profile, var)
         fig.add_trace(
             go.Scatter(
-                x=g_h_rad_month_ave.loc[g_h_rad_month_ave["month"] == i + 1, "hour"],
-                y=g_h_rad_month_ave.loc[
-                    g_h_rad_month_ave["month"] == i + 1, "glob_hor_rad"
-                ],
+                x=x,
+                y=y,
                 fill="tozeroy",
                 mode="lines",
-                line_color="orange",
+                line_color=color,
                 line_width=2,
-                name=None,
+                name="",
                 showlegend=False,
-                customdata=epw_df.loc[epw_df["month"] == i + 1, "month_names"],
+                customdata=hours,
+                text=np.repeat(month_lst, MONTH_WIDTH),
                 hovertemplate=(
                     "<b>"
-                    + "Global Horizontal Solar Radiation"
+                    + name
                     + ": %{y:.2f} "
-                    + mapping_dictionary["glob_hor_rad"][si_ip]["unit"]
+                    + mapping_dictionary[var][si_ip]["unit"]
                     + "</b><br>"
-                    + "Month: %{customdata}<br>"
-                    + "Hour: %{x}:00<br>"
+                    + "Month: %{text}<br>"
+                    + "Hour: %{customdata}:00<br>"
                 ),
-            ),
-            row=1,
-            col=i + 1,
+            )
         )
 
-        fig.add_trace(
-            go.Scatter(
-                x=dif_h_rad_month_ave.loc[
-                    dif_h_rad_month_ave["month"] == i + 1, "hour"
-                ],
-                y=dif_h_rad_month_ave.loc[
-                    dif_h_rad_month_ave["month"] == i + 1, "dif_hor_rad"
-                ],
-                fill="tozeroy",
-                mode="lines",
-                line_color="dodgerblue",
-                line_width=2,
-                name=None,
-                showlegend=False,
-                customdata=epw_df.loc[epw_df["month"] == i + 1, "month_names"],
-                hovertemplate=(
-                    "<b>"
-                    + "Diffuse Horizontal Solar Radiation"
-                    + ": %{y:.2f} "
-                    + mapping_dictionary["dif_hor_rad"][si_ip]["unit"]
-                    + "</b><br>"
-                    + "Month: %{customdata}<br>"
-                    + "Hour: %{x}:00<br>"
-                ),
-            ),
-            row=1,
-            col=i + 1,
-        )
-        
-        fig.update_xaxes(range=[0, 25], row=1, col=i + 1)
-        if si_ip == "si":
-            fig.update_yaxes(range=[0, 1000], row=1, col=i + 1)
-        if si_ip == "ip":
-            fig.update_yaxes(range=[0, 400], row=1, col=i + 1)
+    month_panels(fig)
+    if si_ip == "si":
+        fig.update_yaxes(range=[0, 1000])
+    if si_ip == "ip":
+        fig.update_yaxes(range=[0, 400])
 
     fig.update_layout(
         template=template,
@@ -100,26 +68,70 @@ def monthly_solar(epw_df, si_ip):
     return fig
 
 
-def polar_graph(df, meta, global_local, var, si_ip):
+def add_analemma(fig, scatter, coordinates, data, var, marker_size, si_ip):
+    """Add the hourly positions of the sun to the figure, as a trace per month.
+
+    coordinates maps the coordinates of the scatter traces to their values (e.g.
+    x and y). If var is not "None" the markers are colored by it, on the color
+    axis of the layout.
+    """
+    columns = [data["day"], data["hour"], data["elevation"], data["azimuth"]]
+    hovertemplate = (
+        "<br>day: %{customdata[0]:.0f}"
+        + "<br>hour: %{customdata[1]:.0f}:00"
+        + "<br>sun altitude: %{customdata[2]:.2f}"
+        + degrees_unit
+        + "<br>sun azimuth: %{customdata[3]:.2f}"
+        + degrees_unit
+        + "<br>"
+    )
+    if var != "None":
+        columns.append(data[var])
+        hovertemplate += (
+            "<br><b>"
+            + mapping_dictionary[var]["name"]
+            + ": %{customdata[4]:.2f}"
+            + mapping_dictionary[var][si_ip]["unit"]
+            + "</b>"
+        )
+    customdata = np.stack(columns, axis=-1)
+    coordinates = {key: np.asarray(value) for key, value in coordinates.items()}
+
+    for month_name, rows in month_rows(data["month"]):
+        if var == "None":
+            marker = dict(color="orange", size=marker_size)
+        else:
+            marker = dict(
+                color=data[var].to_numpy()[rows],
+                size=marker_size.to_numpy()[rows],
+                coloraxis="coloraxis",
+            )
+        fig.add_trace(
+            scatter(
+                **{key: value[rows] for key, value in coordinates.items()},
+                mode="markers",
+                marker=dict(line_width=0, **marker),
+                customdata=customdata[rows],
+                hovertemplate="month: " + month_name + hovertemplate,
+                name="",
+            )
+        )
+
+
+def polar_graph(dataset, global_local, var, si_ip):
     """Return the figure for the custom sun path."""
-    latitude = float(meta["lat"])
-    longitude = float(meta["lon"])
-    time_zone = float(meta["time_zone"])
+    df = dataset.df
+    latitude = dataset.location.lat
+    longitude = dataset.location.lon
+    time_zone = dataset.location.time_zone
     solpos = df.loc[df["apparent_elevation"] > 0, :]
 
     if var != "None":
         var_unit = mapping_dictionary[var][si_ip]["unit"]
         var_range = mapping_dictionary[var][si_ip]["range"]
-        var_name = mapping_dictionary[var]["name"]
         var_color = mapping_dictionary[var]["color"]
-        if global_local == "global":
-            # Set Global values for Max and minimum
-            range_z = var_range
-        else:
-            # Set maximum and minimum according to data
-            data_max = 5 * ceil(solpos[var].max() / 5)
-            data_min = 5 * floor(solpos[var].min() / 5)
-            range_z = [data_min, data_max]
+        ranges = value_ranges(solpos[var], var_range)
+        range_z = ranges[global_local]
 
     tz = "UTC"
     times = pd.date_range(
@@ -155,78 +167,18 @@ def polar_graph(df, meta, global_local, var, si_ip):
             )
         )
     # Draw annalemma
-    if var == "None":
-        fig.add_trace(
-            go.Scatterpolar(
-                r=90 * np.cos(np.radians(90 - solpos["apparent_zenith"])),
-                theta=solpos["azimuth"],
-                mode="markers",
-                marker_color="orange",
-                marker_size=marker_size,
-                marker_line_width=0,
-                customdata=np.stack(
-                    (
-                        solpos["day"],
-                        solpos["month_names"],
-                        solpos["hour"],
-                        solpos["elevation"],
-                        solpos["azimuth"],
-                    ),
-                    axis=-1,
-                ),
-                hovertemplate="month: %{customdata[1]}"
-                + "<br>day: %{customdata[0]:.0f}"
-                + "<br>hour: %{customdata[2]:.0f}:00"
-                + "<br>sun altitude: %{customdata[3]:.2f}"
-                + degrees_unit
-                + "<br>sun azimuth: %{customdata[4]:.2f}"
-                + degrees_unit
-                + "<br>",
-                name="",
-            )
-        )
-    else:
-        fig.add_trace(
-            go.Scatterpolar(
-                r=90 * np.cos(np.radians(90 - solpos["apparent_zenith"])),
-                theta=solpos["azimuth"],
-                mode="markers",
-                marker=dict(
-                    color=solpos[var],
-                    size=marker_size,
-                    line_width=0,
-                    colorscale=var_color,
-                    cmin=range_z[0],
-                    cmax=range_z[1],
-                    colorbar=dict(thickness=30, title=var_unit + "<br>  "),
-                ),
-                customdata=np.stack(
-                    (
-                        solpos["day"],
-                        solpos["month_names"],
-                        solpos["hour"],
-                        solpos["elevation"],
-                        solpos["azimuth"],
-                        solpos[var],
-                    ),
-                    axis=-1,
-                ),
-                hovertemplate="month: %{customdata[1]}"
-                + "<br>day: %{customdata[0]:.0f}"
-                + "<br>hour: %{customdata[2]:.0f}:00"
-                + "<br>sun altitude: %{customdata[3]:.2f}"
-                + degrees_unit
-                + "<br>sun azimuth: %{customdata[4]:.2f}"
-                + degrees_unit
-                + "<br>"
-                + "<br><b>"
-                + var_name
-                + ": %{customdata[5]:.2f}"
-                + var_unit
-                + "</b>",
-                name="",
-            )
-        )
+    add_analemma(
+        fig,
+        go.Scatterpolar,
+        {
+            "r": 90 * np.cos(np.radians(90 - solpos["apparent_zenith"])),
+            "theta": solpos["azimuth"],
+        },
+        solpos,
+        var,
+        marker_size,
+        si_ip,
+    )
 
     # draw equinox and sostices
     for date in pd.to_datetime(["2019-03-21", "2019-06-21", "2019-12-21"]):
@@ -300,29 +252,33 @@ def polar_graph(df, meta, global_local, var, si_ip):
             radialaxis=dict(visible=False),
         )
     )
+    if var != "None":
+        fig.update_layout(
+            coloraxis=dict(
+                colorscale=var_color,
+                cmin=range_z[0],
+                cmax=range_z[1],
+                colorbar=dict(thickness=30, title=var_unit + "<br>  "),
+            )
+        )
+        add_value_ranges(fig, ranges, layout={"coloraxis": ("cmin", "cmax")})
     return fig
 
 
-def custom_cartesian_solar(df, meta, global_local, var, si_ip):
+def custom_cartesian_solar(dataset, global_local, var, si_ip):
     """Return a graph of a latitude and longitude solar diagram."""
-    latitude = float(meta["lat"])
-    longitude = float(meta["lon"])
-    time_zone = float(meta["time_zone"])
+    df = dataset.df
+    latitude = dataset.location.lat
+    longitude = dataset.location.lon
+    time_zone = dataset.location.time_zone
     tz = "UTC"
 
     if var != "None":
         var_unit = mapping_dictionary[var][si_ip]["unit"]
         var_range = mapping_dictionary[var][si_ip]["range"]
-        var_name = mapping_dictionary[var]["name"]
         var_color = mapping_dictionary[var]["color"]
-        if global_local == "global":
-            # Set Global values for Max and minimum
-            range_z = var_range
-        else:
-            # Set maximum and minimum according to data
-            data_max = 5 * ceil(df[var].max() / 5)
-            data_min = 5 * floor(df[var].min() / 5)
-            range_z = [data_min, data_max]
+        ranges = value_ranges(df[var], var_range)
+        range_z = ranges[global_local]
 
     if var == "None":
         var_color = "orange"
@@ -334,78 +290,15 @@ def custom_cartesian_solar(df, meta, global_local, var, si_ip):
     fig = go.Figure()
 
     # draw annalemma
-    if var == "None":
-        fig.add_trace(
-            go.Scatter(
-                y=df["elevation"],
-                x=df["azimuth"],
-                mode="markers",
-                marker_color="orange",
-                marker_size=marker_size,
-                marker_line_width=0,
-                customdata=np.stack(
-                    (
-                        df["day"],
-                        df["month_names"],
-                        df["hour"],
-                        df["elevation"],
-                        df["azimuth"],
-                    ),
-                    axis=-1,
-                ),
-                hovertemplate="month: %{customdata[1]}"
-                + "<br>day: %{customdata[0]:.0f}"
-                + "<br>hour: %{customdata[2]:.0f}:00"
-                + "<br>sun altitude: %{customdata[3]:.2f}"
-                + degrees_unit
-                + "<br>sun azimuth: %{customdata[4]:.2f}"
-                + degrees_unit
-                + "<br>",
-                name="",
-            )
-        )
-    else:
-        fig.add_trace(
-            go.Scatter(
-                y=df["elevation"],
-                x=df["azimuth"],
-                mode="markers",
-                marker=dict(
-                    color=df[var],
-                    size=marker_size,
-                    line_width=0,
-                    colorscale=var_color,
-                    cmin=range_z[0],
-                    cmax=range_z[1],
-                    colorbar=dict(thickness=30, title=var_unit + "<br>  "),
-                ),
-                customdata=np.stack(
-                    (
-                        df["day"],
-                        df["month_names"],
-                        df["hour"],
-                        df["elevation"],
-                        df["azimuth"],
-                        df[var],
-                    ),
-                    axis=-1,
-                ),
-                hovertemplate="month: %{customdata[1]}"
-                + "<br>day: %{customdata[0]:.0f}"
-                + "<br>hour: %{customdata[2]:.0f}:00"
-                + "<br>sun altitude: %{customdata[3]:.2f}"
-                + degrees_unit
-                + "<br>sun azimuth: %{customdata[4]:.2f}"
-                + degrees_unit
-                + "<br>"
-                + "<br><b>"
-                + var_name
-                + ": %{customdata[5]:.2f}"
-                + var_unit
-                + "</b>",
-                name="",
-            )
-        )
+    add_analemma(
+        fig,
+        go.Scatter,
+        {"x": df["azimuth"], "y": df["elevation"]},
+        df,
+        var,
+        marker_size,
+        si_ip,
+    )
 
     # draw equinox and sostices
     for date in pd.to_datetime(["2019-03-21", "2019-06-21", "2019-12-21"]):
@@ -498,5 +391,15 @@ def custom_cartesian_solar(df, meta, global_local, var, si_ip):
         linecolor="black",
         mirror=True,
     )
+    if var != "None":
+        fig.update_layout(
+            coloraxis=dict(
+                colorscale=var_color,
+                cmin=range_z[0],
+                cmax=range_z[1],
+                colorbar=dict(thickness=30, title=var_unit + "<br>  "),
+            )
+        )
+        add_value_ranges(fig, ranges, layout={"coloraxis": ("cmin", "cmax")})
 
     return fig
@@ -1,16 +1,18 @@
 from dash import dcc, html
 from dash_extensions.enrich import Output, Input, State
+from dash.exceptions import PreventUpdate
 from my_project.utils import (
     generate_chart_name,
+    relayout_x_range,
     title_with_tooltip,
     summary_table_tmp_rh_tab,
 )
 from my_project.template_graphs import heatmap, yearly_profile, daily_profile
 from my_project.global_scheme import dropdown_names
 from my_project.utils import code_timer
-from my_project.extract_df import convert_data
+from my_project.figure_cache import cached_figure, encoded_figure
 
-from app import app, cache, TIMEOUT
+from app import app
 
 var_to_plot = ["Dry bulb temperature", "Relative humidity"]
 
@@ -91,76 +93,119 @@ def layout_t_rh():
     )
 
 
+def yearly_chart_figure(ds, dd_value, global_local, si_ip, x_range=None):
+    """Return the yearly chart of the variable selected, zoomed in on x_range."""
+    var = "DBT" if dd_value == dropdown_names[var_to_plot[0]] else "RH"
+
+    def build():
+        fig = yearly_profile(ds, var, global_local, si_ip, x_range)
+        fig.update_layout(xaxis=dict(rangeslider=dict(visible=True)))
+        return fig
+
+    if x_range is not None:
+        # every zoom or pan gives a different range, so these are not cached
+        return encoded_figure(build())
+    return cached_figure(
+        ds,
+        "tdb_yearly_t_rh" if var == "DBT" else "rh_yearly_t_rh",
+        build,
+        global_local=global_local,
+        si_ip=si_ip,
+    )
+
+
 @app.callback(
     Output("yearly-chart", "children"),
     [
         Input("df-store", "modified_timestamp"),
-        Input("global-local-radio-input", "value"),
         Input("dropdown", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
-@cache.memoize(timeout=TIMEOUT)
 @code_timer
-def update_yearly_chart(ts, global_local, dd_value, df, meta, si_ip):
-
+def update_yearly_chart(ts, dd_value, global_local, ds, meta, si_ip):
     if dd_value == dropdown_names[var_to_plot[0]]:
-        dbt_yearly = yearly_profile(df, "DBT", global_local, si_ip)
-        dbt_yearly.update_layout(xaxis=dict(rangeslider=dict(visible=True)))
-
-        return dcc.Graph(
-            config=generate_chart_name("tdb_yearly_t_rh", meta),
-            figure=dbt_yearly,
-        )
+        chart_name = "tdb_yearly_t_rh"
     else:
-        rh_yearly = yearly_profile(df, "RH", global_local, si_ip)
-        rh_yearly.update_layout(xaxis=dict(rangeslider=dict(visible=True)))
+        chart_name = "rh_yearly_t_rh"
+    return dcc.Graph(
+        id="yearly-chart-graph",
+        config=generate_chart_name(chart_name, meta),
+        figure=yearly_chart_figure(ds, dd_value, global_local, si_ip),
+    )
 
-        return dcc.Graph(
-            config=generate_chart_name("rh_yearly_t_rh", meta),
-            figure=rh_yearly,
-        )
+
+@app.callback(
+    Output("yearly-chart-graph", "figure"),
+    [Input("yearly-chart-graph", "relayoutData")],
+    [
+        State("dropdown", "value"),
+        State("global-local-radio-input", "value"),
+        State("df-store", "data"),
+        State("si-ip-unit-store", "data"),
+    ],
+    prevent_initial_call=True,
+)
+def refine_yearly_chart(relayout_data, dd_value, global_local, ds, si_ip):
+    """Show the hourly values when the yearly chart is zoomed in"""
+    if not relayout_data or not any(key.startswith("xaxis.") for key in relayout_data):
+        raise PreventUpdate
+    return yearly_chart_figure(
+        ds, dd_value, global_local, si_ip, relayout_x_range(relayout_data)
+    )
 
 
 @app.callback(
     Output("daily", "children"),
     [
         Input("df-store", "modified_timestamp"),
-        Input("global-local-radio-input", "value"),
         Input("dropdown", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
-@cache.memoize(timeout=TIMEOUT)
 @code_timer
-def update_daily(ts, global_local, dd_value, df, meta, si_ip):
+def update_daily(ts, dd_value, global_local, ds, meta, si_ip):
 
     if dd_value == dropdown_names[var_to_plot[0]]:
         return dcc.Graph(
             config=generate_chart_name("tdb_daily_t_rh", meta),
-            figure=daily_profile(
-                df[["DBT", "hour", "UTC_time", "month_names", "day", "month"]],
-                "DBT",
-                global_local,
-                si_ip,
+            figure=cached_figure(
+                ds,
+                "tdb_daily_t_rh",
+                lambda: daily_profile(
+                    ds,
+                    "DBT",
+                    global_local,
+                    si_ip,
+                ),
+                global_local=global_local,
+                si_ip=si_ip,
             ),
         )
     else:
         return dcc.Graph(
             config=generate_chart_name("rh_daily_t_rh", meta),
-            figure=daily_profile(
-                df[["RH", "hour", "UTC_time", "month_names", "day", "month"]],
-                "RH",
-                global_local,
-                si_ip,
+            figure=cached_figure(
+                ds,
+                "rh_daily_t_rh",
+                lambda: daily_profile(
+                    ds,
+                    "RH",
+                    global_local,
+                    si_ip,
+                ),
+                global_local=global_local,
+                si_ip=si_ip,
             ),
         )
 
@@ -169,38 +214,49 @@ def update_daily(ts, global_local, dd_value, df, meta, si_ip):
     [Output("heatmap", "children")],
     [
         Input("df-store", "modified_timestamp"),
-        Input("global-local-radio-input", "value"),
         Input("dropdown", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
-@cache.memoize(timeout=TIMEOUT)
 @code_timer
-def update_heatmap(ts, global_local, dd_value, df, meta, si_ip):
+def update_heatmap(ts, dd_value, global_local, ds, meta, si_ip):
 
     """Update the contents of tab three. Passing in general info (df, meta)."""
     if dd_value == dropdown_names[var_to_plot[0]]:
         return dcc.Graph(
             config=generate_chart_name("tdb_heatmap_t_rh", meta),
-            figure=heatmap(
-                df[["DBT", "hour", "UTC_time", "month_names", "day"]],
-                "DBT",
-                global_local,
-                si_ip,
+            figure=cached_figure(
+                ds,
+                "tdb_heatmap_t_rh",
+                lambda: heatmap(
+                    ds.df[["DBT", "hour", "UTC_time", "month_names", "day"]],
+                    "DBT",
+                    global_local,
+                    si_ip,
+                ),
+                global_local=global_local,
+                si_ip=si_ip,
             ),
         )
     else:
         return dcc.Graph(
             config=generate_chart_name("rh_heatmap_t_rh", meta),
-            figure=heatmap(
-                df[["RH", "hour", "UTC_time", "month_names", "day"]],
-                "RH",
-                global_local,
-                si_ip,
+            figure=cached_figure(
+                ds,
+                "rh_heatmap_t_rh",
+                lambda: heatmap(
+                    ds.df[["RH", "hour", "UTC_time", "month_names", "day"]],
+                    "RH",
+                    global_local,
+                    si_ip,
+                ),
+                global_local=global_local,
+                si_ip=si_ip,
             ),
         )
 
@@ -213,10 +269,7 @@ def update_heatmap(ts, global_local, dd_value, df, meta, si_ip):
     ],
     [State("df-store", "data"), State("si-ip-unit-store", "data")],
 )
-@cache.memoize(timeout=TIMEOUT)
 @code_timer
-def update_table(ts, dd_value, df, si_ip):
+def update_table(ts, dd_value, ds, si_ip):
     """Update the contents of tab three. Passing in general info (df, meta)."""
-    return summary_table_tmp_rh_tab(
-        df[["month", "hour", dd_value, "month_names"]], dd_value, si_ip
-    )
+    return summary_table_tmp_rh_tab(ds, dd_value, si_ip)
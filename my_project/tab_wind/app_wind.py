@@ -1,9 +1,10 @@
 from dash import dcc, html
 from my_project.global_scheme import month_lst, container_row_center_full
 from dash.dependencies import Input, Output, State
-from my_project.template_graphs import heatmap, wind_rose
+from my_project.template_graphs import heatmap, wind_rose, wind_rose_counts
 from my_project.utils import title_with_tooltip, generate_chart_name
 from my_project.utils import code_timer
+from my_project.figure_cache import cached_figure
 
 from app import app
 
@@ -353,10 +354,15 @@ def layout_wind():
     ],
 )
 @code_timer
-def update_annual_wind_rose(ts, df, meta, si_ip):
+def update_annual_wind_rose(ts, ds, meta, si_ip):
     """Update the contents of tab five. Passing in the info from the sliders and the general info (df, meta)."""
 
-    annual = wind_rose(df, "", [1, 12], [1, 24], True, si_ip)
+    annual = cached_figure(
+        ds,
+        "annual_wind_rose_wind",
+        lambda: wind_rose(ds, "", [1, 12], [1, 24], True, si_ip),
+        si_ip=si_ip,
+    )
     return dcc.Graph(
         config=generate_chart_name("annual_wind_rose_wind", meta),
         figure=annual,
@@ -369,19 +375,25 @@ def update_annual_wind_rose(ts, df, meta, si_ip):
     # General
     [
         Input("df-store", "modified_timestamp"),
-        Input("global-local-radio-input", "value"),
     ],
     [
+        State("global-local-radio-input", "value"),
         State("df-store", "data"),
         State("meta-store", "data"),
         State("si-ip-unit-store", "data"),
     ],
 )
 @code_timer
-def update_tab_wind_speed(ts, global_local, df, meta, si_ip):
+def update_tab_wind_speed(ts, global_local, ds, meta, si_ip):
     """Update the contents of tab five. Passing in the info from the sliders and the general info (df, meta)."""
 
-    speed = heatmap(df, "wind_speed", global_local, si_ip)
+    speed = cached_figure(
+        ds,
+        "wind_speed_wind",
+        lambda: heatmap(ds.df, "wind_speed", global_local, si_ip),
+        global_local=global_local,
+        si_ip=si_ip,
+    )
 
     return dcc.Graph(
         config=generate_chart_name("wind_speed_wind", meta),
@@ -394,15 +406,26 @@ def update_tab_wind_speed(ts, global_local, df, meta, si_ip):
     Output("wind-direction", "children"),
     # General
     [
-        Input("global-local-radio-input", "value"),
+        Input("df-store", "modified_timestamp"),
+    ],
+    [
+        State("global-local-radio-input", "value"),
+        State("df-store", "data"),
+        State("meta-store", "data"),
+        State("si-ip-unit-store", "data"),
     ],
-    [State("df-store", "data"), State("meta-store", "data"),State("si-ip-unit-store","data")],
 )
 @code_timer
-def update_tab_wind_direction(global_local, df, meta,si_ip):
+def update_tab_wind_direction(ts, global_local, ds, meta, si_ip):
     """Update the contents of tab five. Passing in the info from the sliders and the general info (df, meta)."""
 
-    direction = heatmap(df, "wind_dir", global_local,si_ip)
+    direction = cached_figure(
+        ds,
+        "wind_direction_wind",
+        lambda: heatmap(ds.df, "wind_dir", global_local, si_ip),
+        global_local=global_local,
+        si_ip=si_ip,
+    )
     return dcc.Graph(
         config=generate_chart_name("wind_direction_wind", meta),
         figure=direction,
@@ -428,7 +451,7 @@ def update_tab_wind_direction(global_local, df, meta,si_ip):
 )
 @code_timer
 def update_custom_wind_rose(
-    ts, start_month, start_hour, end_month, end_hour, df, meta, si_ip
+    ts, start_month, start_hour, end_month, end_hour, ds, meta, si_ip
 ):
     """Update the contents of tab five. Passing in the info from the sliders and the general info (df, meta)."""
 
@@ -438,16 +461,15 @@ def update_custom_wind_rose(
     end_month = int(end_month)
 
     # Wind Rose Graphs
-    if start_month <= end_month:
-        df = df.loc[(df["month"] >= start_month) & (df["month"] <= end_month)]
-    else:
-        df = df.loc[(df["month"] <= end_month) | (df["month"] >= start_month)]
-    if start_hour <= end_hour:
-        df = df.loc[(df["hour"] >= start_hour) & (df["hour"] <= end_hour)]
-    else:
-        df = df.loc[(df["hour"] <= end_hour) | (df["hour"] >= start_hour)]
-    custom = wind_rose(
-        df, "", [start_month, end_month], [start_hour, end_hour], True, si_ip
+    custom = cached_figure(
+        ds,
+        "custom_wind_rose_wind",
+        lambda: wind_rose(
+            ds, "", [start_month, end_month], [start_hour, end_hour], True, si_ip
+        ),
+        month=[start_month, end_month],
+        hour=[start_hour, end_hour],
+        si_ip=si_ip,
     )
 
     return dcc.Graph(
@@ -478,7 +500,7 @@ def update_custom_wind_rose(
     ],
 )
 @code_timer
-def update_seasonal_graphs(ts, df, meta, si_ip):
+def update_seasonal_graphs(ts, ds, meta, si_ip):
 
     hours = [1, 24]
     winter_months = [12, 2]
@@ -487,34 +509,44 @@ def update_seasonal_graphs(ts, df, meta, si_ip):
     fall_months = [9, 12]
 
     # Wind Rose Graphs
-    winter = wind_rose(df, "", winter_months, hours, False, si_ip)
-    spring = wind_rose(df, "", spring_months, hours, True, si_ip)
-    summer = wind_rose(df, "", summer_months, hours, False, si_ip)
-    fall = wind_rose(df, "", fall_months, hours, False, si_ip)
+    winter = cached_figure(
+        ds,
+        "winter_wind_rose_wind",
+        lambda: wind_rose(ds, "", winter_months, hours, False, si_ip),
+        si_ip=si_ip,
+    )
+    spring = cached_figure(
+        ds,
+        "spring_wind_rose_wind",
+        lambda: wind_rose(ds, "", spring_months, hours, True, si_ip),
+        si_ip=si_ip,
+    )
+    summer = cached_figure(
+        ds,
+        "summer_wind_rose_wind",
+        lambda: wind_rose(ds, "", summer_months, hours, False, si_ip),
+        si_ip=si_ip,
+    )
+    fall = cached_figure(
+        ds,
+        "fall_wind_rose_wind",
+        lambda: wind_rose(ds, "", fall_months, hours, False, si_ip),
+        si_ip=si_ip,
+    )
 
     # Text
-    winter_df = df.loc[
-        (df["month"] <= winter_months[1]) | (df["month"] >= winter_months[0])
-    ]
-    query_calm_wind = "wind_speed == 0"
-    winter_total_count = winter_df.shape[0]
-    winter_calm_count = winter_df.query(query_calm_wind).shape[0]
-
-    spring_df = df.loc[
-        (df["month"] >= spring_months[0]) & (df["month"] <= spring_months[1])
-    ]
-    spring_total_count = spring_df.shape[0]
-    spring_calm_count = spring_df.query(query_calm_wind).shape[0]
-
-    summer_df = df.loc[
-        (df["month"] >= summer_months[0]) & (df["month"] <= summer_months[1])
-    ]
-    summer_total_count = summer_df.shape[0]
-    summer_calm_count = summer_df.query(query_calm_wind).shape[0]
-
-    fall_df = df.loc[(df["month"] >= fall_months[0]) & (df["month"] <= fall_months[1])]
-    fall_total_count = fall_df.shape[0]
-    fall_calm_count = fall_df.query(query_calm_wind).shape[0]
+    _, winter_total_count, winter_calm_count = wind_rose_counts(
+        ds, winter_months, hours, si_ip
+    )
+    _, spring_total_count, spring_calm_count = wind_rose_counts(
+        ds, spring_months, hours, si_ip
+    )
+    _, summer_total_count, summer_calm_count = wind_rose_counts(
+        ds, summer_months, hours, si_ip
+    )
+    _, fall_total_count, fall_calm_count = wind_rose_counts(
+        ds, fall_months, hours, si_ip
+    )
 
     def seasonal_chart_caption(month_start, month_end, count, n_calm):
         return (
@@ -594,7 +626,7 @@ def update_seasonal_graphs(ts, df, meta, si_ip):
     ],
 )
 @code_timer
-def update_daily_graphs(ts, df, meta, si_ip):
+def update_daily_graphs(ts, ds, meta, si_ip):
     """Update the contents of tab five. Passing in the info from the sliders and the general info (df, meta)."""
 
     months = [1, 12]
@@ -603,27 +635,35 @@ def update_daily_graphs(ts, df, meta, si_ip):
     night_times = [22, 5]
 
     # Wind Rose Graphs
-    morning = wind_rose(df, "", months, morning_times, False, si_ip)
-    noon = wind_rose(df, "", months, noon_times, False, si_ip)
-    night = wind_rose(df, "", months, night_times, True, si_ip)
+    morning = cached_figure(
+        ds,
+        "morning_wind_rose_wind",
+        lambda: wind_rose(ds, "", months, morning_times, False, si_ip),
+        si_ip=si_ip,
+    )
+    noon = cached_figure(
+        ds,
+        "noon_wind_rose_wind",
+        lambda: wind_rose(ds, "", months, noon_times, False, si_ip),
+        si_ip=si_ip,
+    )
+    night = cached_figure(
+        ds,
+        "night_wind_rose_wind",
+        lambda: wind_rose(ds, "", months, night_times, True, si_ip),
+        si_ip=si_ip,
+    )
 
     # Text
-    query_calm_wind = "wind_speed == 0"
-    morning_df = df.loc[
-        (df["hour"] >= morning_times[0]) & (df["hour"] <= morning_times[1])
-    ]
-    morning_total_count = morning_df.shape[0]
-    morning_calm_count = morning_df.query(query_calm_wind).shape[0]
-
-    noon_df = df.loc[
-        (df["hour"] >= morning_times[0]) & (df["hour"] <= morning_times[1])
-    ]
-    noon_total_count = noon_df.shape[0]
-    noon_calm_count = noon_df.query(query_calm_wind).shape[0]
-
-    night_df = df.loc[(df["hour"] <= night_times[1]) | (df["hour"] >= night_times[0])]
-    night_total_count = night_df.shape[0]
-    night_calm_count = night_df.query(query_calm_wind).shape[0]
+    _, morning_total_count, morning_calm_count = wind_rose_counts(
+        ds, months, morning_times, si_ip
+    )
+    _, noon_total_count, noon_calm_count = wind_rose_counts(
+        ds, months, morning_times, si_ip
+    )
+    _, night_total_count, night_calm_count = wind_rose_counts(
+        ds, months, night_times, si_ip
+    )
 
     def daily_chart_caption(hour_start, hour_end, count, calm_count):
         return (
@@ -1,73 +1,120 @@
-from math import ceil, floor
-
 import numpy as np
-import pandas as pd
 import json
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from my_project.global_scheme import mapping_dictionary
 
+from .downsample import downsample_series
+from .filter_expression import compile_filter
+from .filter_index import range_selection, time_filter_mask
 from .global_scheme import month_lst, template, tight_margins
+from .utils import add_value_ranges, code_timer, value_ranges
 
 
 # violin template
-from .utils import code_timer
-
+def density_summary(values, n_points=100):
+    """Return the kernel density estimate and the summary statistics of the values.
 
-def violin(df, var, global_local, si_ip):
-    """Return day night violin based on the 'var' col"""
-    mask_day = (df["hour"] >= 8) & (df["hour"] < 20)
-    mask_night = (df["hour"] < 8) | (df["hour"] >= 20)
+    The Gaussian kernel, Silverman's bandwidth and the span of the density (two
+    bandwidths beyond the extremes) are those used by plotly.js for the violins.
+    """
+    values = values[~np.isnan(values)]
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    std = values.std(ddof=1)
+    bandwidth = 1.059 * min(std, (q3 - q1) / 1.349) * len(values) ** -0.2
+    if bandwidth <= 0:
+        bandwidth = std if std > 0 else 1
+    y = np.linspace(
+        values.min() - 2 * bandwidth, values.max() + 2 * bandwidth, n_points
+    )
+    density = np.exp(-0.5 * ((y[:, None] - values[None, :]) / bandwidth) ** 2).sum(
+        axis=1
+    ) / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+    return {
+        "y": y,
+        "density": density,
+        "min": values.min(),
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "max": values.max(),
+        "mean": values.mean(),
+    }
+
+
+def day_night_density(df, var):
+    """Return the density summaries of var during the day (8 to 20) and the night."""
+    values = df[var].to_numpy()
+    hour = df["hour"].to_numpy()
+    is_day = (hour >= 8) & (hour < 20)
+    return {
+        "Day": density_summary(values[is_day]),
+        "Night": density_summary(values[~is_day]),
+    }
+
+
+def violin(dataset, var, global_local, si_ip):
+    """Return day night violin based on the 'var' col.
+
+    The densities are computed server-side, and cached in the dataset, so only
+    the curves are sent instead of all the hourly values.
+    """
     var_unit = mapping_dictionary[var][si_ip]["unit"]
     var_range = mapping_dictionary[var][si_ip]["range"]
     var_name = mapping_dictionary[var]["name"]
 
-    data_day = df.loc[mask_day, var]
-    data_night = df.loc[mask_night, var]
+    ranges = value_ranges(dataset.df[var], var_range)
+    var_range = ranges[global_local]
 
-    if global_local != "global":
-        data_max = 5 * ceil(df[var].max() / 5)
-        data_min = 5 * floor(df[var].min() / 5)
-        var_range = [data_min, data_max]
+    densities = dataset.derived(
+        ("day_night_density", var), lambda: day_night_density(dataset.df, var)
+    )
 
     fig = go.Figure()
-    fig.add_trace(
-        go.Violin(
-            x=df["fake_year"],
-            y=data_day,
-            line_color="#ffaa00",
-            name="Day",
-            side="negative",
-            hoverinfo="y",
-            hoveron="violins",
+    # the day is on the left of the violin and the night on the right
+    for (name, summary), side, color in zip(
+        densities.items(), [-1, 1], ["#ffaa00", "#00264d"]
+    ):
+        # width of the half violin, as go.Violin with width=0.8
+        scale = side * 0.4 / summary["density"].max()
+        text = "<br>".join(
+            f"{stat}: {summary[stat]:.2f}"
+            for stat in ["max", "q3", "median", "q1", "min", "mean"]
         )
-    )
-
-    fig.add_trace(
-        go.Violin(
-            x=df["fake_year"],
-            y=data_night,
-            line_color="#00264d",
-            name="Night",
-            side="positive",
-            hoverinfo="y",
-            hoveron="violins",
+        fig.add_trace(
+            go.Scatter(
+                x=np.concatenate([[0], summary["density"] * scale, [0]]),
+                y=np.concatenate([[summary["y"][0]], summary["y"], [summary["y"][-1]]]),
+                fill="toself",
+                mode="lines",
+                line_color=color,
+                line_width=2,
+                name=name,
+                legendgroup=name,
+                hoveron="fills",
+                hoverinfo="text",
+                text=f"{name}<br>{text}",
+            )
+        )
+        mean_width = np.interp(summary["mean"], summary["y"], summary["density"])
+        fig.add_trace(
+            go.Scatter(
+                x=[0, mean_width * scale],
+                y=[summary["mean"], summary["mean"]],
+                mode="lines",
+                line_color=color,
+                line_width=2,
+                legendgroup=name,
+                showlegend=False,
+                hoverinfo="skip",
+            )
         )
-    )
 
-    fig.update_traces(
-        meanline_visible=True,
-        orientation="v",
-        width=0.8,
-        points=False,
-    )
     title = var_name + " (" + var_unit + ")"
     fig.update_layout(
         xaxis_showgrid=False,
         xaxis_zeroline=False,
-        violingap=0,
-        violingroupgap=0,
-        violinmode="overlay",
+        xaxis_showticklabels=False,
+        xaxis_range=[-0.5, 0.5],
         margin=tight_margins,
         legend=dict(orientation="h", yanchor="bottom", y=0.9, xanchor="right", x=1),
         template=template,
@@ -79,81 +126,73 @@ def violin(df, var, global_local, si_ip):
     fig.update_yaxes(
         showline=True, linewidth=1, linecolor="black", mirror=True, range=var_range
     )
+    add_value_ranges(fig, ranges, axes=["yaxis"])
 
     return fig
 
 
 @code_timer
-def yearly_profile(df, var, global_local, si_ip):
-    """Return yearly profile figure based on the 'var' col."""
+def yearly_profile(dataset, var, global_local, si_ip, x_range=None):
+    """Return yearly profile figure based on the 'var' col.
+
+    If the range of dates x_range is given (i.e. the chart is zoomed in) the
+    hourly values within it are shown too, downsampled to the chart resolution.
+    """
+    df = dataset.df
     var_unit = mapping_dictionary[var][si_ip]["unit"]
     var_range = mapping_dictionary[var][si_ip]["range"]
     var_name = mapping_dictionary[var]["name"]
     var_color = mapping_dictionary[var]["color"]
 
-    if global_local == "global":
-        # Set Global values for Max and minimum
-        range_y = var_range
-    else:
-        # Set maximum and minimum according to data
-        data_max = 5 * ceil(df[var].max() / 5)
-        data_min = 5 * floor(df[var].min() / 5)
-        range_y = [data_min, data_max]
+    ranges = value_ranges(df[var], var_range)
+    range_y = ranges[global_local]
 
     var_single_color = var_color[len(var_color) // 2]
     custom_ylim = range_y
     # Get min, max, and mean of each day
-    dbt_day = df.groupby(np.arange(len(df.index)) // 24)[var].agg(
-        ["min", "max", "mean"]
-    )
+    days = dataset.daily.index
+    dbt_day = dataset.daily[var]
 
     trace1 = go.Bar(
-        x=df["UTC_time"].dt.date.unique(),
+        x=days,
         y=dbt_day["max"] - dbt_day["min"],
         base=dbt_day["min"],
         marker_color=var_single_color,
         marker_opacity=0.3,
         name=var_name + " Range",
-        customdata=np.stack(
-            (dbt_day["mean"], df.iloc[::24, :]["month_names"], df.iloc[::24, :]["day"]),
-            axis=-1,
-        ),
+        customdata=dbt_day["mean"],
         hovertemplate=(
             "Max: %{y:.2f} "
             + var_unit
             + "<br>Min: %{base:.2f} "
             + var_unit
-            + "<br><b>Ave : %{customdata[0]:.2f} "
+            + "<br><b>Ave : %{customdata:.2f} "
             + var_unit
-            + "</b><br>Month: %{customdata[1]}<br>Day: %{customdata[2]}<br>"
+            + "</b><br>Month: %{x|%b}<br>Day: %{x|%-d}<br>"
         ),
     )
 
     trace2 = go.Scatter(
-        x=df["UTC_time"].dt.date.unique(),
+        x=days,
         y=dbt_day["mean"],
         name="Average " + var_name,
         mode="lines",
         marker_color=var_single_color,
         marker_opacity=1,
-        customdata=np.stack(
-            (dbt_day["mean"], df.iloc[::24, :]["month_names"], df.iloc[::24, :]["day"]),
-            axis=-1,
-        ),
         hovertemplate=(
-            "<b>Ave : %{customdata[0]:.2f} "
+            "<b>Ave : %{y:.2f} "
             + var_unit
-            + "</b><br>Month: %{customdata[1]}<br>Day: %{customdata[2]}<br>"
+            + "</b><br>Month: %{x|%b}<br>Day: %{x|%-d}<br>"
         ),
     )
 
     if var == "DBT":
         # plot ashrae adaptive comfort limits (80%)
-        lo80 = df.groupby("DOY")["adaptive_cmf_80_low"].mean().values
-        hi80 = df.groupby("DOY")["adaptive_cmf_80_up"].mean().values
+        lo80 = dataset.daily["adaptive_cmf_80_low"]["mean"].values
+        hi80 = dataset.daily["adaptive_cmf_80_up"]["mean"].values
 
         trace3 = go.Bar(
-            x=df["UTC_time"].dt.date.unique(),
+            x=days,
             y=hi80 - lo80,
             base=lo80,
             name="ASHRAE adaptive comfort (80%)",
@@ -165,11 +204,11 @@ def yearly_profile(df, var, global_local, si_ip):
         )
 
         # plot ashrae adaptive comfort limits (90%)
-        lo90 = df.groupby("DOY")["adaptive_cmf_90_low"].mean().values
-        hi90 = df.groupby("DOY")["adaptive_cmf_90_up"].mean().values
+        lo90 = dataset.daily["adaptive_cmf_90_low"]["mean"].values
+        hi90 = dataset.daily["adaptive_cmf_90_up"]["mean"].values
 
         trace4 = go.Bar(
-            x=df["UTC_time"].dt.date.unique(),
+            x=days,
             y=hi90 - lo90,
             base=lo90,
             name="ASHRAE adaptive comfort (90%)",
@@ -183,15 +222,13 @@ def yearly_profile(df, var, global_local, si_ip):
 
     elif var == "RH":
         # plot relative Humidity limits (30-70%)
-        lo_rh = [30] * 365
-        hi_rh = [70] * 365
-        lo_rh_df = pd.DataFrame({"loRH": lo_rh})
-        hi_rh_df = pd.DataFrame({"hiRH": hi_rh})
+        lo_rh = np.full(len(days), 30)
+        hi_rh = np.full(len(days), 70)
 
         trace3 = go.Bar(
-            x=df["UTC_time"].dt.date.unique(),
-            y=hi_rh_df["hiRH"] - lo_rh_df["loRH"],
-            base=lo_rh_df["loRH"],
+            x=days,
+            y=hi_rh - lo_rh,
+            base=lo_rh,
             name="humidity comfort band",
             marker_opacity=0.3,
             marker_color="silver",
@@ -202,9 +239,31 @@ def yearly_profile(df, var, global_local, si_ip):
     else:
         data = [trace1, trace2]
 
+    if x_range is not None:
+        x, y = downsample_series(
+            df["UTC_time"].dt.tz_localize(None).to_numpy(),
+            dataset.column(var),
+            x_range,
+        )
+        data.append(
+            go.Scatter(
+                x=x,
+                y=y,
+                name="Hourly " + var_name,
+                mode="lines",
+                line_width=1,
+                marker_color=var_single_color,
+                hovertemplate=(
+                    "%{y:.2f} " + var_unit + "<br>%{x|%b %-d, %H:%M}<extra></extra>"
+                ),
+            )
+        )
+
     fig = go.Figure(
         data=data, layout=go.Layout(barmode="overlay", bargap=0, margin=tight_margins)
     )
+    if x_range is not None:
+        fig.update_xaxes(range=x_range)
 
     fig.update_xaxes(
         dtick="M1",
@@ -229,92 +288,176 @@ def yearly_profile(df, var, global_local, si_ip):
         legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
         template=template,
     )
+    add_value_ranges(fig, ranges, axes=["yaxis"])
 
     return fig
 
 
+# width of the panel of each month in the charts of the monthly daily profiles
+MONTH_WIDTH = 25
+
+
+def month_hour_x(month, hour):
+    """Return the x coordinate of an hour of a month in the month panels."""
+    return (month - 1) * MONTH_WIDTH + hour
+
+
+def month_rows(month):
+    """Return the name of each month of the data and the positions of its rows.
+
+    The charts add a trace per month with the name in its hover template, rather
+    than a name per point, which would make up most of the figure.
+    """
+    month = np.asarray(month)
+    return [
+        (name, np.flatnonzero(month == i))
+        for i, name in enumerate(month_lst, start=1)
+        if (month == i).any()
+    ]
+
+
+def monthly_profile_xy(profile, var):
+    """Return the x coordinates, hours and values of the monthly profile of var,
+    with a gap between consecutive months so that they are not connected."""
+    y = np.full((12, MONTH_WIDTH), np.nan)
+    y[profile["month"].to_numpy() - 1, profile["hour"].to_numpy()] = profile[var]
+    x = np.arange(12 * MONTH_WIDTH)
+    return x, x % MONTH_WIDTH, y.ravel()
+
+
+def month_panels(fig):
+    """Lay out the x axis as 12 panels, one per month, with the hours as ticks.
+
+    All the months share the same traces, instead of one trace per month and
+    subplot, which are much slower to build and to render.
+    """
+    fig.update_xaxes(
+        range=[0, 12 * MONTH_WIDTH],
+        tickvals=[month_hour_x(m, h) for m in range(1, 13) for h in (6, 12, 18)],
+        ticktext=["6", "12", "18"] * 12,
+        tickangle=0,
+        showgrid=False,
+    )
+    # added at once, since add_annotation and add_vline are slow
+    fig.update_layout(
+        annotations=[
+            dict(
+                x=(i + 0.5) * MONTH_WIDTH,
+                y=1,
+                xref="x",
+                yref="paper",
+                yanchor="bottom",
+                text=month,
+                showarrow=False,
+                font_size=16,
+            )
+            for i, month in enumerate(month_lst)
+        ],
+        shapes=[
+            dict(
+                type="line",
+                x0=i * MONTH_WIDTH,
+                x1=i * MONTH_WIDTH,
+                y0=0,
+                y1=1,
+                xref="x",
+                yref="paper",
+                line=dict(width=1, color="lightgrey"),
+            )
+            for i in range(1, 12)
+        ],
+    )
+    return fig
+
+
 # @code_timer
-def daily_profile(df, var, global_local, si_ip):
+def daily_profile(dataset, var, global_local, si_ip):
     """Return the daily profile based on the 'var' col."""
+    df = dataset.df
     var_name = mapping_dictionary[var]["name"]
     var_unit = mapping_dictionary[var][si_ip]["unit"]
     var_range = mapping_dictionary[var][si_ip]["range"]
     var_color = mapping_dictionary[var]["color"]
-    if global_local == "global":
-        # Set Global values for Max and minimum
-        range_y = var_range
-    else:
-        # Set maximum and minimum according to data
-        data_max = 5 * ceil(df[var].max() / 5)
-        data_min = 5 * floor(df[var].min() / 5)
-        range_y = [data_min, data_max]
+    ranges = value_ranges(df[var], var_range)
+    range_y = ranges[global_local]
 
     var_single_color = var_color[len(var_color) // 2]
-    var_month_ave = df.groupby(["month", "hour"])[var].median().reset_index()
-    fig = make_subplots(
-        rows=1,
-        cols=12,
-        subplot_titles=month_lst,
-    )
+    x, hours, y = monthly_profile_xy(dataset.monthly_profile, var)
 
-    for i in range(12):
+    month = df["month"].to_numpy()
+    hour = df["hour"].to_numpy()
+    points_x = month_hour_x(month, hour)
+    points_y = df[var].to_numpy()
 
+    fig = go.Figure()
+    for month_name, rows in month_rows(month):
         fig.add_trace(
-            go.Scatter(
-                x=df.loc[df["month"] == i + 1, "hour"],
-                y=df.loc[df["month"] == i + 1, var],
+            go.Scattergl(
+                x=points_x[rows],
+                y=points_y[rows],
                 mode="markers",
                 marker_color=var_single_color,
                 opacity=0.5,
                 marker_size=3,
-                name=month_lst[i],
                 showlegend=False,
-                customdata=df.loc[df["month"] == i + 1, "month_names"],
+                name="",
+                customdata=hour[rows],
                 hovertemplate=(
                     "<b>"
                     + var
                     + ": %{y:.2f} "
                     + var_unit
-                    + "</b><br>Month: %{customdata}<br>Hour: %{x}:00<br>"
+                    + "</b><br>Month: "
+                    + month_name
+                    + "<br>Hour: %{customdata}:00<br>"
                 ),
-            ),
-            row=1,
-            col=i + 1,
+            )
         )
-
-        fig.add_trace(
-            go.Scatter(
-                x=var_month_ave.loc[var_month_ave["month"] == i + 1, "hour"],
-                y=var_month_ave.loc[var_month_ave["month"] == i + 1, var],
-                mode="lines",
-                line_color=var_single_color,
-                line_width=3,
-                name=None,
-                showlegend=False,
-                hovertemplate=(
-                    "<b>" + var + ": %{y:.2f} " + var_unit + "</b><br>Hour: %{x}:00<br>"
-                ),
+    fig.add_trace(
+        go.Scatter(
+            x=x,
+            y=y,
+            mode="lines",
+            line_color=var_single_color,
+            line_width=3,
+            showlegend=False,
+            name="",
+            customdata=hours,
+            hovertemplate=(
+                "<b>"
+                + var
+                + ": %{y:.2f} "
+                + var_unit
+                + "</b><br>Hour: %{customdata}:00<br>"
             ),
-            row=1,
-            col=i + 1,
         )
-
-        fig.update_xaxes(range=[0, 25], row=1, col=i + 1)
-        fig.update_yaxes(range=range_y, row=1, col=i + 1)
-
-    fig.update_xaxes(
-        ticktext=["6", "12", "18"], tickvals=["6", "12", "18"], tickangle=0
     )
 
+    month_panels(fig)
+    fig.update_yaxes(range=range_y)
     fig.update_layout(
         template=template,
         dragmode=False,
         margin=dict(l=20, r=20, t=55, b=20),
         title=f"{var_name} ({var_unit})",
     )
+    add_value_ranges(fig, ranges, axes=["yaxis"])
     return fig
 
 
+def heatmap_matrix(df, values):
+    """Return the dates, the hours and the hours x days matrix of hourly values.
+
+    Plotly does not need to re-grid (x, y, z) triplets and the hover labels can
+    be derived from the dates, hence the figure is much smaller.
+    """
+    day = np.arange(len(df)) // 24
+    z = np.full((24, day[-1] + 1), np.nan)
+    z[df["hour"].to_numpy() - 1, day] = values
+    dates = df["UTC_time"].dt.strftime("%Y-%m-%d").to_numpy()[::24]
+    return dates, np.arange(1, 25), z
+
+
 # @code_timer
 def heatmap(df, var, global_local, si_ip):
     """General function that returns a heatmap."""
@@ -322,30 +465,25 @@ def heatmap(df, var, global_local, si_ip):
     var_range = mapping_dictionary[var][si_ip]["range"]
     var_color = mapping_dictionary[var]["color"]
 
-    if global_local == "global":
-        # Set Global values for Max and minimum
-        range_z = var_range
-    else:
-        # Set maximum and minimum according to data
-        data_max = 5 * ceil(df[var].max() / 5)
-        data_min = 5 * floor(df[var].min() / 5)
-        range_z = [data_min, data_max]
+    ranges = value_ranges(df[var], var_range)
+    range_z = ranges[global_local]
 
+    dates, hours, z = heatmap_matrix(df, df[var])
     fig = go.Figure(
         data=go.Heatmap(
-            y=df["hour"],
-            x=df["UTC_time"].dt.date,
-            z=df[var],
+            y=hours,
+            x=dates,
+            z=z,
             colorscale=var_color,
             zmin=range_z[0],
             zmax=range_z[1],
-            customdata=np.stack((df["month_names"], df["day"]), axis=-1),
+            hoverongaps=False,
             hovertemplate=(
                 "<b>"
                 + var
                 + ": %{z:.2f} "
                 + var_unit
-                + "</b><br>Month: %{customdata[0]}<br>Day: %{customdata[1]}<br>Hour: %{y}:00<br>"
+                + "</b><br>Month: %{x|%b}<br>Day: %{x|%-d}<br>Hour: %{y}:00<br>"
             ),
             name="",
             colorbar=dict(title=var_unit),
@@ -360,10 +498,87 @@ def heatmap(df, var, global_local, si_ip):
     fig.update_layout(template=template, margin=tight_margins, yaxis_nticks=13)
     fig.update_xaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
     fig.update_yaxes(showline=True, linewidth=1, linecolor="black", mirror=True)
+    add_value_ranges(fig, ranges, traces={0: ("zmin", "zmax")})
 
     return fig
 
 
+def bin_edges(values, n_bins=50):
+    """Return the edges of about n_bins bins of equal and round size (1, 2, 2.5
+    or 5 times a power of 10) spanning the values, as plotly does. It is None if
+    there are no values, e.g. they are all filtered out or missing."""
+    values = np.asarray(values, dtype=float)
+    if np.isnan(values).all():
+        return None
+    low, high = np.nanmin(values), np.nanmax(values)
+    raw = (high - low) / n_bins
+    if raw <= 0:
+        return np.array([low - 0.5, high + 0.5])
+    magnitude = 10 ** np.floor(np.log10(raw))
+    size = magnitude * next(
+        step for step in (1, 2, 2.5, 5, 10) if step * magnitude >= raw
+    )
+    start = np.floor(low / size) * size
+    return start + size * np.arange(np.floor((high - start) / size) + 2)
+
+
+def binned_histograms(fig, n_bins=50):
+    """Return the figure with its histograms binned server-side with numpy.
+
+    The histogram and histogram2d traces (e.g. the marginals of plotly express)
+    are replaced by bars and heatmaps of the counts, so the figure carries the
+    bins instead of all the values. The bins of a variable are the same in all
+    the traces. The histograms of variables without values are left out.
+    """
+    data = []
+    for trace in fig.data:
+        if trace.type == "histogram":
+            horizontal = trace.x is None
+            values = np.asarray(trace.y if horizontal else trace.x, dtype=float)
+            edges = bin_edges(values, n_bins)
+            if edges is None:
+                continue
+            counts, _ = np.histogram(values, edges)
+            centers = (edges[:-1] + edges[1:]) / 2
+            data.append(
+                go.Bar(
+                    x=counts if horizontal else centers,
+                    y=centers if horizontal else counts,
+                    width=edges[1] - edges[0],
+                    orientation="h" if horizontal else "v",
+                    marker_color=trace.marker.color,
+                    opacity=trace.opacity,
+                    name=trace.name,
+                    showlegend=trace.showlegend,
+                    hovertemplate=trace.hovertemplate,
+                    xaxis=trace.xaxis,
+                    yaxis=trace.yaxis,
+                )
+            )
+        elif trace.type == "histogram2d":
+            x = np.asarray(trace.x, dtype=float)
+            y = np.asarray(trace.y, dtype=float)
+            edges = [bin_edges(x, n_bins), bin_edges(y, n_bins)]
+            if edges[0] is None or edges[1] is None:
+                continue
+            counts, x_edges, y_edges = np.histogram2d(x, y, edges)
+            data.append(
+                go.Heatmap(
+                    x=(x_edges[:-1] + x_edges[1:]) / 2,
+                    y=(y_edges[:-1] + y_edges[1:]) / 2,
+                    z=counts.T.astype(int),
+                    coloraxis=trace.coloraxis,
+                    name=trace.name,
+                    hovertemplate=trace.hovertemplate,
+                    xaxis=trace.xaxis,
+                    yaxis=trace.yaxis,
+                )
+            )
+        else:
+            data.append(trace)
+    return go.Figure(data=data, layout=fig.layout)
+
+
 ### WIND ROSE TEMPLATE
 def speed_labels(bins, units):
     """Return nice labels for a wind speed range."""
@@ -378,61 +593,98 @@ def speed_labels(bins, units):
     return labels
 
 
-def wind_rose(df, title, month, hour, labels, si_ip):
+# wind speed bins in m/s, the first one is the calm winds
+WIND_SPEED_BINS = [-1, 0.5, 1.5, 3.3, 5.5, 7.9, 10.7, 13.8, 17.1, 20.7, np.inf]
+# 16 direction sectors centred on the cardinal directions, the last bin is
+# centred on 360 deg and counted in the first one
+WIND_DIRECTION_BINS = np.arange(-22.5 / 2, 360 + 22.5, 22.5)
+
+
+def month_hour_selection(month, hour):
+    """Return a boolean (month, hour) array which is True for the months and
+    hours in the (start, end) ranges. The ranges are inclusive and wrap around if
+    the start is after the end."""
+    months = range_selection(month[0], month[1], 12, inclusive=True)
+    hours = range_selection(hour[0], hour[1], 24, inclusive=True)
+    return months[:, None] & hours[None, :]
+
+
+def wind_rose_cube(dataset, si_ip):
+    """Return the number of hours in each (month, hour, speed bin, direction bin),
+    of hours with calm winds and of all the hours in each (month, hour).
+
+    The speed and direction of each hour are binned once per dataset into integer
+    codes, which are counted with np.bincount.
+    """
+
+    def compute():
+        spd_bins = WIND_SPEED_BINS.copy()
+        if si_ip == "ip":
+            spd_bins = convert_bins(spd_bins)
+        n_spd = len(spd_bins) - 1
+        n_dir = len(WIND_DIRECTION_BINS) - 2
+
+        speed = dataset.column("wind_speed").astype(float)
+        direction = dataset.column("wind_dir").astype(float)
+        month_hour = (dataset.column("month") - 1) * 24 + dataset.column("hour") - 1
+        # speed bins are closed on the right, direction bins on the left
+        spd_code = np.searchsorted(spd_bins, speed, side="left") - 1
+        dir_code = np.searchsorted(WIND_DIRECTION_BINS, direction, side="right") - 1
+        valid = (
+            (spd_code >= 0) & (spd_code < n_spd) & (dir_code >= 0) & (dir_code <= n_dir)
+        )
+        dir_code[dir_code == n_dir] = 0
+
+        codes = (month_hour * n_spd + spd_code) * n_dir + dir_code
+        counts = np.bincount(codes[valid], minlength=288 * n_spd * n_dir)
+        calm = np.bincount(month_hour, weights=speed == 0, minlength=288)
+        hours = np.bincount(month_hour, minlength=288)
+        return (
+            counts.reshape(12, 24, n_spd, n_dir),
+            calm.reshape(12, 24).astype(int),
+            hours.reshape(12, 24),
+        )
+
+    return dataset.derived(("wind_rose_cube", si_ip), compute)
+
+
+def wind_rose_counts(dataset, month, hour, si_ip):
+    """Return the number of hours in each (speed bin, direction bin), the number
+    of hours and of hours with calm winds within the month and hour ranges."""
+    counts, calm, hours = wind_rose_cube(dataset, si_ip)
+    selected = month_hour_selection(month, hour)
+    return (
+        counts[selected].sum(axis=0),
+        int(hours[selected].sum()),
+        int(calm[selected].sum()),
+    )
+
+
+def wind_rose(dataset, title, month, hour, labels, si_ip):
     """Return the wind rose figure.
 
     Based on:  https://gist.github.com/phobson/41b41bdd157a2bcf6e14
     """
-    start_month = month[0]
-    end_month = month[1]
-    start_hour = hour[0]
-    end_hour = hour[1]
-    if start_month <= end_month:
-        df = df.loc[(df["month"] >= start_month) & (df["month"] <= end_month)]
-    else:
-        df = df.loc[(df["month"] <= end_month) | (df["month"] >= start_month)]
-    if start_hour <= end_hour:
-        df = df.loc[(df["hour"] >= start_hour) & (df["hour"] <= end_hour)]
-    else:
-        df = df.loc[(df["hour"] <= end_hour) | (df["hour"] >= start_hour)]
-
     spd_colors = mapping_dictionary["wind_speed"]["color"]
     spd_unit = mapping_dictionary["wind_speed"][si_ip]["unit"]
-    spd_bins = [-1, 0.5, 1.5, 3.3, 5.5, 7.9, 10.7, 13.8, 17.1, 20.7, np.inf]
+    spd_bins = WIND_SPEED_BINS.copy()
     if si_ip == "ip":
         spd_bins = convert_bins(spd_bins)
 
     spd_labels = speed_labels(spd_bins, spd_unit)
-    dir_bins = np.arange(-22.5 / 2, 360 + 22.5, 22.5)
-    dir_labels = (dir_bins[:-1] + dir_bins[1:]) / 2
-    total_count = df.shape[0]
-    calm_count = df.query("wind_speed == 0").shape[0]
-    rose = (
-        df.assign(
-            WindSpd_bins=lambda df: pd.cut(
-                df["wind_speed"], bins=spd_bins, labels=spd_labels, right=True
-            )
-        )
-        .assign(
-            WindDir_bins=lambda df: pd.cut(
-                df["wind_dir"], bins=dir_bins, labels=dir_labels, right=False
-            )
-        )
-        .replace({"WindDir_bins": {360: 0}})
-        .groupby(by=["WindSpd_bins", "WindDir_bins"])
-        .size()
-        .unstack(level="WindSpd_bins")
-        .fillna(0)
-        .assign(calm=lambda df: calm_count / df.shape[0])
-        .sort_index(axis=1)
-        .applymap(lambda x: x / total_count * 100)
-    )
+    dir_labels = (WIND_DIRECTION_BINS[:-2] + WIND_DIRECTION_BINS[1:-1]) / 2
+    counts, total_count, calm_count = wind_rose_counts(dataset, month, hour, si_ip)
+    rose = counts.astype(float)
+    # the calm winds are spread evenly over the directions
+    rose[0] = calm_count / len(dir_labels)
+    rose = rose / total_count * 100
+
     fig = go.Figure()
-    for i, col in enumerate(rose.columns):
+    for i, col in enumerate(spd_labels):
         fig.add_trace(
             go.Barpolar(
-                r=rose[col],
-                theta=rose.index.categories,
+                r=rose[i],
+                theta=dir_labels,
                 name=col,
                 marker_color=spd_colors[i],
                 hovertemplate="frequency: %{r:.2f}%"
@@ -488,8 +740,33 @@ def convert_bins(sbins):
     return sbins
 
 
-def barchart(df, var, time_filter_info, data_filter_info, normalize, si_ip):
-    """Return the custom summary bar chart."""
+def band_counts(month, values, edges, n_months=12):
+    """Return the number of values of each month in each band delimited by the
+    ascending edges, an array of shape (month, band).
+
+    The first band has the values below edges[0] and the last one those above
+    edges[-1]. The bands in between include their lower edge, the last of them
+    also its upper edge. Missing values are not counted.
+    """
+    edges = np.asarray(edges, dtype=float)
+    n_bands = len(edges) + 1
+    valid = ~np.isnan(values)
+    month, values = month[valid], values[valid]
+    band = np.where(
+        values > edges[-1],
+        n_bands - 1,
+        np.searchsorted(edges[:-1], values, side="right"),
+    )
+    counts = np.bincount((month - 1) * n_bands + band, minlength=n_months * n_bands)
+    return counts.reshape(n_months, n_bands)
+
+
+def barchart(dataset, var, time_filter_info, data_filter_info, normalize, si_ip):
+    """Return the custom summary bar chart.
+
+    The hours of each month are split into the values below, in and above the
+    range of the data filter, or into those which satisfy its expression or not.
+    """
     time_filter = time_filter_info[0]
     data_filter = data_filter_info[0]
     min_val = data_filter_info[2]
@@ -508,79 +785,57 @@ def barchart(df, var, time_filter_info, data_filter_info, normalize, si_ip):
     var_name = mapping_dictionary[var]["name"]
     var_color = mapping_dictionary[var]["color"]
 
-    color_below = var_color[0]
-    color_above = var_color[-1]
-    color_in = var_color[len(var_color) // 2]
-
-    new_df = df.copy()
-    month_in = []
-    month_below = []
-    month_above = []
-
-    min_val = str(min_val)
-    max_val = str(max_val)
-
     if len(time_filter_info) == 1:
         filter_var = str(var)
 
-    for i in range(1, 13):
-        query = (
-            f"month=={str(i)} and ({filter_var}>={min_val} and {filter_var}<={max_val})"
-        )
-        a = new_df.query(query)["DOY"].count()
-        month_in.append(a)
-        query = f"month=={str(i)} and ({filter_var}<{min_val})"
-        b = new_df.query(query)["DOY"].count()
-        month_below.append(b)
-        query = f"month=={str(i)} and {filter_var}>{max_val}"
-        c = new_df.query(query)["DOY"].count()
-        month_above.append(c)
-
-    go.Figure()
-    trace1 = go.Bar(
-        x=list(range(0, 13)), y=month_in, name="IN range", marker_color=color_in
-    )
-    trace2 = go.Bar(
-        x=list(range(0, 13)),
-        y=month_below,
-        name="BELOW range",
-        marker_color=color_below,
-    )
-    trace3 = go.Bar(
-        x=list(range(0, 13)),
-        y=month_above,
-        name="ABOVE range",
-        marker_color=color_above,
+    expression = data_filter_info[4] if len(data_filter_info) > 4 else None
+    month = dataset.column("month")
+    if data_filter and expression:
+        # the hours are split into those which satisfy the expression or not
+        values = compile_filter(expression).mask(dataset).astype(float)
+        edges = [0.5]
+    else:
+        values = dataset.column(filter_var).astype(float)
+    # only the hours within the time filter are counted
+    if len(time_filter_info) == 3 and time_filter:
+        mask = time_filter_mask(dataset, start_month, end_month, start_hour, end_hour)
+        month, values = month[mask], values[mask]
+
+    if data_filter and expression:
+        names = ["OUT of filter", "IN filter"]
+    else:
+        edges = sorted([min_val, max_val])
+        names = ["BELOW range", "IN range", "ABOVE range"]
+    counts = band_counts(month, values, edges)
+
+    n_inner = len(edges) - 1
+    colors = (
+        [var_color[0]]
+        + [var_color[(i + 1) * len(var_color) // (n_inner + 1)] for i in range(n_inner)]
+        + [var_color[-1]]
     )
-    data = [trace2, trace1, trace3]
+    data = [
+        go.Bar(x=list(range(0, 13)), y=counts[:, i], name=name, marker_color=color)
+        for i, (name, color) in enumerate(zip(names, colors))
+    ]
+
+    min_val = str(min_val)
+    max_val = str(max_val)
 
     fig = go.Figure(data=data)
     fig.update_layout(barmode="stack", dragmode=False)
 
+    if data_filter and expression:
+        condition = "when " + expression
+    else:
+        condition = f"the {var_name} is in the range {min_val} to {max_val} {var_unit}"
+
     if normalize:
-        title = (
-            "Percentage of time the "
-            + var_name
-            + " is in the range "
-            + min_val
-            + " to "
-            + max_val
-            + " "
-            + var_unit
-        )
+        title = "Percentage of time " + condition
         fig.update_yaxes(title_text="Percentage (%)")
         fig.update_layout(title=title, barnorm="percent")
     else:
-        title = (
-            "Number of hours the "
-            + var_name
-            + " is in the range "
-            + min_val
-            + " to "
-            + max_val
-            + " "
-            + var_unit
-        )
+        title = "Number of hours " + condition
         fig.update_yaxes(title_text="hours")
         fig.update_layout(title=title, barnorm="")
     if time_filter:
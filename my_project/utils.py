@@ -1,12 +1,11 @@
 import functools
+from math import ceil, floor
 import time
-from my_project.global_scheme import fig_config, mapping_dictionary
-import pandas as pd
-import json
-from pandas import json_normalize
+from urllib.parse import parse_qs, urlencode
+from my_project.global_scheme import fig_config, mapping_dictionary, month_lst
+from my_project.station_map import station_id, station_urls
 from dash import html, dash_table
 import dash_bootstrap_components as dbc
-import plotly.express as px
 import copy
 
 
@@ -36,50 +35,24 @@ def generate_chart_name(tab_name, meta=None):
     return figure_config
 
 
-def plot_location_epw_files():
-    with open("./assets/data/epw_location.json", encoding="utf8") as data_file:
-        data = json.load(data_file)
+def parse_permalink(search):
+    """Return the station, units, tab and value ranges encoded in a permalink."""
+    query = parse_qs((search or "").lstrip("?"))
+    return {key: values[0] for key, values in query.items()}
 
-    df = json_normalize(data["features"])
-    df[["lon", "lat"]] = pd.DataFrame(df["geometry.coordinates"].tolist())
-    df["lat"] += 0.005
-    df["lat"] += 0.005
-    df = df.rename(columns={"properties.epw": "Source"})
 
-    df_one_building = pd.read_csv("./assets/data/one_building.csv", compression="gzip")
-
-    fig2 = px.scatter_mapbox(
-        df.head(2585),
-        lat="lat",
-        lon="lon",
-        hover_name="properties.title",
-        color_discrete_sequence=["#3a0ca3"],
-        hover_data=["Source"],
-        zoom=2,
-        height=500,
-    )
-    fig = px.scatter_mapbox(
-        df_one_building,
-        lat="lat",
-        lon="lon",
-        hover_name=df_one_building["name"],
-        color_discrete_sequence=["#4895ef"],
-        hover_data=[
-            "period",
-            "elevation (m)",
-            "time zone (GMT)",
-            "99% Heating DB",
-            "1% Cooling DB ",
-            "Source",
-        ],
-        zoom=2,
-        height=500,
-    )
-    fig.add_trace(fig2.data[0])
-    fig.update_layout(mapbox_style="carto-positron")
-    fig.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
-
-    return fig
+def permalink(url, si_ip, tab, global_local):
+    """Return the permalink of the current analysis, None for uploaded files."""
+    station = station_id(url)
+    if station_urls().get(station) != url:
+        return None
+    query = {
+        "station": station,
+        "units": si_ip,
+        "tab": tab.replace("tab-", "", 1),
+        "ranges": global_local,
+    }
+    return "/?" + urlencode(query)
 
 
 def title_with_tooltip(text, tooltip_text, id_button):
@@ -118,25 +91,12 @@ def title_with_tooltip(text, tooltip_text, id_button):
     )
 
 
-def summary_table_tmp_rh_tab(df, value, si_ip):
-    df_summary = (
-        df.groupby(["month_names", "month"])[value]
-        .describe(percentiles=[0.01, 0.25, 0.5, 0.75, 0.99])
-        .round(2)
-    )
-    df_summary = df_summary.reset_index(level="month_names").sort_index()
-    df_summary = df_summary.drop(["count"], axis=1)
-    df_summary = df_summary.rename(columns={"month_names": "month"})
-
-    df_sum = (
-        df[value]
-        .describe(percentiles=[0.01, 0.25, 0.5, 0.75, 0.99])
-        .round(2)
-        .to_frame()
-    )
-    df_sum = df_sum.T.assign(count="Year").rename(columns={"count": "month"})
-
-    df_summary = pd.concat([df_summary, df_sum])
+def summary_table_tmp_rh_tab(dataset, value, si_ip):
+    """Return the table of the monthly and yearly statistics of value, read from
+    the summary of the dataset."""
+    statistics = ["mean", "std", "min", "1%", "25%", "50%", "75%", "99%", "max"]
+    df_summary = dataset.summary.describe(value)[statistics].round(2)
+    df_summary.insert(0, "month", month_lst + ["Year"])
 
     unit = (
         mapping_dictionary[value][si_ip]["unit"]
@@ -162,12 +122,54 @@ def summary_table_tmp_rh_tab(df, value, si_ip):
     )
 
 
-def determine_month_and_hour_filter(month, hour, invert_month, invert_hour):
-    start_month, end_month = month
-    if invert_month == ["invert"] and (start_month != 1 or end_month != 12):
-        end_month, start_month = month
-    start_hour, end_hour = hour
-    if invert_hour == ["invert"] and (start_hour != 1 or end_hour != 24):
-        end_hour, start_hour = hour
-
-    return start_month, end_month, start_hour, end_hour
+def data_filter_mask(df, var, min_val, max_val):
+    """Return a boolean mask which is False for the rows in which var is outside the
+    range. If min_val is greater than max_val, the values between the two are
+    excluded."""
+    if min_val <= max_val:
+        return ~((df[var] < min_val) | (df[var] > max_val))
+    return ~((df[var] >= max_val) & (df[var] <= min_val))
+
+
+def relayout_x_range(relayout_data):
+    """Return the range of the x axis set by zooming or panning a chart, given its
+    relayoutData, or None if it was reset to the full range."""
+    if "xaxis.range[0]" in relayout_data:
+        return [relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]]
+    return relayout_data.get("xaxis.range")
+
+
+def value_ranges(values, var_range):
+    """Return the global range of a variable and the local one, i.e. the range of
+    the values rounded to multiples of 5. The local range is the global one if
+    there are no values."""
+    if values.count() == 0:
+        return {"global": var_range, "local": var_range}
+    return {
+        "global": var_range,
+        "local": [5 * floor(values.min() / 5), 5 * ceil(values.max() / 5)],
+    }
+
+
+def add_value_ranges(fig, ranges, axes=(), traces=None, layout=None):
+    """Store in the layout of the figure the updates which switch it between the
+    global and the local value ranges, so that the switch is done client-side.
+
+    ranges maps "global" and "local" to a [min, max] range, applied to the range
+    of the axes, to the traces given as {index: (min attribute, max attribute)}
+    and to the layout objects given as {name: (min attribute, max attribute)}.
+    """
+    value_ranges = fig.layout.meta["value_ranges"] if fig.layout.meta else {}
+    for global_local, value_range in ranges.items():
+        updates = value_ranges.setdefault(global_local, {"layout": {}, "traces": {}})
+        for axis in axes:
+            updates["layout"][f"{axis}.range"] = value_range
+        for name, (attr_min, attr_max) in (layout or {}).items():
+            updates["layout"][f"{name}.{attr_min}"] = value_range[0]
+            updates["layout"][f"{name}.{attr_max}"] = value_range[1]
+        for index, (attr_min, attr_max) in (traces or {}).items():
+            updates["traces"].setdefault(str(index), {}).update(
+                {attr_min: value_range[0], attr_max: value_range[1]}
+            )
+    fig.update_layout(meta={"value_ranges": value_ranges})
+    return fig
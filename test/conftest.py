@@ -0,0 +1,9 @@
+import pytest
+
+from test_dataset import import_dataset_test
+
+
+@pytest.fixture(scope="session")
+def dataset():
+    """Dataset of the Bologna EPW file, shared by the tests since it is read-only."""
+    return import_dataset_test()
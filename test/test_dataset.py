@@ -0,0 +1,64 @@
+import json
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from my_project.extract_df import create_df
+from my_project.dataset import MAX_QUERIES, ClimaDataset, Location
+
+epw_test_file_path = os.path.join(
+    os.path.dirname(__file__), "ITA_ER_Bologna-Marconi.AP.161400_TMYx.2004-2018.epw"
+)
+
+
+def import_dataset_test():
+    with open(epw_test_file_path) as f:
+        lines = f.read().split("\n")
+    df, location_info = create_df(lines, epw_test_file_path)
+    return ClimaDataset(
+        df, Location.from_meta(location_info), location_info["dataset_id"]
+    )
+
+
+def test_clima_dataset():
+    dataset = import_dataset_test()
+
+    assert dataset.location.city == "Bologna Marconi AP"
+    assert dataset.location.time_zone == 1.0
+    assert len(dataset) == 8760
+    assert dataset.daily["DBT"].shape == (365, 3)
+    assert dataset.monthly_profile.shape[0] == 12 * 24
+    january = dataset.df.loc[dataset.df["month"] == 1, "DBT"]
+    assert dataset.stats("month").loc[1, ("DBT", "50%")] == january.median()
+    assert dataset.stats("year").loc["Year", ("DBT", "count")] == 8760
+    assert dataset.summary.total("glob_hor_rad") == dataset.df["glob_hor_rad"].sum()
+    assert dataset.summary.describe("DBT").loc[1, "50%"] == january.median()
+    assert json.loads(dataset.summary.to_json())["variables"]["DBT"]["max"] == 39
+    cold_january = january[january <= 18]
+    assert dataset.degree_days.heating(18)[0, 0] == pytest.approx(
+        (cold_january - 18).sum() / 24
+    )
+
+    # only the most recently used query results are kept
+    computed = []
+    for key in list(range(MAX_QUERIES + 1)) + [0, MAX_QUERIES]:
+        dataset.query(("test", key), lambda: computed.append(key))
+    assert computed == list(range(MAX_QUERIES + 1)) + [0]
+
+    with pytest.raises(ValueError):
+        dataset.df.loc[dataset.df["month"] == 1, "DBT"] = None
+
+    restored = pickle.loads(pickle.dumps(dataset))
+    assert restored.dataset_id == dataset.dataset_id
+    assert not restored.column("DBT").flags.writeable
+
+
+def test_summary_json_not_finite(dataset):
+    df = dataset.df.copy()
+    df["DBT"] = np.where(np.arange(len(df)) == 0, np.inf, df["DBT"])
+    summary = ClimaDataset(df, dataset.location, "not-finite").summary
+    dbt = json.loads(summary.to_json())["variables"]["DBT"]
+    assert dbt["max"] is None and dbt["total"] is None
+    assert dbt["min"] == dataset.summary.describe("DBT").loc["Year", "min"]
@@ -0,0 +1,30 @@
+from my_project.dataset import ClimaDataset
+from my_project.dataset_cache import (
+    MAX_DATASETS,
+    cached_dataset,
+    get_dataset,
+    set_dataset,
+)
+
+
+def test_cached_dataset(dataset):
+    meta = {"dataset_id": dataset.dataset_id, "url": "unused"}
+    set_dataset(dataset, {"rows": len(dataset)})
+    cached, dataset_meta = cached_dataset(meta, "si")
+    # the same object is returned, without pickling it
+    assert cached is dataset
+    assert dataset_meta == {"rows": 8760}
+
+    # only the most recently used datasets are kept
+    def load(name):
+        set_dataset(ClimaDataset(dataset.df, dataset.location, name), {})
+
+    for i in range(MAX_DATASETS - 1):
+        load(f"other-{i}")
+    assert get_dataset(dataset.dataset_id, "si") is not None
+    assert get_dataset(dataset.dataset_id, "ip") is None
+    load("newer")
+    assert get_dataset("other-0", "si") is None
+    for i in range(1, MAX_DATASETS):
+        load(f"newer-{i}")
+    assert get_dataset(dataset.dataset_id, "si") is None
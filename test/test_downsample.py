@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from my_project.downsample import downsample_series, lttb_indices
+
+
+def test_lttb_indices():
+    x = np.arange(8760, dtype=float)
+    y = np.sin(x / 200) + np.random.default_rng(0).normal(0, 0.1, len(x))
+    indices = lttb_indices(x, y, 1000)
+    assert len(indices) == 1000
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert (np.diff(indices) > 0).all()
+    # the highest peak is kept
+    assert np.argmax(y) in indices
+
+    assert lttb_indices(x[:10], y[:10], 1000).tolist() == list(range(10))
+
+
+def test_downsample_series():
+    times = pd.date_range("2021-01-01", periods=8760, freq="H").to_numpy()
+    values = np.arange(8760, dtype=float)
+    values[100] = np.nan
+    x, y = downsample_series(times, values, ["2021-01-02", "2021-01-10"], n_out=50)
+    assert len(x) == 50
+    assert x[0] == np.datetime64("2021-01-02") and x[-1] == np.datetime64("2021-01-10")
+    assert not np.isnan(y).any()
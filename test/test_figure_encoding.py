@@ -0,0 +1,73 @@
+import base64
+import warnings
+
+import numpy as np
+import plotly.graph_objects as go
+
+from my_project.figure_encoding import (
+    FLOAT32_RTOL,
+    MIN_ENCODED_SIZE,
+    encode_array,
+    encode_figure,
+)
+
+
+def decode_array(encoded):
+    values = np.frombuffer(base64.b64decode(encoded["bdata"]), "<" + encoded["dtype"])
+    if "shape" in encoded:
+        values = values.reshape([int(n) for n in encoded["shape"].split(",")])
+    return values
+
+
+def test_encode_array_round_trip():
+    # values exactly representable as float32 are sent as such
+    halves = np.arange(100) / 2
+    encoded = encode_array(halves)
+    assert encoded["dtype"] == "f4"
+    np.testing.assert_array_equal(decode_array(encoded), halves)
+
+    # other values within FLOAT32_RTOL, unless they are out of the float32 range
+    readings = np.linspace(0, 1, 100) + 1e9
+    encoded = encode_array(readings)
+    assert encoded["dtype"] == "f4"
+    np.testing.assert_allclose(decode_array(encoded), readings, rtol=FLOAT32_RTOL)
+    huge = np.linspace(1, 2, 100) * 1e300
+    with warnings.catch_warnings():
+        # the overflow of the float32 cast is not reported as a warning
+        warnings.simplefilter("error")
+        encoded = encode_array(huge)
+    assert encoded["dtype"] == "f8"
+    np.testing.assert_array_equal(decode_array(encoded), huge)
+
+    with_nan = np.where(np.arange(100) % 7 == 0, np.nan, halves)
+    np.testing.assert_array_equal(decode_array(encode_array(with_nan)), with_nan)
+
+    integers = np.arange(-50, 50)
+    encoded = encode_array(integers)
+    assert encoded["dtype"] == "i1"
+    np.testing.assert_array_equal(decode_array(encoded), integers)
+
+    matrix = np.arange(24 * 365, dtype=float).reshape(24, 365)
+    encoded = encode_array(matrix)
+    assert encoded["shape"] == "24,365"
+    np.testing.assert_array_equal(decode_array(encoded), matrix)
+
+    assert decode_array(encode_array(list(range(100)))).tolist() == list(range(100))
+
+
+def test_encode_array_unchanged():
+    short = np.arange(MIN_ENCODED_SIZE - 1)
+    assert encode_array(short) is short
+    names = ["Jan"] * 100
+    assert encode_array(names) is names
+    flags = [True] * 100
+    assert encode_array(flags) is flags
+
+
+def test_encode_figure():
+    fig = go.Figure(
+        go.Scatter(x=np.arange(100), y=np.arange(100) / 4, text=["a"] * 100)
+    )
+    trace = encode_figure(fig)["data"][0]
+    np.testing.assert_array_equal(decode_array(trace["y"]), np.arange(100) / 4)
+    assert trace["text"] == ["a"] * 100
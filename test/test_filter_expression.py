@@ -0,0 +1,129 @@
+import re
+
+import numpy as np
+import pytest
+
+from my_project.dataset import ClimaDataset
+from my_project.filter_expression import compile_filter, data_filter_rows, tokenize
+
+
+def test_tokenize():
+    assert tokenize("DBT -10--5") == [
+        ("word", "DBT"),
+        ("number", "-10"),
+        ("range", "-"),
+        ("number", "-5"),
+    ]
+    assert tokenize("not (RH >= 1e2)") == [
+        ("keyword", "not"),
+        ("paren", "("),
+        ("word", "RH"),
+        ("op", ">="),
+        ("number", "1e2"),
+        ("paren", ")"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "expression, text",
+    [
+        ("DBT 18 to 26", "DBT >= 18 and DBT <= 26"),
+        ("DBT 18-26", "DBT >= 18 and DBT <= 26"),
+        ("DBT 18 - 26", "DBT >= 18 and DBT <= 26"),
+        ("DBT 18–26", "DBT >= 18 and DBT <= 26"),
+        ("DBT 18..26", "DBT >= 18 and DBT <= 26"),
+        ("DBT 26 TO 18", "DBT >= 18 and DBT <= 26"),
+        ("18 <= DBT <= 26", "DBT >= 18 and DBT <= 26"),
+        ("DBT -10--5", "DBT >= -10 and DBT <= -5"),
+        ("RH > 1e1", "RH > 10"),
+        ("wind_speed < .5", "wind_speed < 0.5"),
+        ("DBT 1.5E-1 to 2", "DBT >= 0.15 and DBT <= 2"),
+        ("20 < DBT", "DBT > 20"),
+        (
+            "not (DBT > 20 or RH >= 80) and wind_speed < 2",
+            "not (DBT > 20 or RH >= 80) and wind_speed < 2",
+        ),
+        (
+            "DBT 18 to 26 or DBT > 30 and RH < 40",
+            "(DBT >= 18 and DBT <= 26) or (DBT > 30 and RH < 40)",
+        ),
+    ],
+)
+def test_compile_filter(expression, text):
+    assert compile_filter(expression).text == text
+
+
+@pytest.mark.parametrize(
+    "expression, message",
+    [
+        ("", "it is empty"),
+        ("  ", "it is empty"),
+        ("FOO > 1", "unknown variable 'FOO'"),
+        ("DBT >", "expected a number, found the end"),
+        ("DBT > RH", "expected a number, found 'RH'"),
+        ("DBT 18 26", "expected 'to', found '26'"),
+        ("(DBT > 1", "expected ), found the end"),
+        ("DBT > 1)", "unexpected ')'"),
+        ("DBT > 1 $", "unexpected ' $'"),
+    ],
+)
+def test_compile_filter_invalid(expression, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        compile_filter(expression)
+
+
+@pytest.mark.parametrize(
+    "expression, query",
+    [
+        ("DBT 18 to 26", "18 <= DBT <= 26"),
+        ("DBT 26-18 and RH < 60", "18 <= DBT <= 26 and RH < 60"),
+        ("RH != 100", "RH != 100"),
+        ("not (DBT > 20 or RH >= 80)", "not (DBT > 20 or RH >= 80)"),
+        (
+            "(DBT < 0 or DBT > 30) and not wind_speed == 0",
+            "(DBT < 0 or DBT > 30) and not wind_speed == 0",
+        ),
+    ],
+)
+def test_filter_expression_mask(dataset, expression, query):
+    mask = compile_filter(expression).mask(dataset)
+    expected = dataset.df.eval(query).to_numpy()
+    assert expected.any()
+    np.testing.assert_array_equal(mask, expected)
+    assert compile_filter(expression).mask(dataset) is mask
+
+
+def test_filter_expression_missing_values(dataset):
+    df = dataset.df.copy()
+    missing = np.arange(len(df)) < 100
+    df["DBT"] = df["DBT"].where(~missing)
+    with_nan = ClimaDataset(df, dataset.location, "missing-values")
+    for expression in ["DBT > 20", "not DBT > 20", "DBT != 20", "not DBT != 20"]:
+        mask = compile_filter(expression).mask(with_nan)
+        assert not mask[missing].any()
+        np.testing.assert_array_equal(
+            mask[~missing], compile_filter(expression).mask(dataset)[~missing]
+        )
+    # the rows are excluded only for the variables of the negated condition
+    mask = compile_filter("RH > 50 or not DBT > 20").mask(with_nan)
+    np.testing.assert_array_equal(mask[missing], df["RH"].to_numpy()[missing] > 50)
+
+
+def test_filter_expression_not_numeric(dataset):
+    with pytest.raises(ValueError, match="is not numeric"):
+        compile_filter("utci_Sun_Wind_categories > 1").mask(dataset)
+
+
+def test_data_filter_rows(dataset):
+    dbt = dataset.df["DBT"].to_numpy()
+    in_range = (dbt >= 18) & (dbt <= 26)
+    np.testing.assert_array_equal(
+        data_filter_rows(dataset, [True, "DBT", 18, 26]), in_range
+    )
+    np.testing.assert_array_equal(
+        data_filter_rows(dataset, [True, "DBT", 18, 26, ""]), in_range
+    )
+    np.testing.assert_array_equal(
+        data_filter_rows(dataset, [True, "DBT", 18, 26, "RH < 60"]),
+        dataset.df["RH"].to_numpy() < 60,
+    )
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from my_project.filter_index import (
+    FilterIndex,
+    determine_month_and_hour_filter,
+    range_selection,
+    time_filter_mask,
+)
+
+
+def column_selection(values, start, end):
+    """Selection of the values as compared with the columns before the index."""
+    if start <= end:
+        return (values >= start) & (values <= end)
+    return (values < end) | (values > start)
+
+
+def selected(start, end, inclusive=False):
+    return (np.flatnonzero(range_selection(start, end, 12, inclusive)) + 1).tolist()
+
+
+def test_range_selection():
+    assert selected(3, 5) == [3, 4, 5]
+    assert selected(11, 2) == [1, 12]
+    assert selected(11, 2, inclusive=True) == [1, 2, 11, 12]
+    assert selected(12, 1) == []
+    assert selected(12, 1, inclusive=True) == [1, 12]
+
+
+@pytest.mark.parametrize(
+    "start_month, end_month, start_hour, end_hour",
+    [
+        (1, 12, 1, 24),
+        (3, 5, 8, 18),
+        (7, 7, 12, 12),
+        (11, 2, 1, 24),  # inverted months
+        (1, 12, 20, 6),  # inverted hours
+        (10, 3, 18, 7),
+        (12, 1, 24, 1),  # nothing is selected
+    ],
+)
+def test_time_mask(start_month, end_month, start_hour, end_hour):
+    rng = np.random.default_rng(0)
+    month = rng.integers(1, 13, 1000)
+    hour = rng.integers(1, 25, 1000)
+    expected = column_selection(month, start_month, end_month) & column_selection(
+        hour, start_hour, end_hour
+    )
+    mask = FilterIndex(month, hour).time_mask(
+        start_month, end_month, start_hour, end_hour
+    )
+    np.testing.assert_array_equal(mask, expected)
+
+
+def test_time_filter_mask(dataset):
+    df = dataset.df
+    for filters in [
+        ([3, 9], [8, 20], [], []),
+        ([3, 9], [8, 20], ["invert"], []),
+        ([3, 9], [8, 20], ["invert"], ["invert"]),
+        ([1, 12], [1, 24], ["invert"], ["invert"]),
+    ]:
+        start_month, end_month, start_hour, end_hour = determine_month_and_hour_filter(
+            *filters
+        )
+        expected = column_selection(
+            df["month"].to_numpy(), start_month, end_month
+        ) & column_selection(df["hour"].to_numpy(), start_hour, end_hour)
+        mask = time_filter_mask(dataset, start_month, end_month, start_hour, end_hour)
+        np.testing.assert_array_equal(mask, expected)
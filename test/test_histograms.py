@@ -0,0 +1,38 @@
+import numpy as np
+
+from my_project.dataset import ClimaDataset
+from my_project.tab_data_explorer.charts_data_explorer import (
+    three_var_graph,
+    two_var_graph,
+)
+from my_project.template_graphs import bin_edges
+
+
+def test_bin_edges():
+    values = np.array([-3.2, 0.4, 17.9, np.nan])
+    edges = bin_edges(values, 10)
+    assert edges[0] <= -3.2 and edges[-1] > 17.9
+    np.testing.assert_allclose(np.diff(edges), 2.5)
+    assert len(bin_edges([5.0, 5.0])) == 2
+
+    # no values, e.g. all of them are filtered out or missing
+    assert bin_edges([]) is None
+    assert bin_edges([np.nan, np.nan]) is None
+
+
+def test_histograms_without_values(dataset):
+    # a variable which is missing from the EPW file
+    df = dataset.df.copy()
+    df["RH"] = np.nan
+    without_rh = ClimaDataset(df, dataset.location, "without-rh")
+    time_filter = [False, [1, 12], [1, 24]]
+    data_filter = [False, "DBT", 0, 50]
+    fig = three_var_graph(
+        without_rh, "global", "DBT", "RH", "DBT", time_filter, data_filter, "si"
+    )
+    assert [trace.type for trace in fig.data] == ["scattergl", "bar"]
+    assert sum(fig.data[1].y) == len(df)
+
+    fig = two_var_graph(df, "DBT", "RH", "si")
+    assert [trace.type for trace in fig.data] == ["bar"]
+    assert sum(fig.data[0].y) == len(df)
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from my_project.tab_natural_ventilation.app_natural_ventilation import (
+    nv_analysis,
+    nv_sensitivity,
+)
+
+
+@pytest.mark.parametrize(
+    "time_filter, month, hour, invert_month, invert_hour",
+    [
+        (False, [1, 12], [1, 24], [], []),
+        (True, [3, 9], [8, 20], [], []),
+        (True, [5, 9], [6, 18], ["invert"], ["invert"]),
+    ],
+)
+def test_nv_sensitivity_hours(
+    dataset, time_filter, month, hour, invert_month, invert_hour
+):
+    sensitivity = nv_sensitivity(
+        dataset, time_filter, month, hour, invert_month, invert_hour
+    )
+    grid = sensitivity.dbt_grid.tolist()
+    for min_dbt, max_dbt, max_dpt in [
+        (10, 24, None),
+        (18, 26, 15),
+        (0, 30, 8),
+        (20, 20, 12),
+        (25, 15, None),
+    ]:
+        hours = sensitivity.hours(max_dpt)[grid.index(min_dbt), grid.index(max_dbt)]
+        analysis = nv_analysis(
+            dataset,
+            time_filter,
+            True,
+            max_dpt is not None,
+            month,
+            hour,
+            min_dbt,
+            max_dbt,
+            max_dpt,
+            invert_month,
+            invert_hour,
+        )
+        if min_dbt > max_dbt:
+            assert np.isnan(hours)
+        else:
+            assert hours == analysis.nv_hours.sum()
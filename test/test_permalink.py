@@ -0,0 +1,50 @@
+import pytest
+from dash.exceptions import PreventUpdate
+
+from app import app
+from main import display_page
+from my_project.tab_select import app_select
+from my_project.utils import parse_permalink
+from test_dataset import epw_test_file_path
+
+STATION = "ITA_ER_Bologna-Marconi.AP.161400_TMYx.2004-2018"
+STATION_URL = f"https://climate.onebuilding.org/{STATION}.zip"
+
+
+def test_permalink_to_wind_tab(monkeypatch):
+    def get_data(url):
+        assert url == STATION_URL
+        with open(epw_test_file_path) as f:
+            return f.read().split("\n")
+
+    monkeypatch.setattr(app_select, "get_data", get_data)
+    monkeypatch.setattr(app_select, "station_urls", lambda: {STATION: STATION_URL})
+    search = f"?station={STATION}&units=si&tab=wind&ranges=global"
+
+    assert display_page("/", search).children[0].value == "tab-wind"
+
+    meta, lines, restored_search = app_select.restore_station_from_permalink(
+        search, None, None
+    )
+    assert meta["city"] == "Bologna Marconi AP"
+    assert restored_search == search
+    dataset, si_ip, dataset_meta = app_select.switch_si_ip(None, "si", lines, meta)
+    assert len(dataset) == dataset_meta["rows"] == 8760
+    assert si_ip == "si"
+
+    # the permalink is not restored again over the station selected afterwards
+    with pytest.raises(PreventUpdate):
+        app_select.restore_station_from_permalink(search, None, restored_search)
+
+
+def test_permalink_restored_from_any_tab():
+    # the station is restored by a callback which only needs the URL, that is in
+    # every page, rather than the inputs of the Select tab
+    dependencies = app.server.test_client().get("/_dash-dependencies").get_json()
+    (restore,) = [d for d in dependencies if "permalink-store.data" in d["output"]]
+    assert restore["inputs"] == [{"id": "url", "property": "search"}]
+
+
+def test_unknown_permalink_tab():
+    assert display_page("/", "?tab=nope").children[0].value == "tab-select"
+    assert parse_permalink("") == {}
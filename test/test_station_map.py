@@ -0,0 +1,37 @@
+import numpy as np
+
+from my_project.station_map import StationIndex, wrap_bounds
+
+
+def brute_force(lon, lat, west, east, south, north):
+    if west <= east:
+        in_lon = (lon >= west) & (lon <= east)
+    else:
+        in_lon = (lon >= west) | (lon <= east)
+    return np.flatnonzero(in_lon & (lat >= south) & (lat <= north))
+
+
+def test_station_index_query():
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(-180, 180, 5000)
+    lat = rng.uniform(-90, 90, 5000)
+    # stations on the antimeridian and on the poles
+    lon[:4] = [-180, 180, 179.99, -179.99]
+    lat[4:6] = [-90, 90]
+    index = StationIndex(lon, lat)
+
+    for bounds in [
+        (-10, 30, 35, 60),
+        (170, -170, -20, 20),  # across the antimeridian
+        (179.5, -179.5, -90, 90),
+        (-180, 180, -90, 90),
+        (12.3, 12.4, 44.1, 44.2),
+    ]:
+        np.testing.assert_array_equal(
+            index.query(*bounds), brute_force(lon, lat, *bounds)
+        )
+
+
+def test_wrap_bounds():
+    assert wrap_bounds(170, 200, -10, 10) == (170, -160, -10, 10)
+    assert wrap_bounds(-300, 100, -10, 10) == (-180, 180, -10, 10)
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from my_project.template_graphs import (
+    WIND_DIRECTION_BINS,
+    WIND_SPEED_BINS,
+    convert_bins,
+    wind_rose_counts,
+)
+
+
+def wind_rose_counts_pandas(df, month, hour, si_ip):
+    """Counts of the wind rose as computed with pd.cut before the count cube."""
+    for var, (start, end) in [("month", month), ("hour", hour)]:
+        if start <= end:
+            df = df.loc[(df[var] >= start) & (df[var] <= end)]
+        else:
+            df = df.loc[(df[var] <= end) | (df[var] >= start)]
+    spd_bins = WIND_SPEED_BINS.copy()
+    if si_ip == "ip":
+        spd_bins = convert_bins(spd_bins)
+    speed = pd.cut(df["wind_speed"], bins=spd_bins, labels=False, right=True)
+    direction = pd.cut(
+        df["wind_dir"], bins=WIND_DIRECTION_BINS, labels=False, right=False
+    )
+    # the last direction bin is centred on 360 deg, i.e. it is the first one
+    direction = direction.replace({len(WIND_DIRECTION_BINS) - 2: 0})
+    counts = (
+        pd.crosstab(speed, direction)
+        .reindex(
+            index=range(len(spd_bins) - 1),
+            columns=range(len(WIND_DIRECTION_BINS) - 2),
+            fill_value=0,
+        )
+        .to_numpy()
+    )
+    return counts, len(df), int((df["wind_speed"] == 0).sum())
+
+
+@pytest.mark.parametrize(
+    "month, hour",
+    [([1, 12], [1, 24]), ([3, 5], [8, 18]), ([11, 2], [20, 6]), ([7, 7], [12, 12])],
+)
+@pytest.mark.parametrize("si_ip", ["si", "ip"])
+def test_wind_rose_counts(dataset, month, hour, si_ip):
+    counts, total, calm = wind_rose_counts(dataset, month, hour, si_ip)
+    expected_counts, expected_total, expected_calm = wind_rose_counts_pandas(
+        dataset.df, month, hour, si_ip
+    )
+    np.testing.assert_array_equal(counts, expected_counts)
+    assert total == expected_total
+    assert calm == expected_calm